@@ -5,23 +5,43 @@ Deploys on: Google Cloud Run, AWS Lambda, Modal Labs, or any Docker host.
 Called by: Supabase Edge Function generate_forecast_v5
 """
 
+import asyncio
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Literal, Optional
 
 import numpy as np
 import pandas as pd
 from fastapi import FastAPI, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
 from prophet import Prophet
 
+import batch_prophet
+from calendar_index import CALENDAR, to_ordinals
+from model_store import HourlyModelStore
+from sales_panel import PanelStore
+from stage_metrics import StageMetrics
+import supabase_rest
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("prophet-service")
 
-app = FastAPI(title="Josephine Prophet Service", version="5.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Release the pooled Supabase client and the fit threads on shutdown."""
+    yield
+    await supabase_rest.aclose()
+    FIT_EXECUTOR.shutdown(wait=False)
+
+
+app = FastAPI(title="Josephine Prophet Service", version="5.0.0", lifespan=lifespan)
 
 ALLOWED_ORIGINS = os.getenv(
     "ALLOWED_ORIGINS",
@@ -37,6 +57,12 @@ app.add_middleware(
 
 API_KEY = os.getenv("PROPHET_API_KEY", "")
 
+# Model fits run here, off the event loop (XGBoost / LightGBM release the GIL).
+# One worker per /forecast_ensemble engine, so its three fits run side by side.
+FIT_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("FIT_WORKERS", "3")), thread_name_prefix="fit",
+)
+
 
 # ─── Request / Response Models ────────────────────────────────────────────────
 
@@ -67,6 +93,7 @@ class ForecastRequest(BaseModel):
     changepoint_prior_scale: float = 0.05
     seasonality_prior_scale: float = 10.0
     include_regressors: bool = True
+    backend: Literal["prophet", "batch"] = "prophet"  # Stan, or batch_prophet.BatchProphet
 
 
 class ForecastPoint(BaseModel):
@@ -149,7 +176,33 @@ def build_explanation(row: pd.Series, base_forecast: float) -> str:
     )
 
 
-def calculate_cv_metrics(model: Prophet, df: pd.DataFrame) -> dict:
+# Fill for regressor days missing from both history and future_regressors
+REGRESSOR_DEFAULTS = {"evento_impact": 1.0, "temperatura": 18.0}
+
+
+def regressor_frame(
+    df: pd.DataFrame, future_regressors: Optional[list[dict]], reg_names: list[str], dates: pd.Series,
+) -> pd.DataFrame:
+    """History and future regressors in one frame indexed by ``dates``.
+
+    Future rows win over history on the same date (per column, for the
+    columns they carry); gaps get REGRESSOR_DEFAULTS (0 otherwise).
+    """
+    regs = df.set_index("ds")[reg_names].astype(float)
+    if reg_names and future_regressors:
+        fut = pd.DataFrame(future_regressors)
+        fut["ds"] = pd.to_datetime(fut["ds"])
+        fut = fut.drop_duplicates(subset="ds", keep="last").set_index("ds")
+        fut_cols = [r for r in reg_names if r in fut.columns]
+        regs = regs.reindex(regs.index.union(fut.index))
+        if fut_cols:
+            regs.loc[fut.index, fut_cols] = fut[fut_cols].astype(float)
+    return regs.reindex(pd.DatetimeIndex(dates)).fillna(
+        {r: REGRESSOR_DEFAULTS.get(r, 0) for r in reg_names}
+    )
+
+
+def calculate_cv_metrics(model, df: pd.DataFrame) -> dict:
     """Expanding window cross-validation with comprehensive time series metrics.
 
     Instead of a single holdout, uses 3 expanding windows to assess stability:
@@ -158,6 +211,7 @@ def calculate_cv_metrics(model: Prophet, df: pd.DataFrame) -> dict:
       Fold 3: train[0..87%] → test[87%..100%]
 
     Returns aggregated metrics including MASE, directional accuracy, and bias.
+    Folds are refitted with the same class as ``model`` (Prophet or BatchProphet).
     """
     import logging as _logging
     _logging.getLogger('cmdstanpy').setLevel(_logging.WARNING)
@@ -185,7 +239,7 @@ def calculate_cv_metrics(model: Prophet, df: pd.DataFrame) -> dict:
         test = df.iloc[train_end:test_end].copy()
 
         try:
-            m = Prophet(
+            m = type(model)(
                 yearly_seasonality=model.yearly_seasonality,
                 weekly_seasonality=model.weekly_seasonality,
                 daily_seasonality=model.daily_seasonality,
@@ -276,6 +330,12 @@ async def health():
     return {"status": "ok", "version": "5.0.0", "engine": "prophet"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage timings of hourly runs on this worker (Prometheus text format)."""
+    return STAGE_METRICS.render()
+
+
 @app.post("/forecast", response_model=ForecastResponse)
 async def forecast(req: ForecastRequest, authorization: str = Header(default="")):
     # Auth check
@@ -295,7 +355,19 @@ async def forecast(req: ForecastRequest, authorization: str = Header(default="")
         req.horizon_days,
         req.include_regressors,
     )
+    return fit_prophet(req)
+
+
+def fit_prophet_model(req: ForecastRequest) -> tuple[Prophet, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Fit Prophet on ``req.historical`` and predict history + ``req.horizon_days``.
+
+    ``req.backend == "batch"`` fits batch_prophet.BatchProphet (the same MAP
+    model solved in-process) instead of going through Stan.
 
+    Returns (model, df, pred, reg_values): the fitted model, the cleaned
+    history, Prophet's prediction frame over every date, and the regressor
+    values of those dates.
+    """
     # ── Build historical DataFrame ────────────────────────────────────────
     df = pd.DataFrame(req.historical)
     df["ds"] = pd.to_datetime(df["ds"])
@@ -308,7 +380,8 @@ async def forecast(req: ForecastRequest, authorization: str = Header(default="")
     df = df.sort_values("ds").drop_duplicates(subset="ds", keep="last").reset_index(drop=True)
 
     # ── Configure Prophet ─────────────────────────────────────────────────
-    model = Prophet(
+    model_cls = batch_prophet.BatchProphet if req.backend == "batch" else Prophet
+    model = model_cls(
         yearly_seasonality=req.yearly_seasonality,
         weekly_seasonality=req.weekly_seasonality,
         daily_seasonality=req.daily_seasonality,
@@ -333,7 +406,7 @@ async def forecast(req: ForecastRequest, authorization: str = Header(default="")
                 model.add_regressor(reg_name, mode=mode)
 
     # ── Fit model ─────────────────────────────────────────────────────────
-    logger.info("Fitting Prophet model with %d data points...", len(df))
+    logger.info("Fitting %s model with %d data points...", model_cls.__name__, len(df))
     import logging as _logging
     _logging.getLogger('cmdstanpy').setLevel(_logging.WARNING)
     model.fit(df)
@@ -342,34 +415,32 @@ async def forecast(req: ForecastRequest, authorization: str = Header(default="")
     # ── Build future DataFrame ────────────────────────────────────────────
     future = model.make_future_dataframe(periods=req.horizon_days, freq=req.freq)
 
-    # Merge regressors into future
-    if req.include_regressors and req.future_regressors:
-        future_reg_df = pd.DataFrame(req.future_regressors)
-        future_reg_df["ds"] = pd.to_datetime(future_reg_df["ds"])
-
-        for reg_name in REGRESSOR_NAMES:
-            if reg_name in df.columns:
-                # Build a combined regressor series from history + future
-                hist_reg = df[["ds", reg_name]].copy()
-                fut_reg = future_reg_df[["ds", reg_name]].copy() if reg_name in future_reg_df.columns else pd.DataFrame()
-
-                combined = pd.concat([hist_reg, fut_reg]).drop_duplicates(subset="ds", keep="last")
-                future = future.merge(combined, on="ds", how="left")
-
-                # Fill any gaps
-                if reg_name == "evento_impact":
-                    future[reg_name] = future[reg_name].fillna(1.0)
-                elif reg_name == "temperatura":
-                    future[reg_name] = future[reg_name].fillna(18.0)
-                else:
-                    future[reg_name] = future[reg_name].fillna(0)
+    # History + future regressors, reindexed onto the prediction dates once
+    reg_names = [r for r in REGRESSOR_NAMES if r in df.columns] if req.include_regressors else []
+    reg_values = regressor_frame(df, req.future_regressors, reg_names, future["ds"])
+    for reg_name in reg_names:
+        future[reg_name] = reg_values[reg_name].to_numpy()
 
     # ── Predict ───────────────────────────────────────────────────────────
     logger.info("Generating predictions for %d total periods...", len(future))
     pred = model.predict(future)
+    return model, df, pred, reg_values
+
+
+def fit_prophet(req: ForecastRequest, with_cv: bool = True) -> ForecastResponse:
+    """Fit Prophet on ``req.historical`` and forecast ``req.horizon_days``.
+
+    Synchronous (CPU-bound), so async callers can run it in FIT_EXECUTOR.
+    ``with_cv=False`` skips the expanding-window CV refits; the metrics then
+    carry zeros for the CV errors.
+    """
+    model, df, pred, reg_values = fit_prophet_model(req)
 
     # ── Cross-validation metrics ──────────────────────────────────────────
-    cv_metrics = calculate_cv_metrics(model, df)
+    if with_cv:
+        cv_metrics = calculate_cv_metrics(model, df)
+    else:
+        cv_metrics = {"mape": 0, "rmse": 0, "mae": 0, "r_squared": 0}
     logger.info(
         "CV metrics: MAPE=%.1f%% MASE=%.3f DirAcc=%.0f%% R²=%.3f Bias=%.0f Stability=%.3f",
         cv_metrics["mape"] * 100, cv_metrics.get("mase", 0),
@@ -387,11 +458,10 @@ async def forecast(req: ForecastRequest, authorization: str = Header(default="")
     forecast_mask = pred["ds"] > last_historical_date
     forecast_df = pred[forecast_mask].copy()
 
-    # Merge future regressors for explanations
-    if req.include_regressors and req.future_regressors:
-        future_reg_df2 = pd.DataFrame(req.future_regressors)
-        future_reg_df2["ds"] = pd.to_datetime(future_reg_df2["ds"])
-        forecast_df = forecast_df.merge(future_reg_df2, on="ds", how="left", suffixes=("", "_reg"))
+    # Regressor values of the forecast days (explanations) and their summed effect
+    explain_regs = reg_values.loc[forecast_df["ds"]].to_dict("records")
+    effect_cols = [r for r in REGRESSOR_NAMES if r in forecast_df.columns]
+    reg_totals = forecast_df[effect_cols].sum(axis=1).to_numpy() if effect_cols else np.zeros(len(forecast_df))
 
     # Compute trend-only baseline for explanations
     trend_only = forecast_df["trend"].values if "trend" in forecast_df.columns else forecast_df["yhat"].values
@@ -400,20 +470,8 @@ async def forecast(req: ForecastRequest, authorization: str = Header(default="")
     for i, (_, row) in enumerate(forecast_df.iterrows()):
         base = float(trend_only[i]) if i < len(trend_only) else float(row["yhat"])
 
-        # Compute total regressor effect
-        reg_total = 0.0
-        for reg_name in REGRESSOR_NAMES:
-            col = f"{reg_name}" if f"{reg_name}" in row.index else None
-            extra_col = f"extra_regressors_{reg_name}" in str(row.index)
-            if col and not pd.isna(row.get(col, np.nan)):
-                pass  # regressor value exists
-            reg_effect_col = reg_name
-            if reg_effect_col in row.index:
-                val = row[reg_effect_col]
-                if isinstance(val, (int, float)) and not pd.isna(val):
-                    reg_total += val
-
-        explanation = build_explanation(row, base)
+        reg_total = float(reg_totals[i])
+        explanation = build_explanation(pd.Series({**explain_regs[i], "yhat": row["yhat"]}), base)
 
         forecast_points.append(
             ForecastPoint(
@@ -467,7 +525,7 @@ async def forecast(req: ForecastRequest, authorization: str = Header(default="")
 
     return ForecastResponse(
         success=True,
-        model_version="Prophet_v5_Real_ML",
+        model_version=batch_prophet.BATCH_MODEL_VERSION if req.backend == "batch" else "Prophet_v5_Real_ML",
         location_id=req.location_id,
         location_name=req.location_name,
         metrics=metrics,
@@ -476,12 +534,139 @@ async def forecast(req: ForecastRequest, authorization: str = Header(default="")
     )
 
 
+async def _daily_regressor_builder(supabase_url: str, headers_sb: dict, location_id: str):
+    """Return ``build_regs(dates) -> [{regressor: value}]`` for Prophet's daily regressors.
+
+    Rows are sliced from the shared calendar (calendar_index.py) with the
+    location's event_calendar holidays/events and weather_cache merged in
+    (both fetched concurrently); the calendar's generated holidays and a few
+    known events cover a failed query.
+    """
+    # Fallback events in case the DB query fails (sales impact deltas);
+    # fallback holidays are the calendar's generated national ones
+    EVENTS_FALLBACK = {
+        "2025-03-15":0.3,"2025-04-20":0.3,"2025-05-15":0.25,
+        "2025-07-10":0.4,"2025-07-11":0.4,"2025-07-12":0.4,
+        "2025-09-20":0.3,"2025-10-25":0.3,"2025-12-31":0.35,
+    }
+
+    client = supabase_rest.shared_client()
+    cal_resp, weather_resp = await asyncio.gather(
+        client.get(
+            f"{supabase_url}/rest/v1/event_calendar"
+            f"?select=event_date,event_type,impact_multiplier"
+            f"&order=event_date.asc",
+            headers=headers_sb, timeout=10,
+        ),
+        client.get(
+            f"{supabase_url}/rest/v1/weather_cache"
+            f"?location_id=eq.{location_id}"
+            f"&select=forecast_date,temperature_c,rain_mm,sales_multiplier"
+            f"&order=forecast_date.asc",
+            headers=headers_sb, timeout=10,
+        ),
+        return_exceptions=True,
+    )
+
+    # Holidays + events from event_calendar table (dynamic!)
+    HOLIDAYS: set[str] | None = None
+    EVENTS: dict[str, float] = {d: 1.0 + delta for d, delta in EVENTS_FALLBACK.items()}
+    try:
+        if isinstance(cal_resp, Exception):
+            raise cal_resp
+        if cal_resp.status_code < 400:
+            cal_data = cal_resp.json()
+            if cal_data and len(cal_data) > 0:
+                HOLIDAYS = set()
+                EVENTS = {}
+                for ev in cal_data:
+                    d = ev.get("event_date", "")
+                    etype = ev.get("event_type", "")
+                    impact = float(ev.get("impact_multiplier") or 1.0)
+                    if etype in ("holiday", "festivo_nacional", "festivo_local", "festivo_autonomico"):
+                        HOLIDAYS.add(d)
+                    if impact != 1.0:
+                        EVENTS[d] = impact
+                logger.info("Loaded %d holidays + %d events from event_calendar", len(HOLIDAYS), len(EVENTS))
+    except Exception as ce:
+        logger.warning("Could not load event_calendar: %s — using fallback", str(ce))
+
+    # FIX 2: REAL weather from weather_cache for future dates
+    weather_cache: dict[str, dict] = {}  # date -> {temp, rain}
+    try:
+        if isinstance(weather_resp, Exception):
+            raise weather_resp
+        if weather_resp.status_code < 400:
+            for w in weather_resp.json():
+                weather_cache[w["forecast_date"]] = {
+                    "temp": float(w.get("temperature_c") or 15),
+                    "rain": float(w.get("rain_mm") or 0),
+                    "multiplier": float(w.get("sales_multiplier") or 1.0),
+                }
+            logger.info("Loaded %d weather_cache entries", len(weather_cache))
+    except Exception as we:
+        logger.warning("Could not load weather_cache: %s", str(we))
+
+    calendar = CALENDAR.with_events(holidays=HOLIDAYS, events=EVENTS)
+    # float even when empty (an empty frame is object-typed, which np.round rejects)
+    weather = pd.DataFrame.from_dict(weather_cache, orient="index", columns=["temp", "rain"]).astype(float)
+
+    def build_regs(dates: list[str]) -> list[dict]:
+        cal = calendar.frame(to_ordinals(dates))
+        # Real weather where cached, otherwise the monthly normal
+        wx = weather.reindex(dates)
+        has_wx = wx["temp"].notna().to_numpy()
+        temp = np.where(has_wx, wx["temp"].to_numpy(), cal["temp_normal"].to_numpy())
+        is_rain = np.where(has_wx, wx["rain"].to_numpy() > 0.5, cal["month"].isin([3, 4, 10, 11]))
+        return pd.DataFrame({
+            "festivo": cal["is_holiday"].astype(int),
+            "day_before_festivo": cal["is_pre_holiday"].astype(int),
+            "evento_impact": (cal["event_multiplier"] - 1.0).round(2),  # multiplier -> delta
+            "payday": cal["is_payday"].astype(int),
+            "temperatura": np.round(temp, 1),
+            "rain": is_rain.astype(int),
+            "cold_day": (temp < 10).astype(int),
+            "weekend": (cal["dow"] >= 5).astype(int),
+            "mid_week": cal["dow"].isin([1, 2]).astype(int),
+        }).to_dict("records")
+
+    return build_regs
+
+
+# Per-tenant cross-location panels, keyed by (supabase_url, org_id) and
+# refreshed incrementally (cross_location / pooled)
+PANEL_STORE = PanelStore()
+
+
+async def _location_org(supabase_url: str, headers_sb: dict, location_id: str) -> str | None:
+    """The org (locations.org_id) a location belongs to, or None if unknown."""
+    resp = await supabase_rest.shared_client().get(
+        f"{supabase_url}/rest/v1/locations?id=eq.{location_id}&select=org_id", headers=headers_sb,
+    )
+    rows = resp.json() if resp.status_code < 400 else []
+    return str(rows[0]["org_id"]) if rows and rows[0].get("org_id") else None
+
+
+def _panel_fetcher(supabase_url: str, headers_sb: dict, org_id: str):
+    """``fetch(since, on_page)`` over the org's sales_daily_unified rows (all its locations), for PANEL_STORE."""
+    url_all = (
+        f"{supabase_url}/rest/v1/sales_daily_unified"
+        f"?select=date,net_sales,orders_count,location_id"
+        f"&org_id=eq.{org_id}"
+        f"&order=date.asc,location_id.asc&net_sales=gt.0"
+    )
+
+    async def fetch(since, on_page):
+        url = url_all if since is None else f"{url_all}&date=gte.{since}"
+        await supabase_rest.fetch_pages(supabase_rest.shared_client(), url, headers_sb, on_page=on_page)
+
+    return fetch
+
+
 @app.post("/forecast_supabase")
 async def forecast_supabase(req: dict, authorization: str = Header(default="")):
     """Full pipeline: fetch from Supabase, run Prophet, store results.
     Designed to be called by Edge Functions that can't handle 60s timeout."""
-    import httpx
-
     if API_KEY and not authorization.endswith(API_KEY):
         raise HTTPException(status_code=401, detail="Invalid API key")
 
@@ -493,9 +678,13 @@ async def forecast_supabase(req: dict, authorization: str = Header(default="")):
     seasonality_mode = req.get("seasonality_mode", "multiplicative")
     changepoint_prior_scale = req.get("changepoint_prior_scale", 0.05)
     cross_location = req.get("cross_location", False)  # Multi-location learning
+    org_id = req.get("org_id")  # cross_location pools this org's locations (default: the location's org)
+    backend = req.get("backend", "prophet")  # "batch" = in-process MAP fit (batch_prophet)
 
     if not supabase_url or not supabase_key:
         raise HTTPException(status_code=400, detail="supabase_url and supabase_key required")
+    if backend not in ("prophet", "batch"):
+        raise HTTPException(status_code=400, detail=f"Unknown backend {backend!r} (expected 'prophet' or 'batch')")
 
     logger.info("forecast_supabase: location=%s, horizon=%d", location_name or location_id, horizon_days)
 
@@ -506,27 +695,6 @@ async def forecast_supabase(req: dict, authorization: str = Header(default="")):
         "Authorization": f"Bearer {supabase_key}",
     }
 
-    async def _fetch_paginated(client, table_url):
-        """Fetch paginated data from a Supabase REST endpoint."""
-        rows = []
-        pg = 0
-        while True:
-            resp = await client.get(
-                table_url,
-                headers={**headers_sb, "Range": f"{pg*1000}-{(pg+1)*1000-1}"},
-            )
-            if resp.status_code >= 400:
-                logger.warning("REST API error %d: %s", resp.status_code, resp.text[:200])
-                return None
-            batch = resp.json()
-            if not batch:
-                break
-            rows.extend(batch)
-            pg += 1
-            if len(batch) < 1000:
-                break
-        return rows
-
     sales_data = []
     daily_orders: dict[str, int] = {}
     source_table = "unknown"
@@ -534,81 +702,55 @@ async def forecast_supabase(req: dict, authorization: str = Header(default="")):
     loc_offset = 0.0  # Normalization offset for multi-location
 
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            if cross_location:
-                # ── MULTI-LOCATION LEARNING: Fetch all locations, normalize ──
-                # 1. Fetch target location data first
-                url_target = (
-                    f"{supabase_url}/rest/v1/sales_daily_unified"
-                    f"?location_id=eq.{location_id}"
-                    f"&select=date,net_sales,orders_count"
-                    f"&order=date.asc&net_sales=gt.0"
-                )
-                target_data = await _fetch_paginated(client, url_target)
-                if not target_data or len(target_data) == 0:
-                    raise HTTPException(status_code=400,
-                        detail=f"No sales data for target location {location_name}")
-
-                # 2. Fetch ALL locations' data
-                url_all = (
-                    f"{supabase_url}/rest/v1/sales_daily_unified"
-                    f"?select=date,net_sales,orders_count,location_id"
-                    f"&order=date.asc&net_sales=gt.0"
-                )
-                all_data = await _fetch_paginated(client, url_all)
-
-                # 3. Normalize: compute per-location mean, scale everything to target location's mean
-                from collections import defaultdict
-                loc_totals: dict[str, list[float]] = defaultdict(list)
-                for r in (all_data or []):
-                    loc_totals[str(r.get("location_id", ""))].append(float(r.get("net_sales") or 0))
-
-                target_mean = sum(float(r.get("net_sales") or 0) for r in target_data) / max(len(target_data), 1)
-                loc_scale = target_mean if target_mean > 0 else 1.0
-
-                # Combine all locations' data, normalized to target location's scale
-                combined_daily: dict[str, list[float]] = defaultdict(list)
-                for r in (all_data or []):
-                    loc_id = str(r.get("location_id", ""))
-                    loc_mean = sum(loc_totals[loc_id]) / max(len(loc_totals[loc_id]), 1)
-                    scale_factor = target_mean / loc_mean if loc_mean > 0 else 1.0
-                    date_str = str(r["date"])[:10]
-                    # Scale this location's sales to target location's magnitude
-                    combined_daily[date_str].append(float(r.get("net_sales") or 0) * scale_factor)
-
-                # Average across locations per date (more data = more robust)
-                sales_data = []
-                for date_str in sorted(combined_daily.keys()):
-                    avg_sales = sum(combined_daily[date_str]) / len(combined_daily[date_str])
-                    sales_data.append({"date": date_str, "net_sales": avg_sales, "orders_count": 0})
-
-                source_table = f"sales_daily_unified (cross-location: {len(loc_totals)} locations)"
-                logger.info("Cross-location: combined %d locations, %d days", len(loc_totals), len(sales_data))
-
-                # Rebuild orders from target only
-                for r in target_data:
-                    date_str = str(r["date"])[:10]
-                    daily_orders[date_str] = int(r.get("orders_count") or 0)
+        if cross_location:
+            # ── MULTI-LOCATION LEARNING: all locations from the tenant's panel ──
+            # The (date × location) panel is kept between requests; only the
+            # last few days are fetched again on each call.
+            org_id = org_id or await _location_org(supabase_url, headers_sb, location_id)
+            if not org_id:
+                raise HTTPException(status_code=400,
+                    detail="cross_location needs org_id (or a location with a known org)")
+            panel = await PANEL_STORE.get(
+                (supabase_url, org_id), _panel_fetcher(supabase_url, headers_sb, org_id), datetime.utcnow(),
+            )
+            target_data = panel.location_daily(str(location_id))
+            if not target_data:
+                raise HTTPException(status_code=400,
+                    detail=f"No sales data for target location {location_name}")
+
+            # Normalize: scale every location to the target location's mean
+            target_mean = panel.location_mean(str(location_id))
+            loc_scale = target_mean if target_mean > 0 else 1.0
+
+            # Average across locations per date (more data = more robust)
+            sales_data = panel.combined_daily(target_mean)
+
+            source_table = f"sales_daily_unified (cross-location: {panel.n_locations} locations)"
+            logger.info("Cross-location: combined %d locations, %d days", panel.n_locations, len(sales_data))
+
+            # Rebuild orders from target only
+            for r in target_data:
+                daily_orders[r["date"]] = r["orders_count"]
+        else:
+            # ── SINGLE LOCATION (original behavior) ──
+            url = (
+                f"{supabase_url}/rest/v1/sales_daily_unified"
+                f"?location_id=eq.{location_id}"
+                f"&select=date,net_sales,orders_count,avg_check,labor_cost,labor_hours"
+                f"&order=date.asc"
+                f"&net_sales=gt.0"
+            )
+            result = await supabase_rest.fetch_pages(supabase_rest.shared_client(), url, headers_sb)
+            if result:
+                sales_data = result
+                source_table = "sales_daily_unified"
+                logger.info("Using sales_daily_unified: %d daily records", len(sales_data))
             else:
-                # ── SINGLE LOCATION (original behavior) ──
-                url = (
-                    f"{supabase_url}/rest/v1/sales_daily_unified"
-                    f"?location_id=eq.{location_id}"
-                    f"&select=date,net_sales,orders_count,avg_check,labor_cost,labor_hours"
-                    f"&order=date.asc"
-                    f"&net_sales=gt.0"
+                logger.warning("sales_daily_unified returned no data for location %s", location_id)
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"No sales data found in sales_daily_unified for location {location_name or location_id}"
                 )
-                result = await _fetch_paginated(client, url)
-                if result and len(result) > 0:
-                    sales_data = result
-                    source_table = "sales_daily_unified"
-                    logger.info("Using sales_daily_unified: %d daily records", len(sales_data))
-                else:
-                    logger.warning("sales_daily_unified returned no data for location %s", location_id)
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"No sales data found in sales_daily_unified for location {location_name or location_id}"
-                    )
 
     except HTTPException:
         raise
@@ -635,106 +777,12 @@ async def forecast_supabase(req: dict, authorization: str = Header(default="")):
         raise HTTPException(status_code=400, detail=f"Need 14+ days, got {len(dates)}")
 
     # ── Build regressors (dynamic from event_calendar + weather_cache) ──
-    # Fallback holidays/events in case DB query fails
-    HOLIDAYS_FALLBACK = {
-        "2025-01-01","2025-01-06","2025-04-18","2025-04-21","2025-05-01",
-        "2025-05-02","2025-05-15","2025-08-15","2025-10-12","2025-11-01",
-        "2025-11-09","2025-12-06","2025-12-08","2025-12-25","2025-12-26",
-        "2026-01-01","2026-01-06","2026-02-09","2026-04-03","2026-04-06",
-        "2026-05-01","2026-08-15","2026-10-12","2026-11-01","2026-12-06",
-        "2026-12-08","2026-12-25",
-    }
-    EVENTS_FALLBACK = {
-        "2025-03-15":0.3,"2025-04-20":0.3,"2025-05-15":0.25,
-        "2025-07-10":0.4,"2025-07-11":0.4,"2025-07-12":0.4,
-        "2025-09-20":0.3,"2025-10-25":0.3,"2025-12-31":0.35,
-    }
-    MONTH_TEMPS = {1:6,2:8,3:12,4:14,5:19,6:25,7:30,8:29,9:23,10:16,11:10,12:7}
-
-    # Fetch holidays + events from event_calendar table (dynamic!)
-    HOLIDAYS: set[str] = set(HOLIDAYS_FALLBACK)
-    EVENTS: dict[str, float] = dict(EVENTS_FALLBACK)
-    try:
-        async with httpx.AsyncClient(timeout=10) as ec:
-            cal_url = (
-                f"{supabase_url}/rest/v1/event_calendar"
-                f"?select=event_date,event_type,impact_multiplier"
-                f"&order=event_date.asc"
-            )
-            resp = await ec.get(cal_url, headers=headers_sb)
-            if resp.status_code < 400:
-                cal_data = resp.json()
-                if cal_data and len(cal_data) > 0:
-                    HOLIDAYS = set()
-                    EVENTS = {}
-                    for ev in cal_data:
-                        d = ev.get("event_date", "")
-                        etype = ev.get("event_type", "")
-                        impact = float(ev.get("impact_multiplier") or 1.0)
-                        if etype in ("holiday", "festivo_nacional", "festivo_local", "festivo_autonomico"):
-                            HOLIDAYS.add(d)
-                        if impact != 1.0:
-                            EVENTS[d] = round(impact - 1.0, 2)  # Convert multiplier to delta
-                    logger.info("Loaded %d holidays + %d events from event_calendar", len(HOLIDAYS), len(EVENTS))
-    except Exception as ce:
-        logger.warning("Could not load event_calendar: %s — using fallback", str(ce))
+    build_regs = await _daily_regressor_builder(supabase_url, headers_sb, location_id)
 
-    # FIX 2: Fetch REAL weather from weather_cache for future dates
-    weather_cache: dict[str, dict] = {}  # date -> {temp, rain}
-    try:
-        async with httpx.AsyncClient(timeout=10) as wc:
-            weather_url = (
-                f"{supabase_url}/rest/v1/weather_cache"
-                f"?location_id=eq.{location_id}"
-                f"&select=forecast_date,temperature_c,rain_mm,sales_multiplier"
-                f"&order=forecast_date.asc"
-            )
-            resp = await wc.get(weather_url, headers=headers_sb)
-            if resp.status_code < 400:
-                for w in resp.json():
-                    weather_cache[w["forecast_date"]] = {
-                        "temp": float(w.get("temperature_c") or 15),
-                        "rain": float(w.get("rain_mm") or 0),
-                        "multiplier": float(w.get("sales_multiplier") or 1.0),
-                    }
-                logger.info("Loaded %d weather_cache entries", len(weather_cache))
-    except Exception as we:
-        logger.warning("Could not load weather_cache: %s", str(we))
-
-    def build_regs(ds: str) -> dict:
-        from datetime import date as ddate
-        d = ddate.fromisoformat(ds)
-        dow = d.weekday()  # 0=Mon
-        m = d.month
-        dy = d.day
-        nd = (d + timedelta(days=1)).isoformat()
-        # Use real weather if available, otherwise monthly average
-        if ds in weather_cache:
-            temp = weather_cache[ds]["temp"]
-            rain_mm = weather_cache[ds]["rain"]
-            is_rain = int(rain_mm > 0.5)
-        else:
-            temp = MONTH_TEMPS.get(m, 15)
-            rain_mm = 0
-            is_rain = int(m in (3, 4, 10, 11))
-        return {
-            "festivo": int(ds in HOLIDAYS),
-            "day_before_festivo": int(nd in HOLIDAYS),
-            "evento_impact": EVENTS.get(ds, 0),
-            "payday": int(dy == 1 or dy == 15 or dy >= 25),
-            "temperatura": round(temp, 1),
-            "rain": is_rain,
-            "cold_day": int(temp < 10),
-            "weekend": int(dow >= 5),
-            "mid_week": int(dow in (1, 2)),
-        }
-
-    historical = [{"ds": d, "y": round(daily[d], 2), **build_regs(d)} for d in dates]
+    historical = [{"ds": d, "y": round(daily[d], 2), **regs} for d, regs in zip(dates, build_regs(dates))]
     today = datetime.utcnow().date()
-    future_regressors = [
-        {"ds": (today + timedelta(days=k)).isoformat(), **build_regs((today + timedelta(days=k)).isoformat())}
-        for k in range(1, horizon_days + 1)
-    ]
+    future_dates = [(today + timedelta(days=k)).isoformat() for k in range(1, horizon_days + 1)]
+    future_regressors = [{"ds": d, **regs} for d, regs in zip(future_dates, build_regs(future_dates))]
 
     # ── Call the existing forecast logic ──────────────────────────────
     forecast_req = ForecastRequest(
@@ -750,6 +798,7 @@ async def forecast_supabase(req: dict, authorization: str = Header(default="")):
         seasonality_mode=seasonality_mode,
         changepoint_prior_scale=changepoint_prior_scale,
         include_regressors=True,
+        backend=backend,
     )
 
     result = await forecast(forecast_req, authorization=authorization)
@@ -788,43 +837,37 @@ async def forecast_supabase(req: dict, authorization: str = Header(default="")):
             "generated_at": datetime.utcnow().isoformat(),
         })
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        # Delete old forecasts
-        await client.delete(
-            f"{supabase_url}/rest/v1/forecast_daily_metrics"
-            f"?location_id=eq.{location_id}&date=gte.{today_str}",
-            headers={**headers_sb, "Prefer": "return=minimal"},
-        )
+    client = supabase_rest.shared_client()
+    # Delete old forecasts
+    await client.delete(
+        f"{supabase_url}/rest/v1/forecast_daily_metrics"
+        f"?location_id=eq.{location_id}&date=gte.{today_str}",
+        headers={**headers_sb, "Prefer": "return=minimal"},
+    )
 
-        # Insert in batches
-        for i in range(0, len(forecasts_to_store), 500):
-            batch = forecasts_to_store[i:i + 500]
-            resp = await client.post(
-                f"{supabase_url}/rest/v1/forecast_daily_metrics",
-                headers={**headers_sb, "Content-Type": "application/json", "Prefer": "return=minimal"},
-                json=batch,
-            )
-            if resp.status_code >= 400:
-                logger.error("Insert error: %s", resp.text[:200])
+    # Insert in batches
+    await supabase_rest.upsert(
+        client, f"{supabase_url}/rest/v1/forecast_daily_metrics", headers_sb, forecasts_to_store, on_conflict=None,
+    )
 
-        # Log model run
-        await client.post(
-            f"{supabase_url}/rest/v1/forecast_model_runs",
-            headers={**headers_sb, "Content-Type": "application/json", "Prefer": "return=minimal"},
-            json={
-                "location_id": location_id,
-                "model_version": "Prophet_v5_Real_ML",
-                "algorithm": "Facebook_Prophet_ML",
-                "history_start": dates[0],
-                "history_end": dates[-1],
-                "horizon_days": horizon_days,
-                "mse": result.metrics.rmse ** 2,
-                "mape": result.metrics.mape,
-                "confidence": round(result.metrics.r_squared * 100),
-                "data_points": len(dates),
-                "trend_slope": result.metrics.trend_slope_avg,
-            },
-        )
+    # Log model run
+    await client.post(
+        f"{supabase_url}/rest/v1/forecast_model_runs",
+        headers={**headers_sb, "Content-Type": "application/json", "Prefer": "return=minimal"},
+        json={
+            "location_id": location_id,
+            "model_version": result.model_version,
+            "algorithm": batch_prophet.BATCH_ALGORITHM if backend == "batch" else "Facebook_Prophet_ML",
+            "history_start": dates[0],
+            "history_end": dates[-1],
+            "horizon_days": horizon_days,
+            "mse": result.metrics.rmse ** 2,
+            "mape": result.metrics.mape,
+            "confidence": round(result.metrics.r_squared * 100),
+            "data_points": len(dates),
+            "trend_slope": result.metrics.trend_slope_avg,
+        },
+    )
 
     logger.info("Stored %d forecasts for %s", len(forecasts_to_store), location_name)
 
@@ -851,68 +894,250 @@ async def forecast_supabase(req: dict, authorization: str = Header(default="")):
     }
 
 
-@app.post("/forecast_hourly")
-async def forecast_hourly(req: dict, authorization: str = Header(default="")):
-    """Hourly forecast pipeline with champion/challenger per bucket.
+@app.post("/forecast_pooled")
+async def forecast_pooled(req: dict, authorization: str = Header(default="")):
+    """Every location of an org from ONE pooled Prophet fit, stored per location.
 
-    1. Fetch facts_sales_15m → aggregate to hourly
-    2. Train LightGBM (global) + Seasonal Naive (baseline)
-    3. Evaluate per bucket (DOW × HOUR) → model registry
-    4. Predict future hours using registry winners
-    5. Store: forecast_hourly_metrics + forecast_daily_metrics (backwards compat)
-    6. Store: forecast_model_registry + forecast_model_runs (audit)
+    The org's (date × location) panel (PANEL_STORE, only rows with that
+    org_id) is scaled per location and averaged into one index series. Prophet
+    is fitted once on it with the event_calendar / weather regressors, and
+    each location gets its own level and trend on the pooled prediction (see
+    pooled_forecast.py). There are no CV refits; the stored metrics are
+    in-sample over each location's trend window.
+
+    The weather and event regressors are those of ONE location,
+    weather_location_id (default: the first pooled location); the response
+    reports which. Requested locations outside the org have no rows in its
+    panel, so they are skipped and their forecasts are never touched.
+
+    Body: supabase_url, supabase_key, org_id, location_ids? (default: every
+    location of the org with sales), location_names? ({location_id: name}),
+    weather_location_id?, horizon_days? (default 90), seasonality_mode?,
+    changepoint_prior_scale?
     """
-    import httpx
-    from hourly_forecaster import HourlyForecaster
+    import time
+
+    import pooled_forecast
 
+    t_start = time.perf_counter()
     if API_KEY and not authorization.endswith(API_KEY):
         raise HTTPException(status_code=401, detail="Invalid API key")
 
     supabase_url = req.get("supabase_url")
     supabase_key = req.get("supabase_key")
-    location_id = req.get("location_id", "")
-    location_name = req.get("location_name", "")
-    horizon_days = req.get("horizon_days", 14)
-    req_data_source = req.get("data_source")  # 'demo' | 'pos' | None
-    req_org_id = req.get("org_id")            # uuid string | None
+    org_id = req.get("org_id")
+    location_names = req.get("location_names") or {}
+    horizon_days = req.get("horizon_days", 90)
 
     if not supabase_url or not supabase_key:
         raise HTTPException(status_code=400, detail="supabase_url and supabase_key required")
+    if not org_id:
+        raise HTTPException(status_code=400, detail="org_id required")
+
+    headers_sb = _supabase_headers(supabase_key)
+    try:
+        panel = await PANEL_STORE.get(
+            (supabase_url, org_id), _panel_fetcher(supabase_url, headers_sb, org_id), datetime.utcnow(),
+        )
+    except Exception as e:
+        logger.error("Error fetching from Supabase: %s", str(e))
+        raise HTTPException(status_code=502, detail=f"Error fetching from Supabase: {str(e)}")
+
+    requested = [str(l) for l in req.get("location_ids") or panel.locations]
+    location_ids = [l for l in requested if panel.location_mean(l) > 0]
+    if not location_ids:
+        raise HTTPException(status_code=400, detail="No sales data for the requested locations")
 
+    # ── Pooled index: every location scaled to a mean of 1, averaged per date ──
+    index_rows = panel.combined_daily(1.0, locations=location_ids)
+    dates = [r["date"] for r in index_rows]
+    if len(dates) < 14:
+        raise HTTPException(status_code=400, detail=f"Need 14+ days, got {len(dates)}")
+    logger.info("forecast_pooled: %d locations, %d days, horizon=%d", len(location_ids), len(dates), horizon_days)
+
+    weather_location_id = str(req.get("weather_location_id") or location_ids[0])
+    if weather_location_id not in location_ids:
+        raise HTTPException(status_code=400, detail="weather_location_id must be one of the pooled locations")
+    build_regs = await _daily_regressor_builder(supabase_url, headers_sb, weather_location_id)
+    fetch_ms = (time.perf_counter() - t_start) * 1000
+
+    today = datetime.utcnow().date()
+    future_dates = [(today + timedelta(days=k)).isoformat() for k in range(1, horizon_days + 1)]
+    pooled_req = ForecastRequest(
+        historical=[{"ds": d, "y": r["net_sales"], **regs} for d, r, regs in zip(dates, index_rows, build_regs(dates))],
+        horizon_days=horizon_days,
+        future_regressors=[{"ds": d, **regs} for d, regs in zip(future_dates, build_regs(future_dates))],
+        location_id="pooled",
+        location_name=f"{len(location_ids)} locations",
+        freq="D",
+        yearly_seasonality=len(dates) >= 365,
+        weekly_seasonality=True,
+        daily_seasonality=False,
+        seasonality_mode=req.get("seasonality_mode", "multiplicative"),
+        changepoint_prior_scale=req.get("changepoint_prior_scale", 0.05),
+        include_regressors=True,
+    )
+    t_fit = time.perf_counter()
+    _, _, pred, _ = await asyncio.get_running_loop().run_in_executor(FIT_EXECUTOR, fit_prophet_model, pooled_req)
+    fit_ms = (time.perf_counter() - t_fit) * 1000
+
+    # ── Per-location level/trend on the pooled prediction ──
+    pred_ords = to_ordinals(pred["ds"].to_numpy())
+    g, g_lower, g_upper = (pred[c].to_numpy() for c in ("yhat", "yhat_lower", "yhat_upper"))
+    horizon = pred_ords > to_ordinals(dates[-1:])[0]
+    horizon_dates = pred["ds"][horizon].dt.strftime("%Y-%m-%d").tolist()
+
+    generated_at = datetime.utcnow().isoformat()
+    forecasts_to_store = []
+    model_runs = []
+    summaries = []
+    for loc_id in location_ids:
+        history = panel.location_daily(loc_id)
+        ords = to_ordinals([r["date"] for r in history])
+        sales = np.array([r["net_sales"] for r in history])
+        loc_mean = panel.location_mean(loc_id)
+        fit = pooled_forecast.fit_location(ords, sales, loc_mean, g[np.searchsorted(pred_ords, ords)])
+        yhat, lower, upper = pooled_forecast.location_forecast(
+            fit, loc_mean, pred_ords[horizon], g[horizon], g_lower[horizon], g_upper[horizon],
+        )
+
+        total_orders = sum(r["orders_count"] for r in history)
+        avg_check = float(sales.sum()) / max(total_orders, 1)
+        confidence = round(max(fit["r_squared"], 0.0) * 100)
+        for d, y, lo, hi in zip(horizon_dates, yhat, lower, upper):
+            target_labour = y * (TARGET_COL_PERCENT / 100)
+            forecasts_to_store.append({
+                "location_id": loc_id,
+                "date": d,
+                "forecast_sales": round(float(y), 2),
+                "forecast_orders": max(1, round(y / avg_check)) if avg_check > 0 else 0,
+                "forecast_sales_lower": round(float(lo), 2),
+                "forecast_sales_upper": round(float(hi), 2),
+                "planned_labor_hours": round(max(20, min(120, target_labour / AVG_HOURLY_RATE)), 1),
+                "planned_labor_cost": round(float(target_labour), 2),
+                "model_version": pooled_forecast.POOLED_MODEL_VERSION,
+                "confidence": confidence,
+                "mape": round(fit["mape"], 4),
+                "mse": round(fit["rmse"] ** 2, 2),
+                "explanation": f"Pooled ({len(location_ids)} locations): level {fit['level']:.2f}, "
+                               f"trend {fit['slope'] * 100:+.0f}%/yr",
+                "generated_at": generated_at,
+            })
+        model_runs.append({
+            "location_id": loc_id,
+            "model_version": pooled_forecast.POOLED_MODEL_VERSION,
+            "algorithm": "Facebook_Prophet_Pooled",
+            "history_start": history[0]["date"],
+            "history_end": history[-1]["date"],
+            "horizon_days": horizon_days,
+            "mse": round(fit["rmse"] ** 2, 2),
+            "mape": round(fit["mape"], 4),
+            "confidence": confidence,
+            "data_points": len(history),
+            "trend_slope": round(fit["slope"] * loc_mean / 365.0, 4),  # EUR/day
+        })
+        summaries.append({
+            "location_id": loc_id,
+            "location_name": location_names.get(loc_id, ""),
+            "data_points": len(history),
+            "level": round(fit["level"], 4),
+            "trend_per_year": round(fit["slope"], 4),
+            "mape": f"{fit['mape'] * 100:.1f}%",
+            "r_squared": f"{fit['r_squared']:.3f}",
+        })
+
+    # ── Store: one delete and one batched insert for all locations ──
+    t_store = time.perf_counter()
+    client = supabase_rest.shared_client()
+    rest = f"{supabase_url}/rest/v1"
+    await client.delete(
+        f"{rest}/forecast_daily_metrics"
+        f"?location_id=in.({','.join(location_ids)})&date=gte.{today.isoformat()}",
+        headers={**headers_sb, "Prefer": "return=minimal"},
+    )
+    stored, _ = await asyncio.gather(
+        supabase_rest.upsert(client, f"{rest}/forecast_daily_metrics", headers_sb, forecasts_to_store, on_conflict=None),
+        supabase_rest.upsert(client, f"{rest}/forecast_model_runs", headers_sb, model_runs, on_conflict=None),
+    )
+    store_ms = (time.perf_counter() - t_store) * 1000
+
+    timings = {
+        "total_ms": round((time.perf_counter() - t_start) * 1000, 1),
+        "stages": {
+            "fetch": {"ms": round(fetch_ms, 1), "calls": 1},
+            "fit_prophet": {"ms": round(fit_ms, 1), "calls": 1},
+            "store": {"ms": round(store_ms, 1), "calls": 1},
+        },
+    }
+    STAGE_METRICS.record(timings, kind="pooled")
     logger.info(
-        "forecast_hourly: location=%s, horizon=%d days, ds=%s",
-        location_name or location_id, horizon_days, req_data_source,
+        "Pooled forecast: %d locations, %d rows in %.0f ms (fit %.0f ms)",
+        len(location_ids), stored, timings["total_ms"], fit_ms,
     )
 
-    # ── Resolve data_source ──────────────────────────────────────────
-    headers_sb = {
+    return {
+        "success": True,
+        "model_version": pooled_forecast.POOLED_MODEL_VERSION,
+        "org_id": org_id,
+        "locations": len(location_ids),
+        "skipped": [l for l in requested if l not in location_ids],
+        "weather_location_id": weather_location_id,
+        "data_points": len(dates),
+        "forecasts_stored": stored,
+        "timings": timings,
+        "results": summaries,
+    }
+
+
+# ─── Hourly pipeline helpers (shared by single and batch endpoints) ──────────
+
+HOURLY_MODEL_VERSION = "HourlyEngine_v1.0"
+HOURLY_MODEL_STORE = HourlyModelStore()  # MODEL_STORE_DIR
+# Per-worker stage timings of hourly runs, served by /metrics
+STAGE_METRICS = StageMetrics()
+TARGET_COL_PERCENT = 28
+AVG_HOURLY_RATE = 14.5
+
+
+def _supabase_headers(supabase_key: str) -> dict:
+    return {
         "apikey": supabase_key,
         "Authorization": f"Bearer {supabase_key}",
     }
+
+
+async def _resolve_data_source(
+    supabase_url: str, headers_sb: dict, req_data_source: str | None, req_org_id: str | None,
+) -> str:
+    """Explicit data_source wins; otherwise ask the resolve_data_source RPC."""
     ds = req_data_source  # may be None
     if not ds and req_org_id:
-        # Call resolve_data_source RPC
         try:
-            import httpx as _httpx
-            async with _httpx.AsyncClient(timeout=10) as _client:
-                rpc_resp = await _client.post(
-                    f"{supabase_url}/rest/v1/rpc/resolve_data_source",
-                    headers={**headers_sb, "Content-Type": "application/json"},
-                    json={"p_org_id": req_org_id},
-                )
-                if rpc_resp.status_code == 200:
-                    ds = rpc_resp.json().get("data_source", "demo")
-                else:
-                    logger.warning("resolve_data_source RPC failed: %s", rpc_resp.text[:200])
-                    ds = "demo"
+            rpc_resp = await supabase_rest.shared_client().post(
+                f"{supabase_url}/rest/v1/rpc/resolve_data_source",
+                headers={**headers_sb, "Content-Type": "application/json"},
+                json={"p_org_id": req_org_id},
+            )
+            if rpc_resp.status_code == 200:
+                ds = rpc_resp.json().get("data_source", "demo")
+            else:
+                logger.warning("resolve_data_source RPC failed: %s", rpc_resp.text[:200])
+                ds = "demo"
         except Exception as e:
             logger.warning("resolve_data_source failed, defaulting to demo: %s", e)
             ds = "demo"
-    if not ds:
-        ds = "demo"
-    logger.info("Resolved data_source=%s for location=%s", ds, location_name or location_id)
+    return ds or "demo"
+
+
+def _parse_time_hour(t: str) -> int:
+    """Extract hour from 'HH:MM' or 'HH:MM:SS' string."""
+    return int(t.split(":")[0])
+
+
+async def _fetch_service_hours(supabase_url: str, headers_sb: dict, location_id: str) -> list[int]:
+    """Hours of day inside the location's open service window [open, close)."""
+    from hourly_forecaster import service_hour_mask
 
-    # ── Fetch location_hours (open/close/prep) ────────────────────
     location_hours = {
         "tz": "Europe/Madrid",
         "open_time": "12:00",
@@ -921,233 +1146,202 @@ async def forecast_hourly(req: dict, authorization: str = Header(default="")):
         "prep_end": "12:00",
     }
     try:
-        import httpx as _httpx
-        async with _httpx.AsyncClient(timeout=10) as _client:
-            lh_resp = await _client.get(
-                f"{supabase_url}/rest/v1/location_hours"
-                f"?location_id=eq.{location_id}"
-                f"&select=tz,open_time,close_time,prep_start,prep_end",
-                headers=headers_sb,
-            )
-            if lh_resp.status_code == 200:
-                rows = lh_resp.json()
-                if rows:
-                    location_hours = rows[0]
-                    logger.info("Fetched location_hours: %s", location_hours)
+        lh_resp = await supabase_rest.shared_client().get(
+            f"{supabase_url}/rest/v1/location_hours"
+            f"?location_id=eq.{location_id}"
+            f"&select=tz,open_time,close_time,prep_start,prep_end",
+            headers=headers_sb,
+        )
+        if lh_resp.status_code == 200:
+            rows = lh_resp.json()
+            if rows:
+                location_hours = rows[0]
+                logger.info("Fetched location_hours: %s", location_hours)
     except Exception as e:
         logger.warning("Failed to fetch location_hours, using defaults: %s", e)
 
-    # Parse hours as integers for mask
-    def _parse_time_hour(t: str) -> int:
-        """Extract hour from 'HH:MM' or 'HH:MM:SS' string."""
-        return int(t.split(":")[0])
-
     open_hour = _parse_time_hour(location_hours.get("open_time", "12:00"))
     close_hour = _parse_time_hour(location_hours.get("close_time", "23:00"))
-    prep_start_hour = _parse_time_hour(location_hours.get("prep_start", "09:00"))
-    prep_end_hour = _parse_time_hour(location_hours.get("prep_end", "12:00"))
 
-    def is_service_hour(hour: int) -> bool:
-        """True if hour is within open service window [open, close)."""
-        if open_hour <= close_hour:
-            return open_hour <= hour < close_hour
-        # Wraps midnight (e.g. 20:00 - 02:00)
-        return hour >= open_hour or hour < close_hour
+    logger.info("Open hours mask: service=[%d,%d)", open_hour, close_hour)
+    # Wraps midnight (e.g. 20:00 - 02:00)
+    return np.flatnonzero(service_hour_mask(open_hour, close_hour)).tolist()
 
-    def is_prep_hour(hour: int) -> bool:
-        """True if hour is within prep window [prep_start, prep_end)."""
-        return prep_start_hour <= hour < prep_end_hour
 
-    logger.info(
-        "Open hours mask: service=[%d,%d), prep=[%d,%d)",
-        open_hour, close_hour, prep_start_hour, prep_end_hour,
-    )
+async def _fetch_sales_15m(client, supabase_url: str, headers_sb: dict, location_id: str):
+    """Page facts_sales_15m into a HourlyAccumulator (pages are dropped as folded)."""
+    from hourly_forecaster import HourlyAccumulator
 
-    # ── Fetch facts_sales_15m (paginated) ────────────────────────────
-    sales_data = []
-    page = 0
-    async with httpx.AsyncClient(timeout=30) as client:
-        while True:
-            url = (
-                f"{supabase_url}/rest/v1/facts_sales_15m"
-                f"?location_id=eq.{location_id}"
-                f"&select=ts_bucket,sales_net,tickets"
-                f"&order=ts_bucket.asc"
-            )
-            resp = await client.get(
-                url,
-                headers={**headers_sb, "Range": f"{page*1000}-{(page+1)*1000-1}"},
-            )
-            resp.raise_for_status()
-            rows = resp.json()
-            if not rows:
-                break
-            sales_data.extend(rows)
-            page += 1
-            if len(rows) < 1000:
-                break
-
-    logger.info("Fetched %d 15-min records in %d pages", len(sales_data), page)
-
-    if len(sales_data) < 24 * 7:  # minimum ~1 week of hourly data
-        raise HTTPException(
-            status_code=400,
-            detail=f"Need at least 1 week of 15-min data, got {len(sales_data)} records",
-        )
+    sales_acc = HourlyAccumulator()
+    url = (
+        f"{supabase_url}/rest/v1/facts_sales_15m"
+        f"?location_id=eq.{location_id}"
+        f"&select=ts_bucket,sales_net,tickets"
+        f"&order=ts_bucket.asc"
+    )
+    await supabase_rest.fetch_pages(client, url, headers_sb, on_page=sales_acc.add)
 
-    # ── Run hourly forecaster (with data-availability gating) ───────
-    forecaster = HourlyForecaster(location_id=location_id, location_name=location_name)
-    result = forecaster.run(sales_data, horizon_days=horizon_days, enable_gating=True)
+    logger.info("Fetched %d 15-min records for %s", sales_acc.n_rows, location_id)
+    return sales_acc
 
-    if not result.get("success"):
-        raise HTTPException(status_code=400, detail=result.get("error", "Forecast failed"))
 
-    # ── Store results in Supabase ────────────────────────────────────
-    today_str = datetime.utcnow().date().isoformat()
-    TARGET_COL_PERCENT = 28
-    AVG_HOURLY_RATE = 14.5
+def _hourly_rows(result: dict, location_id: str, ds: str) -> list[dict]:
+    """forecast_hourly_metrics rows of one hourly run (prep/closed hours are zero rows)."""
+    generated_at = datetime.utcnow().isoformat()
+    return [
+        {
+            "location_id": location_id,
+            "forecast_date": hf["forecast_date"],
+            "hour_of_day": hf["hour_of_day"],
+            "forecast_sales": hf["forecast_sales"],
+            "forecast_sales_lower": hf["forecast_sales_lower"],
+            "forecast_sales_upper": hf["forecast_sales_upper"],
+            "forecast_orders": hf["forecast_orders"],
+            "forecast_covers": hf["forecast_covers"],
+            "model_type": hf["model_type"],
+            "model_version": HOURLY_MODEL_VERSION,
+            "bucket_wmape": hf.get("bucket_wmape"),
+            "bucket_mase": hf.get("bucket_mase"),
+            "generated_at": generated_at,
+            "data_source": ds,
+        }
+        for hf in result["hourly_forecasts"]
+    ]
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        # 1) Delete old hourly forecasts for this location
-        await client.delete(
-            f"{supabase_url}/rest/v1/forecast_hourly_metrics"
-            f"?location_id=eq.{location_id}&forecast_date=gte.{today_str}",
-            headers={**headers_sb, "Prefer": "return=minimal"},
-        )
 
-        # 2) Insert hourly forecasts in batches (with open-hours mask)
-        hourly_rows = []
-        masked_count = 0
-        for hf in result["hourly_forecasts"]:
-            h = hf["hour_of_day"]
-            # Apply open-hours mask: zero out outside service hours
-            if is_service_hour(h):
-                sales = hf["forecast_sales"]
-                lower = hf["forecast_sales_lower"]
-                upper = hf["forecast_sales_upper"]
-                orders = hf["forecast_orders"]
-                covers = hf["forecast_covers"]
-            else:
-                # Prep or closed — keep row but zero values
-                sales = 0
-                lower = 0
-                upper = 0
-                orders = 0
-                covers = 0
-                masked_count += 1
-
-            hourly_rows.append({
-                "location_id": location_id,
-                "forecast_date": hf["forecast_date"],
-                "hour_of_day": h,
-                "forecast_sales": sales,
-                "forecast_sales_lower": lower,
-                "forecast_sales_upper": upper,
-                "forecast_orders": orders,
-                "forecast_covers": covers,
-                "model_type": hf["model_type"],
-                "model_version": "HourlyEngine_v1.0",
-                "bucket_wmape": hf.get("bucket_wmape"),
-                "bucket_mase": hf.get("bucket_mase"),
-                "generated_at": datetime.utcnow().isoformat(),
-                "data_source": ds,
-            })
+async def _replace_registry(client, supabase_url: str, headers_sb: dict, location_id: str, result: dict) -> None:
+    """Rewrite forecast_model_registry unless the run reused the cached registry."""
+    if result.get("registry_mode") == "cached":
+        return
+    await client.delete(
+        f"{supabase_url}/rest/v1/forecast_model_registry"
+        f"?location_id=eq.{location_id}",
+        headers={**headers_sb, "Prefer": "return=minimal"},
+    )
 
-        logger.info("Open-hours mask zeroed %d/%d hourly rows", masked_count, len(hourly_rows))
+    registry_rows = result["model_registry"]
+    for i in range(0, len(registry_rows), 200):
+        batch = registry_rows[i:i + 200]
+        resp = await client.post(
+            f"{supabase_url}/rest/v1/forecast_model_registry",
+            headers={**headers_sb, "Content-Type": "application/json", "Prefer": "return=minimal"},
+            json=batch,
+        )
+        if resp.status_code >= 400:
+            logger.error("Registry insert error: %s", resp.text[:200])
+
+
+async def _store_hourly_result(
+    client,
+    supabase_url: str,
+    headers_sb: dict,
+    location_id: str,
+    location_name: str,
+    ds: str,
+    horizon_days: int,
+    sales_acc,
+    result: dict,
+) -> dict:
+    """Replace stored forecasts/registry for one location and log the run.
+
+    Returns the endpoint response body for that location.
+    """
+    from hourly_forecaster import CLOSED_MODEL
 
-        for i in range(0, len(hourly_rows), 500):
-            batch = hourly_rows[i:i + 500]
-            resp = await client.post(
-                f"{supabase_url}/rest/v1/forecast_hourly_metrics",
-                headers={**headers_sb, "Content-Type": "application/json", "Prefer": "return=minimal"},
-                json=batch,
-            )
-            if resp.status_code >= 400:
-                logger.error("Hourly insert error: %s", resp.text[:200])
+    today_str = datetime.utcnow().date().isoformat()
 
-        # 3) Upsert daily forecasts (backwards compat with forecast_daily_metrics)
-        await client.delete(
-            f"{supabase_url}/rest/v1/forecast_daily_metrics"
-            f"?location_id=eq.{location_id}&date=gte.{today_str}",
-            headers={**headers_sb, "Prefer": "return=minimal"},
-        )
+    # 1) Delete old hourly forecasts for this location
+    await client.delete(
+        f"{supabase_url}/rest/v1/forecast_hourly_metrics"
+        f"?location_id=eq.{location_id}&forecast_date=gte.{today_str}",
+        headers={**headers_sb, "Prefer": "return=minimal"},
+    )
 
-        daily_rows = []
-        for df_row in result["daily_forecasts"]:
-            sales = df_row["forecast_sales"]
-            target_labour = sales * (TARGET_COL_PERCENT / 100)
-            planned_hours = max(20, min(120, target_labour / AVG_HOURLY_RATE))
-            daily_rows.append({
-                "location_id": location_id,
-                "date": df_row["date"],
-                "forecast_sales": sales,
-                "forecast_sales_lower": df_row["forecast_sales_lower"],
-                "forecast_sales_upper": df_row["forecast_sales_upper"],
-                "forecast_orders": df_row["forecast_orders"],
-                "planned_labor_hours": round(planned_hours, 1),
-                "planned_labor_cost": round(target_labour, 2),
-                "model_version": "HourlyEngine_v1.0",
-                "confidence": round(max(0, (1 - result["metrics"]["wmape"])) * 100),
-                "mape": result["metrics"]["wmape"],
-                "mse": 0,
-                "explanation": f"Hourly forecast (WMAPE {result['metrics']['wmape']*100:.1f}%, "
-                               f"MASE {result['metrics']['mase']:.3f})",
-                "generated_at": datetime.utcnow().isoformat(),
-                "data_source": ds,
-            })
+    # 2) Insert hourly forecasts in batches (prep/closed hours are zero rows)
+    hourly_rows = _hourly_rows(result, location_id, ds)
+    masked_count = sum(1 for hf in result["hourly_forecasts"] if hf["model_type"] == CLOSED_MODEL)
 
-        for i in range(0, len(daily_rows), 500):
-            batch = daily_rows[i:i + 500]
-            resp = await client.post(
-                f"{supabase_url}/rest/v1/forecast_daily_metrics",
-                headers={**headers_sb, "Content-Type": "application/json", "Prefer": "return=minimal"},
-                json=batch,
-            )
-            if resp.status_code >= 400:
-                logger.error("Daily insert error: %s", resp.text[:200])
+    logger.info("Open-hours mask zeroed %d/%d hourly rows", masked_count, len(hourly_rows))
 
-        # 4) Upsert model registry
-        await client.delete(
-            f"{supabase_url}/rest/v1/forecast_model_registry"
-            f"?location_id=eq.{location_id}",
-            headers={**headers_sb, "Prefer": "return=minimal"},
+    for i in range(0, len(hourly_rows), 500):
+        batch = hourly_rows[i:i + 500]
+        resp = await client.post(
+            f"{supabase_url}/rest/v1/forecast_hourly_metrics",
+            headers={**headers_sb, "Content-Type": "application/json", "Prefer": "return=minimal"},
+            json=batch,
         )
+        if resp.status_code >= 400:
+            logger.error("Hourly insert error: %s", resp.text[:200])
+
+    # 3) Upsert daily forecasts (backwards compat with forecast_daily_metrics)
+    await client.delete(
+        f"{supabase_url}/rest/v1/forecast_daily_metrics"
+        f"?location_id=eq.{location_id}&date=gte.{today_str}",
+        headers={**headers_sb, "Prefer": "return=minimal"},
+    )
 
-        registry_rows = result["model_registry"]
-        for i in range(0, len(registry_rows), 200):
-            batch = registry_rows[i:i + 200]
-            resp = await client.post(
-                f"{supabase_url}/rest/v1/forecast_model_registry",
-                headers={**headers_sb, "Content-Type": "application/json", "Prefer": "return=minimal"},
-                json=batch,
-            )
-            if resp.status_code >= 400:
-                logger.error("Registry insert error: %s", resp.text[:200])
-
-        # 5) Log model run (audit) with gating metadata
-        metrics = result["metrics"]
-        gating = result.get("gating", {})
-        await client.post(
-            f"{supabase_url}/rest/v1/forecast_model_runs",
+    daily_rows = []
+    for df_row in result["daily_forecasts"]:
+        sales = df_row["forecast_sales"]
+        target_labour = sales * (TARGET_COL_PERCENT / 100)
+        planned_hours = max(20, min(120, target_labour / AVG_HOURLY_RATE))
+        daily_rows.append({
+            "location_id": location_id,
+            "date": df_row["date"],
+            "forecast_sales": sales,
+            "forecast_sales_lower": df_row["forecast_sales_lower"],
+            "forecast_sales_upper": df_row["forecast_sales_upper"],
+            "forecast_orders": df_row["forecast_orders"],
+            "planned_labor_hours": round(planned_hours, 1),
+            "planned_labor_cost": round(target_labour, 2),
+            "model_version": HOURLY_MODEL_VERSION,
+            "confidence": round(max(0, (1 - result["metrics"]["wmape"])) * 100),
+            "mape": result["metrics"]["wmape"],
+            "mse": 0,
+            "explanation": f"Hourly forecast (WMAPE {result['metrics']['wmape']*100:.1f}%, "
+                           f"MASE {result['metrics']['mase']:.3f})",
+            "generated_at": datetime.utcnow().isoformat(),
+            "data_source": ds,
+        })
+
+    for i in range(0, len(daily_rows), 500):
+        batch = daily_rows[i:i + 500]
+        resp = await client.post(
+            f"{supabase_url}/rest/v1/forecast_daily_metrics",
             headers={**headers_sb, "Content-Type": "application/json", "Prefer": "return=minimal"},
-            json={
-                "location_id": location_id,
-                "model_version": "HourlyEngine_v1.0",
-                "algorithm": gating.get("algorithm", "LightGBM_ChampionChallenger"),
-                "history_start": sales_data[0]["ts_bucket"][:10],
-                "history_end": sales_data[-1]["ts_bucket"][:10],
-                "horizon_days": horizon_days,
-                "mse": 0,
-                "mape": metrics["wmape"],
-                "confidence": round(max(0, (1 - metrics["wmape"])) * 100),
-                "data_points": result["data_points"],
-                "trend_slope": 0,
-                "data_sufficiency_level": gating.get("sufficiency", "LOW"),
-                "blend_ratio": gating.get("blend_ratio"),
-                "total_days": gating.get("total_days", 0),
-                "min_bucket_samples": gating.get("min_bucket_samples", 0),
-            },
+            json=batch,
         )
+        if resp.status_code >= 400:
+            logger.error("Daily insert error: %s", resp.text[:200])
+
+    # 4) Upsert model registry (unchanged between scheduled re-evaluations)
+    await _replace_registry(client, supabase_url, headers_sb, location_id, result)
+
+    # 5) Log model run (audit) with gating metadata
+    metrics = result["metrics"]
+    gating = result.get("gating", {})
+    await client.post(
+        f"{supabase_url}/rest/v1/forecast_model_runs",
+        headers={**headers_sb, "Content-Type": "application/json", "Prefer": "return=minimal"},
+        json={
+            "location_id": location_id,
+            "model_version": HOURLY_MODEL_VERSION,
+            "algorithm": gating.get("algorithm", "LightGBM_ChampionChallenger"),
+            "history_start": sales_acc.first_ts[:10],
+            "history_end": sales_acc.last_ts[:10],
+            "horizon_days": horizon_days,
+            "mse": 0,
+            "mape": metrics["wmape"],
+            "confidence": round(max(0, (1 - metrics["wmape"])) * 100),
+            "data_points": result["data_points"],
+            "trend_slope": 0,
+            "data_sufficiency_level": gating.get("sufficiency", "LOW"),
+            "blend_ratio": gating.get("blend_ratio"),
+            "total_days": gating.get("total_days", 0),
+            "min_bucket_samples": gating.get("min_bucket_samples", 0),
+            "timings": result.get("timings"),
+        },
+    )
 
     logger.info(
         "Stored %d hourly + %d daily forecasts for %s (ds=%s, masked=%d)",
@@ -1165,7 +1359,18 @@ async def forecast_hourly(req: dict, authorization: str = Header(default="")):
         "daily_forecasts_stored": len(daily_rows),
         "hours_masked": masked_count,
         "lgbm_used": result["lgbm_used"],
+        "model_scope": result.get("model_scope", "location"),
+        "fit_mode": result.get("fit_mode"),
+        "fit_reason": result.get("fit_reason"),
+        "lgbm_best_iteration": result.get("lgbm_best_iteration"),
+        "tickets_model_used": result.get("tickets_model_used", False),
+        "registry_mode": result.get("registry_mode"),
+        "registry_reason": result.get("registry_reason"),
+        "registry_evaluated_at": result.get("registry_evaluated_at"),
         "gating": result.get("gating", {}),
+        "peak_rss_mb": result.get("peak_rss_mb"),
+        "process_peak_rss_mb": result.get("process_peak_rss_mb"),
+        "timings": result.get("timings"),
         "metrics": {
             "wmape": f"{metrics['wmape'] * 100:.1f}%",
             "mase": f"{metrics['mase']:.3f}",
@@ -1178,12 +1383,279 @@ async def forecast_hourly(req: dict, authorization: str = Header(default="")):
     }
 
 
+@app.post("/forecast_hourly")
+async def forecast_hourly(req: dict, authorization: str = Header(default="")):
+    """Hourly forecast pipeline with champion/challenger per bucket.
+
+    1. Fetch facts_sales_15m → aggregate to hourly
+    2. Train LightGBM (global) + Seasonal Naive (baseline)
+    3. Evaluate per bucket (DOW × HOUR) → model registry
+    4. Predict future hours using registry winners
+    5. Store: forecast_hourly_metrics + forecast_daily_metrics (backwards compat)
+    6. Store: forecast_model_registry + forecast_model_runs (audit)
+    """
+    from hourly_forecaster import REGISTRY_REEVAL_DAYS, HourlyForecaster
+
+    if API_KEY and not authorization.endswith(API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+    supabase_url = req.get("supabase_url")
+    supabase_key = req.get("supabase_key")
+    location_id = req.get("location_id", "")
+    location_name = req.get("location_name", "")
+    horizon_days = req.get("horizon_days", 14)
+    req_data_source = req.get("data_source")  # 'demo' | 'pos' | None
+    req_org_id = req.get("org_id")            # uuid string | None
+
+    if not supabase_url or not supabase_key:
+        raise HTTPException(status_code=400, detail="supabase_url and supabase_key required")
+
+    logger.info(
+        "forecast_hourly: location=%s, horizon=%d days, ds=%s",
+        location_name or location_id, horizon_days, req_data_source,
+    )
+
+    headers_sb = _supabase_headers(supabase_key)
+    ds = await _resolve_data_source(supabase_url, headers_sb, req_data_source, req_org_id)
+    logger.info("Resolved data_source=%s for location=%s", ds, location_name or location_id)
+
+    # Closed hours are skipped by the forecaster and come back as zero rows
+    service_hours = await _fetch_service_hours(supabase_url, headers_sb, location_id)
+
+    client = supabase_rest.shared_client()
+    sales_acc = await _fetch_sales_15m(client, supabase_url, headers_sb, location_id)
+
+    if sales_acc.n_rows < 24 * 7:  # minimum ~1 week of hourly data
+        raise HTTPException(
+            status_code=400,
+            detail=f"Need at least 1 week of 15-min data, got {sales_acc.n_rows} records",
+        )
+
+    # ── Run hourly forecaster (with data-availability gating) ───────
+    # Stored boosters get a few trees on the new days; full_refit forces a rebuild.
+    # early_stopping sizes full fits on a validation slice instead of 300 trees.
+    forecaster = HourlyForecaster(
+        location_id=location_id,
+        location_name=location_name,
+        service_hours=service_hours,
+        model_store=HOURLY_MODEL_STORE,
+        early_stopping=bool(req.get("early_stopping", False)),
+        reeval_days=int(req.get("registry_reeval_days", REGISTRY_REEVAL_DAYS)),
+        trace_memory=bool(req.get("trace_memory", False)),
+    )
+    result = forecaster.run(
+        sales_acc,
+        horizon_days=horizon_days,
+        enable_gating=True,
+        full_refit=bool(req.get("full_refit", False)),
+    )
+
+    if not result.get("success"):
+        raise HTTPException(status_code=400, detail=result.get("error", "Forecast failed"))
+    STAGE_METRICS.record(result.get("timings"))
+
+    return await _store_hourly_result(
+        client, supabase_url, headers_sb, location_id, location_name,
+        ds, horizon_days, sales_acc, result,
+    )
+
+
+@app.post("/forecast_hourly_nowcast")
+async def forecast_hourly_nowcast(req: dict, authorization: str = Header(default="")):
+    """Refresh today's remaining hours from today's 15-min actuals (no retraining).
+
+    Uses the booster, registry and lag buffer cached by the last /forecast_hourly
+    run, fetches only today's facts_sales_15m buckets and rewrites only the
+    forecast_hourly_metrics rows for today from the current hour on.
+    """
+    import time
+
+    from hourly_forecaster import FEATURE_SCHEMA_VERSION, nowcast_today
+
+    t0 = time.perf_counter()
+    if API_KEY and not authorization.endswith(API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+    supabase_url = req.get("supabase_url")
+    supabase_key = req.get("supabase_key")
+    location_id = req.get("location_id", "")
+
+    if not supabase_url or not supabase_key or not location_id:
+        raise HTTPException(status_code=400, detail="supabase_url, supabase_key and location_id required")
+
+    state = HOURLY_MODEL_STORE.load_state(location_id, FEATURE_SCHEMA_VERSION)
+    if state is None:
+        raise HTTPException(status_code=409, detail="No cached hourly model; run /forecast_hourly first")
+    stored = HOURLY_MODEL_STORE.load(location_id, FEATURE_SCHEMA_VERSION) if state["use_lgbm"] else None
+    stored_tickets = (
+        HOURLY_MODEL_STORE.load(location_id, FEATURE_SCHEMA_VERSION, kind="tickets") if stored else None
+    )
+
+    headers_sb = _supabase_headers(supabase_key)
+    now = datetime.utcnow()
+    today_str = now.date().isoformat()
+
+    client = supabase_rest.shared_client()
+    today_rows = await supabase_rest.fetch_pages(
+        client,
+        f"{supabase_url}/rest/v1/facts_sales_15m"
+        f"?location_id=eq.{location_id}"
+        f"&ts_bucket=gte.{today_str}T00:00:00"
+        f"&select=ts_bucket,sales_net,tickets"
+        f"&order=ts_bucket.asc",
+        headers_sb,
+    )
+
+    forecasts = nowcast_today(
+        state, stored[0] if stored else None, today_rows, now,
+        tickets_model=stored_tickets[0] if stored_tickets else None,
+    )
+    ds = await _resolve_data_source(supabase_url, headers_sb, req.get("data_source"), req.get("org_id"))
+    generated_at = datetime.utcnow().isoformat()
+    rows = [
+        {
+            "location_id": location_id,
+            **hf,
+            "model_version": HOURLY_MODEL_VERSION,
+            "generated_at": generated_at,
+            "data_source": ds,
+        }
+        for hf in forecasts
+    ]
+
+    await client.delete(
+        f"{supabase_url}/rest/v1/forecast_hourly_metrics"
+        f"?location_id=eq.{location_id}&forecast_date=eq.{today_str}&hour_of_day=gte.{now.hour}",
+        headers={**headers_sb, "Prefer": "return=minimal"},
+    )
+    if rows:
+        resp = await client.post(
+            f"{supabase_url}/rest/v1/forecast_hourly_metrics",
+            headers={**headers_sb, "Content-Type": "application/json", "Prefer": "return=minimal"},
+            json=rows,
+        )
+        if resp.status_code >= 400:
+            logger.error("Nowcast insert error: %s", resp.text[:200])
+
+    latency_ms = round((time.perf_counter() - t0) * 1000, 1)
+    STAGE_METRICS.record({"total_ms": latency_ms, "stages": {}}, kind="nowcast")
+    logger.info(
+        "Nowcast for %s: %d hours from %02d:00 (%d actual buckets) in %.1f ms",
+        location_id, len(rows), now.hour, len(today_rows), latency_ms,
+    )
+    return {
+        "success": True,
+        "location_id": location_id,
+        "forecast_date": today_str,
+        "from_hour": now.hour,
+        "actual_buckets": len(today_rows),
+        "hours_updated": len(rows),
+        "lgbm_used": stored is not None,
+        "state_generated_at": state.get("generated_at"),
+        "latency_ms": latency_ms,
+        "forecasts": forecasts,
+    }
+
+
+@app.post("/forecast_hourly_batch")
+async def forecast_hourly_batch(req: dict, authorization: str = Header(default="")):
+    """Hourly forecasts for every location of a tenant from ONE LightGBM fit.
+
+    The tenant model is trained on all locations' scale-normalized history with
+    a categorical location code, then each location runs its own per-bucket
+    champion/challenger and prediction against that shared model.
+
+    Body: supabase_url, supabase_key, org_id?, location_ids?, horizon_days?, data_source?
+    Without location_ids, every active location (of org_id, if given) is used.
+    """
+    from hourly_forecaster import TenantHourlyForecaster
+
+    if API_KEY and not authorization.endswith(API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+    supabase_url = req.get("supabase_url")
+    supabase_key = req.get("supabase_key")
+    horizon_days = req.get("horizon_days", 14)
+    req_data_source = req.get("data_source")
+    req_org_id = req.get("org_id")
+    location_ids = req.get("location_ids")
+
+    if not supabase_url or not supabase_key:
+        raise HTTPException(status_code=400, detail="supabase_url and supabase_key required")
+
+    headers_sb = _supabase_headers(supabase_key)
+    ds = await _resolve_data_source(supabase_url, headers_sb, req_data_source, req_org_id)
+
+    client = supabase_rest.shared_client()
+    loc_url = f"{supabase_url}/rest/v1/locations?select=id,name"
+    if location_ids:
+        loc_url += f"&id=in.({','.join(location_ids)})"
+    else:
+        loc_url += "&active=eq.true"
+        if req_org_id:
+            loc_url += f"&org_id=eq.{req_org_id}"
+    resp = await client.get(loc_url, headers=headers_sb)
+    resp.raise_for_status()
+    loc_rows = resp.json()
+
+    if not loc_rows:
+        raise HTTPException(status_code=400, detail="No locations to forecast")
+
+    logger.info("forecast_hourly_batch: %d locations, ds=%s", len(loc_rows), ds)
+
+    locations = []
+    sales_by_location = {}
+    for loc in loc_rows:
+        loc_id = str(loc["id"])
+        locations.append({
+            "location_id": loc_id,
+            "location_name": loc.get("name", ""),
+            "service_hours": await _fetch_service_hours(supabase_url, headers_sb, loc_id),
+        })
+        sales_by_location[loc_id] = await _fetch_sales_15m(client, supabase_url, headers_sb, loc_id)
+
+    batch = TenantHourlyForecaster(locations).run(
+        sales_by_location, horizon_days=horizon_days, enable_gating=True,
+    )
+    STAGE_METRICS.record(batch.get("timings"), kind="tenant")
+    for result in batch["results"].values():
+        if result.get("success"):
+            STAGE_METRICS.record(result.get("timings"))
+
+    stored = {}
+    for loc in locations:
+        loc_id = loc["location_id"]
+        result = batch["results"].get(loc_id, {})
+        if not result.get("success"):
+            stored[loc_id] = {"success": False, "error": result.get("error", "Forecast failed")}
+            continue
+        body = await _store_hourly_result(
+            client, supabase_url, headers_sb, loc_id, loc["location_name"],
+            ds, horizon_days, sales_by_location[loc_id], result,
+        )
+        # Keep the batch response compact
+        body.pop("sample_hourly", None)
+        body.pop("sample_daily", None)
+        stored[loc_id] = body
+
+    return {
+        "success": True,
+        "data_source": ds,
+        "locations_total": batch["locations_total"],
+        "locations_trained": batch["locations_trained"],
+        "tenant_model_used": batch["tenant_model_used"],
+        "timings": batch.get("timings"),
+        "results": stored,
+    }
+
+
 @app.post("/forecast_xgboost")
 async def forecast_xgboost(req: dict, authorization: str = Header(default="")):
     """XGBoost forecasting pipeline — ensemble component for v6.
 
     Same interface as /forecast_supabase. Called by generate_forecast_v6 Edge Function.
     Uses 25+ engineered features, expanding window CV, and SHAP explanations.
+    Optional: strategy ('recursive' | 'direct'), compare_strategies, continue_final.
     """
     if API_KEY and not authorization.endswith(API_KEY):
         raise HTTPException(status_code=401, detail="Invalid API key")
@@ -1191,7 +1663,7 @@ async def forecast_xgboost(req: dict, authorization: str = Header(default="")):
     from xgboost_forecaster import create_forecast_xgboost_handler
 
     handler = create_forecast_xgboost_handler()
-    result = handler(req)
+    result = await handler(req, executor=FIT_EXECUTOR)
 
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
@@ -1199,6 +1671,310 @@ async def forecast_xgboost(req: dict, authorization: str = Header(default="")):
     return result
 
 
+def _engine_daily(engine: str, output) -> tuple[list[dict] | None, float | None, str | None]:
+    """(daily rows, CV error, failure) of one ensemble engine's output."""
+    if isinstance(output, Exception):
+        return None, None, f"{type(output).__name__}: {output}"
+    if engine == "prophet":
+        rows = [
+            {"date": f.ds, "forecast_sales": f.yhat,
+             "forecast_sales_lower": f.yhat_lower, "forecast_sales_upper": f.yhat_upper}
+            for f in output.forecast
+        ]
+        return rows, output.metrics.mape, None
+    if engine == "xgboost":
+        if "error" in output:
+            return None, None, output["error"]
+        rows = [
+            {"date": fc["date"], "forecast_sales": fc["predicted"],
+             "forecast_sales_lower": fc["lower"], "forecast_sales_upper": fc["upper"]}
+            for fc in output["forecasts"]
+        ]
+        return rows, output["metrics"]["mape"], None
+    if not output.get("success"):
+        return None, None, output.get("error", "Forecast failed")
+    # Error on daily totals, the same footing as the daily engines' CV MAPE (per-hour
+    # WMAPE is far larger); None for registries evaluated before it was recorded
+    return output["daily_forecasts"], output["metrics"].get("daily_wmape"), None
+
+
+@app.post("/forecast_ensemble")
+async def forecast_ensemble(req: dict, authorization: str = Header(default="")):
+    """Prophet + XGBoost + hourly engines from ONE fetch, blended and stored in one batch.
+
+    facts_sales_15m is paged once into the hourly grid, whose daily totals feed
+    Prophet (with the event_calendar / weather regressors) and XGBoost. The
+    three fits run concurrently in FIT_EXECUTOR and their daily forecasts are
+    blended with inverse-CV-error weights (see ensemble.py). The daily engines'
+    CV errors are cached per location, so their CV refits only run once the
+    cache is stale or refresh_weights is set.
+
+    Body: supabase_url, supabase_key, location_id, location_name?, horizon_days?
+    (daily, default 90), hourly_horizon_days? (default 14), data_source?, org_id?,
+    refresh_weights?, trace_memory?
+    """
+    import time
+    from functools import partial
+
+    import ensemble
+    from hourly_forecaster import HourlyForecaster
+    from xgboost_forecaster import train_and_forecast
+
+    t_start = time.perf_counter()
+    if API_KEY and not authorization.endswith(API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+    supabase_url = req.get("supabase_url")
+    supabase_key = req.get("supabase_key")
+    location_id = req.get("location_id", "")
+    location_name = req.get("location_name", "")
+    horizon_days = req.get("horizon_days", 90)
+    hourly_horizon_days = min(req.get("hourly_horizon_days", 14), horizon_days)
+
+    if not supabase_url or not supabase_key or not location_id:
+        raise HTTPException(status_code=400, detail="supabase_url, supabase_key and location_id required")
+
+    logger.info("forecast_ensemble: location=%s, horizon=%d days", location_name or location_id, horizon_days)
+
+    # ── One fetch: 15-min sales, service hours and daily regressors ──
+    headers_sb = _supabase_headers(supabase_key)
+    client = supabase_rest.shared_client()
+    try:
+        ds, service_hours, build_regs, sales_acc = await asyncio.gather(
+            _resolve_data_source(supabase_url, headers_sb, req.get("data_source"), req.get("org_id")),
+            _fetch_service_hours(supabase_url, headers_sb, location_id),
+            _daily_regressor_builder(supabase_url, headers_sb, location_id),
+            _fetch_sales_15m(client, supabase_url, headers_sb, location_id),
+        )
+    except Exception as e:
+        logger.error("Error fetching from Supabase: %s", str(e))
+        raise HTTPException(status_code=502, detail=f"Error fetching from Supabase: {str(e)}")
+    fetch_ms = (time.perf_counter() - t_start) * 1000
+
+    daily = sales_acc.daily_sales()
+    if len(daily) < 14:
+        raise HTTPException(status_code=400, detail=f"Need 14+ days, got {len(daily)}")
+
+    # ── Shared daily frame: Prophet gets it with regressors, XGBoost as is ──
+    dates = daily["date"].tolist()
+    historical = [
+        {"ds": d, "y": round(float(y), 2), **regs}
+        for d, y, regs in zip(dates, daily["sales"], build_regs(dates))
+    ]
+    today = datetime.utcnow().date()
+    future_dates = [(today + timedelta(days=k)).isoformat() for k in range(1, horizon_days + 1)]
+    future_regressors = [{"ds": d, **regs} for d, regs in zip(future_dates, build_regs(future_dates))]
+    prophet_req = ForecastRequest(
+        historical=historical,
+        horizon_days=horizon_days,
+        future_regressors=future_regressors,
+        location_id=location_id,
+        location_name=location_name,
+        freq="D",
+        yearly_seasonality=len(dates) >= 365,
+        weekly_seasonality=True,
+        daily_seasonality=False,
+        seasonality_mode=req.get("seasonality_mode", "multiplicative"),
+        changepoint_prior_scale=req.get("changepoint_prior_scale", 0.05),
+        include_regressors=True,
+    )
+    forecaster = HourlyForecaster(
+        location_id=location_id,
+        location_name=location_name,
+        service_hours=service_hours,
+        model_store=HOURLY_MODEL_STORE,
+        trace_memory=bool(req.get("trace_memory", False)),
+    )
+
+    # ── Cached CV errors decide whether the daily engines re-run CV ──
+    now = datetime.utcnow()
+    cached = HOURLY_MODEL_STORE.load_ensemble(location_id, ensemble.ENSEMBLE_SCHEMA_VERSION)
+    run_cv = bool(req.get("refresh_weights", False)) or not ensemble.weights_fresh(cached, now)
+    cached_rmse = {} if run_cv else cached.get("rmse", {})
+
+    def timed(fn):
+        t0 = time.perf_counter()
+        out = fn()
+        return out, round((time.perf_counter() - t0) * 1000, 1)
+
+    loop = asyncio.get_running_loop()
+    fits = {
+        "prophet": partial(fit_prophet, prophet_req, with_cv=run_cv),
+        "xgboost": partial(
+            train_and_forecast, daily, horizon_days=horizon_days,
+            n_cv_folds=4 if run_cv else 0, band_rmse=cached_rmse.get("xgboost"),
+        ),
+        "hourly": partial(forecaster.run, sales_acc, horizon_days=hourly_horizon_days, enable_gating=True),
+    }
+    outcomes = await asyncio.gather(
+        *(loop.run_in_executor(FIT_EXECUTOR, partial(timed, fn)) for fn in fits.values()),
+        return_exceptions=True,
+    )
+
+    daily_by_engine: dict[str, list[dict]] = {}
+    fresh_errors: dict[str, float | None] = {}
+    engines: dict[str, dict] = {}
+    outputs: dict = {}
+    for engine, outcome in zip(fits, outcomes):
+        output, fit_ms = outcome if not isinstance(outcome, Exception) else (outcome, None)
+        rows, error, failure = _engine_daily(engine, output)
+        engines[engine] = {"fit_ms": fit_ms, "success": rows is not None}
+        if failure:
+            logger.warning("Ensemble engine %s failed for %s: %s", engine, location_id, failure)
+            engines[engine]["error"] = failure
+            continue
+        outputs[engine] = output
+        daily_by_engine[engine] = rows
+        fresh_errors[engine] = error
+
+    if not daily_by_engine:
+        raise HTTPException(status_code=400, detail={"error": "Every engine failed", "engines": engines})
+
+    # The hourly holdout is evaluated on every run; the daily engines' CV only when run_cv
+    if run_cv:
+        errors = dict(fresh_errors)
+        cv_rmse = {}
+        if "prophet" in outputs:
+            cv_rmse["prophet"] = outputs["prophet"].metrics.rmse
+        if "xgboost" in outputs:
+            cv_rmse["xgboost"] = outputs["xgboost"]["metrics"]["rmse"]
+        HOURLY_MODEL_STORE.save_ensemble(location_id, ensemble.ENSEMBLE_SCHEMA_VERSION, {
+            "evaluated_at": now.isoformat(),
+            "errors": {e: fresh_errors[e] for e in ("prophet", "xgboost") if e in fresh_errors},
+            "rmse": cv_rmse,
+        })
+    else:
+        errors = {**cached["errors"], **({"hourly": fresh_errors["hourly"]} if "hourly" in fresh_errors else {})}
+    errors = {e: errors.get(e) for e in daily_by_engine}
+    weights = ensemble.inverse_error_weights(errors)
+    combined = ensemble.combine_daily(daily_by_engine, weights)
+    blend_error = ensemble.weighted_error(errors, weights)
+    for engine in engines:
+        engines[engine]["cv_error"] = errors.get(engine)
+        engines[engine]["weight"] = round(weights.get(engine, 0.0), 4)
+
+    # ── One batch: clear today onwards, then every insert concurrently ──
+    generated_at = datetime.utcnow().isoformat()
+    today_str = today.isoformat()
+    avg_check = float(sales_acc.sales.sum()) / max(int(sales_acc.tickets.sum()), 1)
+    weights_label = " ".join(f"{e}={weights[e] * 100:.0f}%" for e in weights)
+    daily_rows = []
+    for row in combined:
+        sales = row["forecast_sales"]
+        target_labour = sales * (TARGET_COL_PERCENT / 100)
+        daily_rows.append({
+            "location_id": location_id,
+            "date": row["date"],
+            "forecast_sales": sales,
+            "forecast_orders": max(1, round(sales / avg_check)) if avg_check > 0 else 0,
+            "forecast_sales_lower": row["forecast_sales_lower"],
+            "forecast_sales_upper": row["forecast_sales_upper"],
+            "planned_labor_hours": round(max(20, min(120, target_labour / AVG_HOURLY_RATE)), 1),
+            "planned_labor_cost": round(target_labour, 2),
+            "model_version": ensemble.ENSEMBLE_MODEL_VERSION,
+            "confidence": round(max(0.0, 1 - blend_error) * 100),
+            "mape": round(blend_error, 4),
+            "mse": 0,
+            "explanation": f"Ensemble ({weights_label})",
+            "generated_at": generated_at,
+            "data_source": ds,
+        })
+    model_names = {
+        "prophet": "Prophet_v5_Real_ML", "xgboost": "XGBoost_v6", "hourly": HOURLY_MODEL_VERSION,
+    }
+    accuracy_rows = [
+        {"location_id": location_id, "date": r["date"], "model_name": model_names[engine],
+         "predicted": r["forecast_sales"]}
+        for engine, rows in daily_by_engine.items() for r in rows
+    ] + [
+        {"location_id": location_id, "date": r["date"], "model_name": ensemble.ENSEMBLE_MODEL_VERSION,
+         "predicted": r["forecast_sales"]}
+        for r in combined
+    ]
+    hourly_rows = _hourly_rows(outputs["hourly"], location_id, ds) if "hourly" in outputs else []
+
+    t_store = time.perf_counter()
+    deletes = [
+        client.delete(
+            f"{supabase_url}/rest/v1/forecast_daily_metrics"
+            f"?location_id=eq.{location_id}&date=gte.{today_str}",
+            headers={**headers_sb, "Prefer": "return=minimal"},
+        ),
+    ]
+    if hourly_rows:
+        deletes.append(client.delete(
+            f"{supabase_url}/rest/v1/forecast_hourly_metrics"
+            f"?location_id=eq.{location_id}&forecast_date=gte.{today_str}",
+            headers={**headers_sb, "Prefer": "return=minimal"},
+        ))
+    await asyncio.gather(*deletes)
+
+    rest = f"{supabase_url}/rest/v1"
+    writes = [
+        supabase_rest.upsert(client, f"{rest}/forecast_daily_metrics", headers_sb, daily_rows, on_conflict=None),
+        supabase_rest.upsert(client, f"{rest}/forecast_hourly_metrics", headers_sb, hourly_rows, on_conflict=None),
+        supabase_rest.upsert(client, f"{rest}/forecast_accuracy_log", headers_sb, accuracy_rows,
+                             on_conflict="location_id,date,model_name"),
+    ]
+    if "hourly" in outputs:
+        writes.append(_replace_registry(client, supabase_url, headers_sb, location_id, outputs["hourly"]))
+    daily_stored, hourly_stored, *_ = await asyncio.gather(*writes)
+    store_ms = (time.perf_counter() - t_store) * 1000
+
+    timings = {
+        "total_ms": round((time.perf_counter() - t_start) * 1000, 1),
+        "stages": {
+            "fetch": {"ms": round(fetch_ms, 1), "calls": 1},
+            **{f"fit_{e}": {"ms": v["fit_ms"], "calls": 1} for e, v in engines.items() if v["fit_ms"] is not None},
+            "store": {"ms": round(store_ms, 1), "calls": 1},
+        },
+    }
+    STAGE_METRICS.record(timings, kind="ensemble")
+    if "hourly" in outputs:
+        STAGE_METRICS.record(outputs["hourly"].get("timings"))
+
+    await client.post(
+        f"{rest}/forecast_model_runs",
+        headers={**headers_sb, "Content-Type": "application/json", "Prefer": "return=minimal"},
+        json={
+            "location_id": location_id,
+            "model_version": ensemble.ENSEMBLE_MODEL_VERSION,
+            "algorithm": "Ensemble_Prophet_XGBoost_Hourly",
+            "history_start": dates[0],
+            "history_end": dates[-1],
+            "horizon_days": horizon_days,
+            "mse": 0,
+            "mape": round(blend_error, 4),
+            "confidence": round(max(0.0, 1 - blend_error) * 100),
+            "data_points": len(dates),
+            "trend_slope": outputs["prophet"].metrics.trend_slope_avg if "prophet" in outputs else 0,
+            "timings": timings,
+        },
+    )
+
+    logger.info(
+        "Ensemble for %s: %s, %d daily + %d hourly rows in %.0f ms (cv=%s)",
+        location_name or location_id, weights_label, daily_stored, hourly_stored,
+        timings["total_ms"], run_cv,
+    )
+
+    return {
+        "success": True,
+        "location_id": location_id,
+        "location_name": location_name,
+        "data_source": ds,
+        "data_points": len(dates),
+        "model_version": ensemble.ENSEMBLE_MODEL_VERSION,
+        "weights_refreshed": run_cv,
+        "engines": engines,
+        "blend_mape": f"{blend_error * 100:.1f}%",
+        "daily_forecasts_stored": daily_stored,
+        "hourly_forecasts_stored": hourly_stored,
+        "timings": timings,
+        "sample_forecast": combined[:7],
+    }
+
+
 @app.post("/batch_forecast")
 async def batch_forecast(
     locations: list[ForecastRequest],
@@ -0,0 +1,186 @@
+"""
+Precomputed day-indexed calendar shared by the forecasting engines.
+
+Holiday, payday, weekday and climate features used to be rebuilt row by row
+in every engine, each with its own hardcoded holiday list. CalendarIndex
+computes them once as arrays over [CALENDAR_START, CALENDAR_END], indexed by
+day ordinal (days since 1970-01-01, the hourly grid's ``sale_date``), and the
+engines take slices of it.
+
+Spanish national holidays are generated per year, Good Friday and Easter
+Monday from the computed Easter date, so the table does not run out after a
+few years. Rows of event_calendar (holidays and impact multipliers) are
+merged into a per-request copy with ``with_events``.
+
+Usage:
+    ords = to_ordinals(df["date"])
+    df["is_festivo"] = CALENDAR.take("is_holiday", ords)
+"""
+
+import copy
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+EPOCH = np.datetime64("1970-01-01", "D")
+CALENDAR_START = date(2000, 1, 1)
+CALENDAR_END = date(2050, 12, 31)
+
+# Fixed-date national holidays (month, day)
+FIXED_HOLIDAYS = [
+    (1, 1), (1, 6), (5, 1), (8, 15), (10, 12),
+    (11, 1), (12, 6), (12, 8), (12, 25),
+]
+# Easter-relative holidays, in days from Easter Sunday (Good Friday, Easter Monday)
+EASTER_OFFSETS = (-2, 1)
+
+# Madrid monthly climate normals (from regressors.ts)
+MADRID_CLIMATE = {
+    1: {'avg': 6.3, 'std': 3.0, 'rain': 0.27},
+    2: {'avg': 7.9, 'std': 3.2, 'rain': 0.25},
+    3: {'avg': 11.2, 'std': 3.5, 'rain': 0.23},
+    4: {'avg': 13.1, 'std': 3.0, 'rain': 0.30},
+    5: {'avg': 17.2, 'std': 3.5, 'rain': 0.28},
+    6: {'avg': 22.5, 'std': 3.0, 'rain': 0.12},
+    7: {'avg': 26.1, 'std': 2.5, 'rain': 0.07},
+    8: {'avg': 25.6, 'std': 2.5, 'rain': 0.08},
+    9: {'avg': 21.3, 'std': 3.0, 'rain': 0.18},
+    10: {'avg': 15.1, 'std': 3.5, 'rain': 0.28},
+    11: {'avg': 9.9, 'std': 3.0, 'rain': 0.30},
+    12: {'avg': 6.9, 'std': 3.0, 'rain': 0.30},
+}
+
+# Array forms (index 0 unused; months are 1-12)
+_CLIMATE_AVG = np.array([15.0] + [MADRID_CLIMATE[m]['avg'] for m in range(1, 13)])
+_CLIMATE_RAIN = np.array([0.2] + [MADRID_CLIMATE[m]['rain'] for m in range(1, 13)])
+
+
+def easter_sunday(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def spanish_holidays(first_year: int, last_year: int) -> list[date]:
+    """National holidays (incl. Good Friday and Easter Monday) of the given years."""
+    days = []
+    for year in range(first_year, last_year + 1):
+        days += [date(year, m, d) for m, d in FIXED_HOLIDAYS]
+        easter = np.datetime64(easter_sunday(year), "D")
+        days += [(easter + offset).astype(date) for offset in EASTER_OFFSETS]
+    return sorted(days)
+
+
+def to_ordinals(dates) -> np.ndarray:
+    """Day ordinals (int64) of ISO date strings, dates, datetimes or datetime64 values."""
+    arr = np.asarray(dates)
+    if arr.dtype.kind in "US":
+        days = arr.astype("U10").astype("datetime64[D]")
+    elif arr.dtype.kind == "M":
+        days = arr.astype("datetime64[D]")
+    else:
+        days = pd.to_datetime(arr).to_numpy().astype("datetime64[D]")
+    return (days - EPOCH).astype(np.int64)
+
+
+class CalendarIndex:
+    """Per-day calendar features as arrays over a fixed date range.
+
+    Columns (all indexed by ``ordinal - start_ordinal``):
+      dow (0=Mon), month, day, week_of_year (ISO), quarter, day_of_year,
+      is_holiday, is_pre_holiday, is_post_holiday, is_payday,
+      temp_normal, rain_prob (monthly climate normals), event_multiplier.
+    """
+
+    COLUMNS = (
+        "dow", "month", "day", "week_of_year", "quarter", "day_of_year",
+        "is_holiday", "is_pre_holiday", "is_post_holiday", "is_payday",
+        "temp_normal", "rain_prob", "event_multiplier",
+    )
+
+    def __init__(self, start: date = CALENDAR_START, end: date = CALENDAR_END):
+        self.start_ordinal = int(to_ordinals([start])[0])
+        self.n_days = int(to_ordinals([end])[0]) - self.start_ordinal + 1
+        days = pd.DatetimeIndex(EPOCH + np.arange(self.start_ordinal, self.start_ordinal + self.n_days))
+
+        self.dow = days.dayofweek.to_numpy(dtype=np.int8)
+        self.month = days.month.to_numpy(dtype=np.int8)
+        self.day = days.day.to_numpy(dtype=np.int8)
+        self.week_of_year = days.isocalendar().week.to_numpy(dtype=np.int8)
+        self.quarter = days.quarter.to_numpy(dtype=np.int8)
+        self.day_of_year = days.dayofyear.to_numpy(dtype=np.int16)
+        self.is_payday = ((self.day == 1) | (self.day == 15) | (self.day >= 25)).astype(np.int8)
+        self.temp_normal = _CLIMATE_AVG[self.month]
+        self.rain_prob = _CLIMATE_RAIN[self.month]
+        self.event_multiplier = np.ones(self.n_days)
+        self._set_holidays(spanish_holidays(start.year, end.year))
+
+    def _set_holidays(self, holidays) -> None:
+        is_holiday = np.zeros(self.n_days, dtype=np.int8)
+        pos = to_ordinals(list(holidays)) - self.start_ordinal if len(holidays) else np.zeros(0, dtype=np.int64)
+        is_holiday[pos[(pos >= 0) & (pos < self.n_days)]] = 1
+        self.is_holiday = is_holiday
+        self.is_pre_holiday = np.zeros_like(is_holiday)
+        self.is_pre_holiday[:-1] = is_holiday[1:]
+        self.is_post_holiday = np.zeros_like(is_holiday)
+        self.is_post_holiday[1:] = is_holiday[:-1]
+
+    def positions(self, ordinals) -> np.ndarray:
+        """Row positions of day ordinals; ValueError outside the calendar range."""
+        pos = np.asarray(ordinals, dtype=np.int64) - self.start_ordinal
+        if pos.size and (pos.min() < 0 or pos.max() >= self.n_days):
+            raise ValueError(
+                f"dates outside the calendar range ({self.start_ordinal}..{self.start_ordinal + self.n_days - 1})"
+            )
+        return pos
+
+    def take(self, column: str, ordinals) -> np.ndarray:
+        """One column for the given day ordinals."""
+        return getattr(self, column)[self.positions(ordinals)]
+
+    def frame(self, ordinals, columns=COLUMNS) -> pd.DataFrame:
+        """Several columns for the given day ordinals."""
+        pos = self.positions(ordinals)
+        return pd.DataFrame({c: getattr(self, c)[pos] for c in columns})
+
+    def row(self, d: date) -> dict:
+        """All columns of a single day as Python scalars."""
+        pos = int(self.positions(to_ordinals([d]))[0])
+        return {c: getattr(self, c)[pos].item() for c in self.COLUMNS}
+
+    def holiday_strings(self) -> set[str]:
+        """ISO dates of every holiday in the range."""
+        days = EPOCH + (np.flatnonzero(self.is_holiday) + self.start_ordinal)
+        return set(days.astype(str))
+
+    def with_events(self, holidays=None, events: dict | None = None) -> "CalendarIndex":
+        """Copy with event_calendar data merged in.
+
+        ``holidays`` (ISO strings or dates) replaces the generated holidays;
+        ``events`` maps a date to its sales impact multiplier (1.0 = none).
+        Unchanged columns are shared with this index.
+        """
+        merged = copy.copy(self)
+        if holidays is not None:
+            merged._set_holidays(list(holidays))
+        if events:
+            merged.event_multiplier = self.event_multiplier.copy()
+            pos = to_ordinals(list(events)) - self.start_ordinal
+            values = np.array(list(events.values()), dtype=float)
+            keep = (pos >= 0) & (pos < self.n_days)
+            merged.event_multiplier[pos[keep]] = values[keep]
+        return merged
+
+
+# Default calendar (generated national holidays, no events)
+CALENDAR = CalendarIndex()
@@ -0,0 +1,93 @@
+"""
+Blending of the daily forecasts of the Prophet, XGBoost and hourly engines.
+
+/forecast_ensemble fits the three engines on one shared fetch and combines
+them per day with inverse-CV-error weights. The CV errors of the daily
+engines are cached per location in the model store, so their CV refits (three
+extra Prophet fits, four XGBoost folds) only run when the cached errors are
+older than WEIGHTS_TTL_DAYS. Their CV RMSEs are cached alongside, so runs
+without CV keep XGBoost's bands at the CV width.
+"""
+
+import math
+from datetime import datetime, timedelta
+
+ENGINES = ("prophet", "xgboost", "hourly")
+ENSEMBLE_SCHEMA_VERSION = "ens1"
+ENSEMBLE_MODEL_VERSION = "Ensemble_v6"
+WEIGHTS_TTL_DAYS = 7
+MIN_ERROR = 0.01  # floor so one lucky CV run can't take all the weight
+
+
+def _usable(err) -> bool:
+    return err is not None and math.isfinite(err) and err > 0
+
+
+def inverse_error_weights(errors: dict[str, float | None]) -> dict[str, float]:
+    """Weights ∝ 1 / CV error (MAPE / WMAPE as a fraction), summing to 1.
+
+    An engine without a usable error is weighted like the worst known one;
+    with no usable error at all the engines are weighted equally.
+    """
+    if not errors:
+        return {}
+    known = [max(float(e), MIN_ERROR) for e in errors.values() if _usable(e)]
+    if not known:
+        return {engine: 1.0 / len(errors) for engine in errors}
+    worst = max(known)
+    inv = {
+        engine: 1.0 / (max(float(err), MIN_ERROR) if _usable(err) else worst)
+        for engine, err in errors.items()
+    }
+    total = sum(inv.values())
+    return {engine: v / total for engine, v in inv.items()}
+
+
+def weights_fresh(record: dict | None, now: datetime, ttl_days: int = WEIGHTS_TTL_DAYS) -> bool:
+    """Whether a cached {"evaluated_at", "errors"} record can be reused at ``now``."""
+    if not record or not record.get("errors") or not record.get("evaluated_at"):
+        return False
+    try:
+        evaluated_at = datetime.fromisoformat(record["evaluated_at"])
+    except (TypeError, ValueError):
+        return False
+    return now - evaluated_at < timedelta(days=ttl_days)
+
+
+def combine_daily(forecasts: dict[str, list[dict]], weights: dict[str, float]) -> list[dict]:
+    """Weighted per-day blend of each engine's daily rows.
+
+    ``forecasts`` maps engine -> [{date, forecast_sales, forecast_sales_lower,
+    forecast_sales_upper}]. Engines cover different horizons (the hourly one
+    is shorter), so each day renormalizes the weights over the engines that
+    forecast it. Returns rows sorted by date with the per-engine values under
+    ``engines``.
+    """
+    by_date: dict[str, dict[str, dict]] = {}
+    for engine, rows in forecasts.items():
+        if weights.get(engine, 0) <= 0:
+            continue
+        for row in rows:
+            by_date.setdefault(str(row["date"])[:10], {})[engine] = row
+
+    combined = []
+    for date_str in sorted(by_date):
+        rows = by_date[date_str]
+        total_w = sum(weights[e] for e in rows)
+        blend = {
+            key: sum(weights[e] * float(r[key]) for e, r in rows.items()) / total_w
+            for key in ("forecast_sales", "forecast_sales_lower", "forecast_sales_upper")
+        }
+        combined.append({
+            "date": date_str,
+            "forecast_sales": round(max(0.0, blend["forecast_sales"]), 2),
+            "forecast_sales_lower": round(max(0.0, blend["forecast_sales_lower"]), 2),
+            "forecast_sales_upper": round(max(0.0, blend["forecast_sales_upper"]), 2),
+            "engines": {e: round(float(r["forecast_sales"]), 2) for e, r in sorted(rows.items())},
+        })
+    return combined
+
+
+def weighted_error(errors: dict[str, float | None], weights: dict[str, float]) -> float:
+    """Blend-weighted CV error (0 when no engine has one)."""
+    return sum(w * float(errors[e]) for e, w in weights.items() if _usable(errors.get(e)))
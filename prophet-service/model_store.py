@@ -0,0 +1,149 @@
+"""
+On-disk store for trained hourly LightGBM boosters.
+
+One directory per location; files are keyed by the feature schema version so a
+change to FEATURE_COLS / LGBM_PARAMS never loads an incompatible booster:
+
+  {root}/{location_id}/hourly_lgbm.{schema}.txt    — booster (LightGBM text format)
+  {root}/{location_id}/hourly_lgbm.{schema}.json   — fit metadata
+  {root}/{location_id}/hourly_tickets.{schema}.*   — tickets booster (+ metadata)
+  {root}/{location_id}/hourly_bins.{schema}.bin    — binned training grid (bin mappers)
+  {root}/{location_id}/nowcast.{schema}.json       — registry + lag buffer for the nowcast
+  {root}/{location_id}/registry.{schema}.json      — evaluated registry between re-evaluations
+  {root}/{location_id}/ensemble.{schema}.json      — cached per-engine CV errors of the ensemble
+
+The root comes from MODEL_STORE_DIR. On Fly, point it at a mounted volume or
+the store only lives as long as the machine.
+"""
+
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger("model-store")
+
+DEFAULT_MODEL_STORE_DIR = "/tmp/josephine-models"
+
+
+def _safe_key(key: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(key)) or "_"
+
+
+class HourlyModelStore:
+    """Persist and load LightGBM boosters (+ metadata) per location.
+
+    ``kind`` selects the target: "lgbm" (sales, the default) or "tickets".
+    """
+
+    def __init__(self, root: str | None = None):
+        self.root = root or os.getenv("MODEL_STORE_DIR", DEFAULT_MODEL_STORE_DIR)
+        # path -> (mtime, booster); the nowcast reloads the same booster every 15 min
+        self._booster_cache: dict[str, tuple[float, object]] = {}
+
+    def _paths(self, location_id: str, schema: str, kind: str = "lgbm") -> tuple[str, str]:
+        base = os.path.join(self.root, _safe_key(location_id), f"hourly_{kind}.{_safe_key(schema)}")
+        return f"{base}.txt", f"{base}.json"
+
+    def _state_path(self, location_id: str, schema: str) -> str:
+        return os.path.join(self.root, _safe_key(location_id), f"nowcast.{_safe_key(schema)}.json")
+
+    def _registry_path(self, location_id: str, schema: str) -> str:
+        return os.path.join(self.root, _safe_key(location_id), f"registry.{_safe_key(schema)}.json")
+
+    def _ensemble_path(self, location_id: str, schema: str) -> str:
+        return os.path.join(self.root, _safe_key(location_id), f"ensemble.{_safe_key(schema)}.json")
+
+    def _bins_path(self, location_id: str, schema: str) -> str:
+        return os.path.join(self.root, _safe_key(location_id), f"hourly_bins.{_safe_key(schema)}.bin")
+
+    def load(self, location_id: str, schema: str, kind: str = "lgbm"):
+        """Return (booster, meta) or None if nothing usable is stored."""
+        import lightgbm as lgb
+
+        model_path, meta_path = self._paths(location_id, schema, kind)
+        if not (os.path.exists(model_path) and os.path.exists(meta_path)):
+            return None
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            mtime = os.path.getmtime(model_path)
+            cached = self._booster_cache.get(model_path)
+            if cached is not None and cached[0] == mtime:
+                booster = cached[1]
+            else:
+                booster = lgb.Booster(model_file=model_path)
+                self._booster_cache[model_path] = (mtime, booster)
+        except Exception as e:
+            logger.warning("Ignoring unreadable model for %s: %s", location_id, e)
+            return None
+        return booster, meta
+
+    def save(self, location_id: str, schema: str, booster, meta: dict, kind: str = "lgbm") -> None:
+        """Write booster and metadata atomically (temp file + rename)."""
+        model_path, meta_path = self._paths(location_id, schema, kind)
+        os.makedirs(os.path.dirname(model_path), exist_ok=True)
+
+        booster.save_model(model_path + ".tmp")
+        os.replace(model_path + ".tmp", model_path)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+        logger.info("Saved hourly %s model for %s (%d trees)", kind, location_id, booster.num_trees())
+
+    def load_bins(self, location_id: str, schema: str):
+        """Constructed binned Dataset from the last full fit, or None."""
+        import lightgbm as lgb
+
+        path = self._bins_path(location_id, schema)
+        if not os.path.exists(path):
+            return None
+        try:
+            return lgb.Dataset(path, params={"verbose": -1}).construct()
+        except Exception as e:
+            logger.warning("Ignoring unreadable bins for %s: %s", location_id, e)
+            return None
+
+    def save_bins(self, location_id: str, schema: str, dataset) -> None:
+        """Cache a constructed binned Dataset (LightGBM binary format)."""
+        path = self._bins_path(location_id, schema)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        dataset.save_binary(path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    def _load_json(self, path: str, what: str, location_id: str) -> dict | None:
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning("Ignoring unreadable %s for %s: %s", what, location_id, e)
+            return None
+
+    def _save_json(self, path: str, payload: dict) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(payload, f)
+        os.replace(path + ".tmp", path)
+
+    def load_state(self, location_id: str, schema: str) -> dict | None:
+        """Nowcast state written by the last full hourly run, or None."""
+        return self._load_json(self._state_path(location_id, schema), "nowcast state", location_id)
+
+    def save_state(self, location_id: str, schema: str, state: dict) -> None:
+        self._save_json(self._state_path(location_id, schema), state)
+
+    def load_registry(self, location_id: str, schema: str) -> dict | None:
+        """Last evaluated champion/challenger registry (+ conformal, metrics, forecast)."""
+        return self._load_json(self._registry_path(location_id, schema), "registry", location_id)
+
+    def save_registry(self, location_id: str, schema: str, record: dict) -> None:
+        self._save_json(self._registry_path(location_id, schema), record)
+
+    def load_ensemble(self, location_id: str, schema: str) -> dict | None:
+        """Cached ensemble CV errors ({"evaluated_at", "errors", "rmse"}), or None."""
+        return self._load_json(self._ensemble_path(location_id, schema), "ensemble weights", location_id)
+
+    def save_ensemble(self, location_id: str, schema: str, record: dict) -> None:
+        self._save_json(self._ensemble_path(location_id, schema), record)
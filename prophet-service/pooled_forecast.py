@@ -0,0 +1,89 @@
+"""
+Per-location level and trend on top of one pooled Prophet fit.
+
+Multi-location tenants used to get one Prophet fit (plus three CV refits) per
+location. In pooled mode every location is scaled by its own mean, the scaled
+series are averaged per date (DailyPanelAccumulator.combined_daily(1.0)) and
+Prophet is fitted once on that index, so weekly / yearly / monthly seasonality
+and the regressor effects are shared. Each location then only gets its level
+and trend: on the pooled prediction g(t),
+
+    y_l(t) / mean_l ≈ g(t) · (level + slope · years_from_window_centre)
+
+fitted by a 2×2 ridge regression over its last TREND_WINDOW_DAYS. The ridge
+pulls (level, slope) towards (1, 0), i.e. towards the pooled shape at the
+location's own mean, with the weight of RIDGE_PRIOR_DAYS days of data, so a
+location with a few weeks of history borrows its shape from the tenant and
+gets no trend of its own instead of fitting noise.
+"""
+
+import numpy as np
+
+POOLED_MODEL_VERSION = "Prophet_v5_Pooled"
+TREND_WINDOW_DAYS = 365   # history used for a location's level/trend
+RIDGE_PRIOR_DAYS = 28.0   # prior weight of (level=1, slope=0), in days of data
+Z_95 = 1.96
+
+
+def fit_location(ordinals: np.ndarray, sales: np.ndarray, loc_mean: float, g: np.ndarray) -> dict:
+    """Level/trend of one location against the pooled prediction ``g`` of its days.
+
+    ``ordinals`` are the location's day ordinals (ascending), ``sales`` its
+    daily sales and ``g`` the pooled in-sample prediction on those days.
+    Returns {level, slope, anchor (centre ordinal), resid_sd, n_days} plus in-sample error
+    metrics in sales units (mape, rmse, mae, r_squared).
+    """
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    sales = np.asarray(sales, dtype=float)
+    g = np.asarray(g, dtype=float)
+    window = ordinals > ordinals[-1] - TREND_WINDOW_DAYS
+    # Centred time keeps level and slope uncorrelated, so the level prior
+    # doesn't drag the slope (and vice versa)
+    anchor = float(ordinals[window].mean())
+    u = (ordinals[window] - anchor) / 365.0
+    z = sales[window] / loc_mean if loc_mean > 0 else np.zeros(window.sum())
+    gw = g[window]
+
+    # Prior worth RIDGE_PRIOR_DAYS days: for the level, days at the pooled
+    # shape; for the slope, days spread over a full trend window (a slope is
+    # only identified by the spread of u, whose variance over the window is 1/12)
+    X = np.column_stack([gw, gw * u])
+    lam = RIDGE_PRIOR_DAYS * (float(np.mean(gw ** 2)) if len(gw) else 1.0)
+    span = TREND_WINDOW_DAYS / 365.0
+    penalty = np.diag([lam, lam * span ** 2 / 12])
+    level, slope = np.linalg.solve(X.T @ X + penalty, X.T @ z + penalty @ np.array([1.0, 0.0]))
+
+    fitted = np.maximum(level + slope * u, 0.0) * gw * loc_mean
+    actual = sales[window]
+    err = actual - fitted
+    ss_tot = float(((actual - actual.mean()) ** 2).sum()) if len(actual) else 0.0
+    nonzero = actual > 0
+    return {
+        "level": float(level),
+        "slope": float(slope),
+        "anchor": anchor,
+        "resid_sd": float(np.std(err / loc_mean)) if loc_mean > 0 and len(err) > 1 else 0.0,
+        "n_days": int(len(actual)),
+        "mape": float(np.mean(np.abs(err[nonzero]) / actual[nonzero])) if nonzero.any() else 0.0,
+        "rmse": float(np.sqrt(np.mean(err ** 2))) if len(err) else 0.0,
+        "mae": float(np.mean(np.abs(err))) if len(err) else 0.0,
+        "r_squared": 1.0 - float((err ** 2).sum()) / ss_tot if ss_tot > 0 else 0.0,
+    }
+
+
+def location_forecast(
+    fit: dict, loc_mean: float, ordinals: np.ndarray,
+    g: np.ndarray, g_lower: np.ndarray, g_upper: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(yhat, lower, upper) of one location on the pooled prediction of ``ordinals``.
+
+    The band combines the pooled band (scaled to the location) with the
+    location's own residual spread around the pooled shape.
+    """
+    u = (np.asarray(ordinals, dtype=np.int64) - fit["anchor"]) / 365.0
+    mult = np.maximum(fit["level"] + fit["slope"] * u, 0.0) * loc_mean
+    yhat = mult * np.asarray(g, dtype=float)
+    own = Z_95 * fit["resid_sd"] * loc_mean
+    lower = yhat - np.hypot(mult * (np.asarray(g) - np.asarray(g_lower)), own)
+    upper = yhat + np.hypot(mult * (np.asarray(g_upper) - np.asarray(g)), own)
+    return np.maximum(yhat, 0.0), np.maximum(lower, 0.0), np.maximum(upper, 0.0)
@@ -22,26 +22,11 @@ from datetime import datetime, timedelta
 from collections import defaultdict
 from typing import Optional
 
-# ─── Spanish Holidays 2024-2027 ─────────────────────────────────────────────
-
-SPANISH_HOLIDAYS = {
-    # 2024
-    "2024-01-01", "2024-01-06", "2024-03-29", "2024-04-01",
-    "2024-05-01", "2024-08-15", "2024-10-12", "2024-11-01",
-    "2024-12-06", "2024-12-08", "2024-12-25",
-    # 2025
-    "2025-01-01", "2025-01-06", "2025-04-18", "2025-04-21",
-    "2025-05-01", "2025-08-15", "2025-10-12", "2025-11-01",
-    "2025-12-06", "2025-12-08", "2025-12-25",
-    # 2026
-    "2026-01-01", "2026-01-06", "2026-04-03", "2026-04-06",
-    "2026-05-01", "2026-08-15", "2026-10-12", "2026-11-01",
-    "2026-12-06", "2026-12-08", "2026-12-25",
-    # 2027
-    "2027-01-01", "2027-01-06", "2027-03-26", "2027-03-29",
-    "2027-05-01", "2027-08-15", "2027-10-12", "2027-11-01",
-    "2027-12-06", "2027-12-08", "2027-12-25",
-}
+from calendar_index import CALENDAR, to_ordinals
+
+# ─── Calendar ───────────────────────────────────────────────────────────────
+# Holidays (generated per year, Easter-based ones included) and Madrid
+# monthly climate normals come from the shared calendar index.
 
 MADRID_EVENTS = {
     "2025-07-10": 1.4, "2025-07-11": 1.4, "2025-07-12": 1.4,  # Mad Cool
@@ -50,17 +35,7 @@ MADRID_EVENTS = {
     "2026-05-15": 1.2,
 }
 
-# Average temperature by month in Madrid
-AVG_TEMP_MADRID = {
-    1: 8, 2: 10, 3: 13, 4: 15, 5: 19, 6: 24,
-    7: 28, 8: 28, 9: 24, 10: 18, 11: 12, 12: 9,
-}
-
-# Rain probability by month in Madrid
-RAIN_PROB_MADRID = {
-    1: 0.30, 2: 0.28, 3: 0.25, 4: 0.35, 5: 0.30, 6: 0.15,
-    7: 0.10, 8: 0.10, 9: 0.20, 10: 0.30, 11: 0.32, 12: 0.35,
-}
+POS_CALENDAR = CALENDAR.with_events(events=MADRID_EVENTS)
 
 
 # ─── Column Detection ───────────────────────────────────────────────────────
@@ -133,35 +108,32 @@ def parse_number(value: str) -> float:
 
 # ─── Regressor Calculation ───────────────────────────────────────────────────
 
-def compute_regressors(date_str: str) -> dict:
-    """Compute all 9 regressors for a given date."""
-    dt = datetime.strptime(date_str, "%Y-%m-%d")
-    dow = dt.weekday()  # 0=Mon, 6=Sun
-    month = dt.month
-
-    # Day before festivo
-    next_day = (dt + timedelta(days=1)).strftime("%Y-%m-%d")
-
-    # Temperature (mock based on Madrid averages)
-    temp = AVG_TEMP_MADRID.get(month, 18)
-
-    # Rain (deterministic based on month + day for consistency)
-    rain_threshold = RAIN_PROB_MADRID.get(month, 0.25)
-    # Use day of year as pseudo-random seed for reproducibility
-    day_of_year = dt.timetuple().tm_yday
-    rain = 1 if (day_of_year * 7 % 100) / 100 < rain_threshold else 0
-
-    return {
-        "festivo": 1 if date_str in SPANISH_HOLIDAYS else 0,
-        "day_before_festivo": 1 if next_day in SPANISH_HOLIDAYS else 0,
-        "evento_impact": MADRID_EVENTS.get(date_str, 1.0),
-        "payday": 1 if dt.day in (1, 15) or dt.day >= 25 else 0,
-        "temperatura": temp,
-        "rain": rain,
-        "cold_day": 1 if temp < 10 else 0,
-        "weekend": 1 if dow >= 4 else 0,  # Fri, Sat, Sun
-        "mid_week": 1 if dow in (1, 2) else 0,  # Tue, Wed
-    }
+def compute_regressors(dates: list[str]) -> list[dict]:
+    """Compute all 9 regressors for each date (YYYY-MM-DD), sliced from the calendar."""
+    ords = to_ordinals(dates)
+    cal = POS_CALENDAR.frame(ords)
+    dow = cal["dow"].to_numpy()  # 0=Mon, 6=Sun
+
+    # Temperature (mock based on Madrid monthly normals)
+    temp = cal["temp_normal"].to_numpy()
+
+    # Rain (deterministic based on day of year for consistency)
+    rain = ((cal["day_of_year"].to_numpy() * 7 % 100) / 100 < cal["rain_prob"].to_numpy()).astype(int)
+
+    return [
+        {
+            "festivo": int(cal["is_holiday"].iat[i]),
+            "day_before_festivo": int(cal["is_pre_holiday"].iat[i]),
+            "evento_impact": float(cal["event_multiplier"].iat[i]),
+            "payday": int(cal["is_payday"].iat[i]),
+            "temperatura": round(float(temp[i]), 1),
+            "rain": int(rain[i]),
+            "cold_day": int(temp[i] < 10),
+            "weekend": int(dow[i] >= 4),  # Fri, Sat, Sun
+            "mid_week": int(dow[i] in (1, 2)),  # Tue, Wed
+        }
+        for i in range(len(ords))
+    ]
 
 
 # ─── Main ETL ───────────────────────────────────────────────────────────────
@@ -247,14 +219,10 @@ def process_csv(input_path: str) -> list[dict]:
     print(f"Media diaria: EUR {sum(daily_sales.values()) / len(daily_sales):,.2f}")
 
     # Build historical data with regressors
-    historical = []
-    for date_str in dates_sorted:
-        regs = compute_regressors(date_str)
-        historical.append({
-            "ds": date_str,
-            "y": round(daily_sales[date_str], 2),
-            **regs,
-        })
+    historical = [
+        {"ds": date_str, "y": round(daily_sales[date_str], 2), **regs}
+        for date_str, regs in zip(dates_sorted, compute_regressors(dates_sorted))
+    ]
 
     return historical
 
@@ -262,12 +230,8 @@ def process_csv(input_path: str) -> list[dict]:
 def build_future_regressors(last_date: str, horizon_days: int) -> list[dict]:
     """Build future regressor values for forecast period."""
     dt = datetime.strptime(last_date, "%Y-%m-%d")
-    future = []
-    for i in range(1, horizon_days + 1):
-        future_date = (dt + timedelta(days=i)).strftime("%Y-%m-%d")
-        regs = compute_regressors(future_date)
-        future.append({"ds": future_date, **regs})
-    return future
+    future_dates = [(dt + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(1, horizon_days + 1)]
+    return [{"ds": d, **regs} for d, regs in zip(future_dates, compute_regressors(future_dates))]
 
 
 def main():
@@ -0,0 +1,240 @@
+"""
+Cross-location daily sales panel for multi-location learning.
+
+Pages from sales_daily_unified are folded in as they arrive and then dropped,
+so memory stays proportional to the (date × location) grid rather than to the
+raw REST payload. The grid is a pair of dense arrays (rows = day ordinals,
+columns = locations) with per-location running sums and counts next to it, so
+normalizing and averaging across locations are array operations.
+
+PanelStore keeps one panel per tenant between requests. After the first full
+load only the last PANEL_OVERLAP_DAYS (plus anything newer) are fetched again
+and swapped in, and the whole history is reloaded every PANEL_MAX_AGE_HOURS to
+pick up late corrections.
+
+Usage:
+    panel = await PANEL_STORE.get((supabase_url, org_id), fetch, now)
+    rows = panel.combined_daily(panel.location_mean(location_id))
+"""
+
+import asyncio
+import logging
+from collections.abc import Hashable
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from calendar_index import EPOCH, to_ordinals
+
+logger = logging.getLogger("sales-panel")
+
+PANEL_OVERLAP_DAYS = 3     # recent days refetched on every refresh (late POS syncs)
+PANEL_MAX_AGE_HOURS = 24   # full reload after this long
+
+
+class DailyPanelAccumulator:
+    """Incremental (date × location) daily sales aggregator.
+
+    Keeps per-location running sums/counts (for normalization) and per-cell
+    sums/counts/orders (for the per-date cross-location average) as arrays.
+    """
+
+    def __init__(self):
+        self.locations: list[str] = []
+        self._loc_index: dict[str, int] = {}
+        self.first_ordinal: int | None = None
+        self.n_days = 0
+        self.sales = np.zeros((0, 0))
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+        self.orders = np.zeros((0, 0), dtype=np.int64)
+        self.loc_sums = np.zeros(0)
+        self.loc_counts = np.zeros(0, dtype=np.int64)
+
+    # ── Building ──────────────────────────────────────────────────────
+
+    def _grow(self, first: int, last: int, n_locations: int) -> None:
+        """Make room for day ordinals [first, last] and n_locations columns."""
+        if self.first_ordinal is None:
+            self.first_ordinal = first
+        shift = max(self.first_ordinal - first, 0)
+        n_days = max(self.n_days + shift, last - self.first_ordinal + shift + 1)
+        rows, cols = self.sales.shape
+        if shift == 0 and n_days <= rows and n_locations <= cols:
+            self.n_days = n_days
+            return
+        # Grow with headroom so page-by-page loads don't copy on every page
+        new_rows = max(n_days, rows + shift, 2 * rows if n_days > rows else rows)
+        new_cols = max(n_locations, 2 * cols if n_locations > cols else cols)
+        for name in ("sales", "counts", "orders"):
+            old = getattr(self, name)
+            new = np.zeros((new_rows, new_cols), dtype=old.dtype)
+            new[shift:shift + self.n_days, :old.shape[1]] = old[:self.n_days]
+            setattr(self, name, new)
+        self.loc_sums = np.pad(self.loc_sums, (0, new_cols - len(self.loc_sums)))
+        self.loc_counts = np.pad(self.loc_counts, (0, new_cols - len(self.loc_counts)))
+        self.first_ordinal -= shift
+        self.n_days = n_days
+
+    def _columns(self, loc_ids) -> np.ndarray:
+        for loc_id in loc_ids:
+            if loc_id not in self._loc_index:
+                self._loc_index[loc_id] = len(self.locations)
+                self.locations.append(loc_id)
+        return np.array([self._loc_index[loc_id] for loc_id in loc_ids], dtype=np.int64)
+
+    def _add_cells(self, ordinals, loc_ids, sales, counts, orders) -> None:
+        if len(ordinals) == 0:
+            return
+        cols = self._columns(loc_ids)
+        self._grow(int(ordinals.min()), int(ordinals.max()), len(self.locations))
+        rows = ordinals - self.first_ordinal
+        np.add.at(self.sales, (rows, cols), sales)
+        np.add.at(self.counts, (rows, cols), counts)
+        np.add.at(self.orders, (rows, cols), orders)
+        np.add.at(self.loc_sums, cols, sales)
+        np.add.at(self.loc_counts, cols, counts)
+
+    def add(self, rows: list[dict]) -> "DailyPanelAccumulator":
+        """Fold one page of {date, net_sales, location_id[, orders_count]} rows into the panel."""
+        if rows:
+            self._add_cells(
+                to_ordinals([str(r["date"])[:10] for r in rows]),
+                [str(r.get("location_id", "")) for r in rows],
+                np.array([float(r.get("net_sales") or 0) for r in rows]),
+                np.ones(len(rows), dtype=np.int64),
+                np.array([int(r.get("orders_count") or 0) for r in rows], dtype=np.int64),
+            )
+        return self
+
+    def merge(self, other: "DailyPanelAccumulator") -> "DailyPanelAccumulator":
+        """Add every non-empty cell of ``other`` to this panel."""
+        if other.first_ordinal is None:
+            return self
+        rows, cols = np.nonzero(other.counts[:other.n_days, :len(other.locations)])
+        self._add_cells(
+            rows + other.first_ordinal,
+            [other.locations[c] for c in cols],
+            other.sales[rows, cols],
+            other.counts[rows, cols],
+            other.orders[rows, cols],
+        )
+        return self
+
+    def drop_since(self, date_str: str) -> "DailyPanelAccumulator":
+        """Remove every day from ``date_str`` on (before refetching them)."""
+        if self.first_ordinal is None:
+            return self
+        start = max(int(to_ordinals([date_str])[0]) - self.first_ordinal, 0)
+        if start < self.n_days:
+            n_loc = len(self.locations)
+            self.loc_sums[:n_loc] -= self.sales[start:self.n_days, :n_loc].sum(axis=0)
+            self.loc_counts[:n_loc] -= self.counts[start:self.n_days, :n_loc].sum(axis=0)
+            for grid in (self.sales, self.counts, self.orders):
+                grid[start:self.n_days] = 0
+            self.n_days = start
+        return self
+
+    # ── Reading ───────────────────────────────────────────────────────
+
+    @property
+    def n_locations(self) -> int:
+        return int((self.loc_counts[:len(self.locations)] > 0).sum())
+
+    @property
+    def n_rows(self) -> int:
+        return int(self.loc_counts.sum())
+
+    @property
+    def last_date(self) -> str | None:
+        """Latest date with any row, or None for an empty panel."""
+        filled = np.flatnonzero(self.counts[:self.n_days].any(axis=1))
+        if filled.size == 0:
+            return None
+        return str(EPOCH + (self.first_ordinal + int(filled[-1])))
+
+    def _dates(self, rows: np.ndarray) -> list[str]:
+        return list((EPOCH + (rows + self.first_ordinal)).astype(str))
+
+    def location_mean(self, loc_id: str) -> float:
+        col = self._loc_index.get(loc_id)
+        if col is None:
+            return 0.0
+        return float(self.loc_sums[col] / max(self.loc_counts[col], 1))
+
+    def location_daily(self, loc_id: str) -> list[dict]:
+        """One location's rows: [{date, net_sales, orders_count}]."""
+        col = self._loc_index.get(loc_id)
+        if col is None:
+            return []
+        rows = np.flatnonzero(self.counts[:self.n_days, col])
+        return [
+            {"date": d, "net_sales": float(s), "orders_count": int(o)}
+            for d, s, o in zip(self._dates(rows), self.sales[rows, col], self.orders[rows, col])
+        ]
+
+    def combined_daily(self, target_mean: float, locations: list[str] | None = None) -> list[dict]:
+        """Scale every location (or only ``locations``) to ``target_mean`` and average per date.
+
+        Returns sales_daily_unified-shaped rows: [{date, net_sales, orders_count}].
+        """
+        n_loc = len(self.locations)
+        if self.n_days == 0 or n_loc == 0:
+            return []
+        loc_mean = self.loc_sums[:n_loc] / np.maximum(self.loc_counts[:n_loc], 1)
+        scale = np.ones(n_loc)
+        np.divide(target_mean, loc_mean, out=scale, where=loc_mean > 0)
+        keep = np.ones(n_loc, dtype=bool)
+        if locations is not None:
+            keep[:] = False
+            keep[[self._loc_index[l] for l in locations if l in self._loc_index]] = True
+
+        counts = self.counts[:self.n_days, :n_loc] @ keep.astype(np.int64)
+        rows = np.flatnonzero(counts)
+        avg = (self.sales[rows, :n_loc] @ (scale * keep)) / counts[rows]
+        return [
+            {"date": d, "net_sales": float(v), "orders_count": 0}
+            for d, v in zip(self._dates(rows), avg)
+        ]
+
+
+class PanelStore:
+    """Per-tenant panels kept in memory between requests.
+
+    ``tenant`` is any hashable key that identifies one org's data (the service
+    uses (supabase_url, org_id)); ``fetch`` must only return that org's rows.
+    ``fetch(since, on_page)`` must stream the tenant's sales_daily_unified rows
+    (all of them when ``since`` is None, else those dated ``since`` or later)
+    into ``on_page``. Refreshes are fetched into a separate panel and swapped
+    in, so a failed fetch leaves the previous panel as it was.
+    """
+
+    def __init__(self, overlap_days: int = PANEL_OVERLAP_DAYS, max_age_hours: float = PANEL_MAX_AGE_HOURS):
+        self.overlap_days = overlap_days
+        self.max_age = timedelta(hours=max_age_hours)
+        self._panels: dict[Hashable, tuple[datetime, DailyPanelAccumulator]] = {}
+        self._locks: dict[Hashable, asyncio.Lock] = {}
+
+    async def get(self, tenant: Hashable, fetch, now: datetime) -> DailyPanelAccumulator:
+        """The tenant's panel, loaded in full or refreshed from its last days."""
+        lock = self._locks.setdefault(tenant, asyncio.Lock())
+        async with lock:
+            cached = self._panels.get(tenant)
+            panel = cached[1] if cached else None
+            last_date = panel.last_date if panel is not None else None
+
+            if last_date is None or now - cached[0] > self.max_age:
+                panel = DailyPanelAccumulator()
+                await fetch(None, panel.add)
+                self._panels[tenant] = (now, panel)
+                logger.info("Panel %s: full load, %d rows, %d locations", tenant, panel.n_rows, panel.n_locations)
+                return panel
+
+            since = (datetime.fromisoformat(last_date) - timedelta(days=self.overlap_days)).date().isoformat()
+            recent = DailyPanelAccumulator()
+            await fetch(since, recent.add)
+            panel.drop_since(since).merge(recent)
+            logger.info("Panel %s: refreshed from %s, %d rows", tenant, since, recent.n_rows)
+            return panel
+
+    def invalidate(self, tenant: Hashable) -> None:
+        self._panels.pop(tenant, None)
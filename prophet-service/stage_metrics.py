@@ -0,0 +1,85 @@
+"""
+In-process aggregation of hourly pipeline stage timings for /metrics.
+
+Each run's ``timings`` (from HourlyForecaster) is folded into per-stage
+counters and rendered in the Prometheus text format. Counters live in the
+worker process, so with several uvicorn workers each scrape sees one worker;
+the ``pid`` label keeps the series apart.
+"""
+
+import os
+import threading
+
+
+class StageMetrics:
+    """Count / total / max wall time and last RSS per pipeline stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs: dict[str, int] = {}
+        self.stages: dict[str, dict] = {}
+        self.peak_rss_mb: float | None = None
+
+    def record(self, timings: dict | None, kind: str = "hourly") -> None:
+        """Fold one run's ``timings`` ({"total_ms", "peak_rss_mb", "stages"}) in."""
+        if not timings:
+            return
+        with self._lock:
+            self.runs[kind] = self.runs.get(kind, 0) + 1
+            stages = dict(timings.get("stages") or {})
+            if "total_ms" in timings:
+                stages[f"{kind}_total"] = {"ms": timings["total_ms"], "calls": 1}
+            for name, entry in stages.items():
+                agg = self.stages.setdefault(name, {"count": 0, "sum_ms": 0.0, "max_ms": 0.0})
+                agg["count"] += entry.get("calls", 1)
+                agg["sum_ms"] += entry["ms"]
+                agg["max_ms"] = max(agg["max_ms"], entry["ms"])
+                if entry.get("rss_mb") is not None:
+                    agg["rss_mb"] = entry["rss_mb"]
+            if timings.get("peak_rss_mb") is not None:
+                self.peak_rss_mb = max(self.peak_rss_mb or 0.0, timings["peak_rss_mb"])
+
+    def render(self) -> str:
+        """Prometheus text exposition of the counters."""
+        pid = os.getpid()
+        lines = [
+            "# HELP forecast_runs_total Pipeline runs recorded by this worker.",
+            "# TYPE forecast_runs_total counter",
+        ]
+        with self._lock:
+            for kind, n in sorted(self.runs.items()):
+                lines.append(f'forecast_runs_total{{kind="{kind}",pid="{pid}"}} {n}')
+
+            lines += [
+                "# HELP forecast_stage_seconds Wall time per pipeline stage.",
+                "# TYPE forecast_stage_seconds summary",
+            ]
+            for name, agg in sorted(self.stages.items()):
+                labels = f'stage="{name}",pid="{pid}"'
+                lines.append(f"forecast_stage_seconds_count{{{labels}}} {agg['count']}")
+                lines.append(f"forecast_stage_seconds_sum{{{labels}}} {agg['sum_ms'] / 1000:.6f}")
+
+            lines += [
+                "# HELP forecast_stage_max_seconds Slowest single call per stage.",
+                "# TYPE forecast_stage_max_seconds gauge",
+            ]
+            for name, agg in sorted(self.stages.items()):
+                lines.append(
+                    f'forecast_stage_max_seconds{{stage="{name}",pid="{pid}"}} {agg["max_ms"] / 1000:.6f}'
+                )
+
+            lines += [
+                "# HELP forecast_stage_rss_megabytes Process RSS at the end of the stage (last run).",
+                "# TYPE forecast_stage_rss_megabytes gauge",
+            ]
+            for name, agg in sorted(self.stages.items()):
+                if "rss_mb" in agg:
+                    lines.append(f'forecast_stage_rss_megabytes{{stage="{name}",pid="{pid}"}} {agg["rss_mb"]}')
+
+            if self.peak_rss_mb is not None:
+                lines += [
+                    "# HELP forecast_peak_rss_megabytes Highest per-run peak RSS on this worker.",
+                    "# TYPE forecast_peak_rss_megabytes gauge",
+                    f'forecast_peak_rss_megabytes{{pid="{pid}"}} {self.peak_rss_mb}',
+                ]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,121 @@
+"""
+Async access to the Supabase REST API (PostgREST) over one pooled client.
+
+A single httpx.AsyncClient per worker keeps TLS connections to Supabase alive
+across requests instead of opening a client (and handshakes) per call.
+
+PostgREST caps each response at its max-rows setting (1000 on Supabase), so
+whole tables are read page by page with Range headers. fetch_pages requests
+pages in concurrent waves and hands them over in order.
+"""
+
+import asyncio
+import logging
+
+import httpx
+
+logger = logging.getLogger("supabase-rest")
+
+PAGE_SIZE = 1000
+PAGE_CONCURRENCY = 6
+
+_client: httpx.AsyncClient | None = None
+
+
+def shared_client() -> httpx.AsyncClient:
+    """The worker's pooled client (created on first use)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=30,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _client
+
+
+async def aclose() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def fetch_pages(
+    client: httpx.AsyncClient,
+    url: str,
+    headers: dict,
+    on_page=None,
+    page_size: int = PAGE_SIZE,
+    concurrency: int = PAGE_CONCURRENCY,
+):
+    """Read every row of ``url`` (which must set an ``order``) page by page.
+
+    The first page is fetched alone (most reads fit in it); after that,
+    ``concurrency`` pages are requested at a time until a short page marks
+    the end. With ``on_page`` each page is handed to the callback in order
+    and dropped, and the row count is returned; otherwise the rows are.
+    Raises httpx.HTTPStatusError on a failed page.
+    """
+    async def get_page(page: int) -> list[dict]:
+        resp = await client.get(
+            url,
+            headers={**headers, "Range": f"{page * page_size}-{(page + 1) * page_size - 1}"},
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    rows: list[dict] = []
+    n_rows = 0
+    page = 0
+    n_pages = 1
+    while True:
+        batch = await asyncio.gather(*(get_page(p) for p in range(page, page + n_pages)))
+        done = False
+        for rows_page in batch:
+            if rows_page:
+                if on_page is not None:
+                    on_page(rows_page)
+                else:
+                    rows.extend(rows_page)
+                n_rows += len(rows_page)
+            if len(rows_page) < page_size:
+                done = True
+                break
+        if done:
+            break
+        page += n_pages
+        n_pages = concurrency
+
+    logger.debug("Fetched %d rows from %s", n_rows, url.split("?")[0])
+    return n_rows if on_page is not None else rows
+
+
+async def upsert(
+    client: httpx.AsyncClient,
+    url: str,
+    headers: dict,
+    rows: list[dict],
+    on_conflict: str | None,
+    batch_size: int = 500,
+) -> int:
+    """Upsert ``rows`` in concurrent batches; returns the number stored.
+
+    With ``on_conflict=None`` the batches are plain inserts (for tables that
+    are cleared first and have no unique key to merge on).
+    """
+    prefer = "return=minimal" if on_conflict is None else "resolution=merge-duplicates,return=minimal"
+    target = url if on_conflict is None else f"{url}?on_conflict={on_conflict}"
+
+    async def post(batch: list[dict]) -> int:
+        resp = await client.post(
+            target,
+            headers={**headers, "Content-Type": "application/json", "Prefer": prefer},
+            json=batch,
+        )
+        if resp.status_code >= 400:
+            logger.error("Upsert error on %s: %s", url.split("/")[-1], resp.text[:200])
+            return 0
+        return len(batch)
+
+    batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+    return sum(await asyncio.gather(*(post(b) for b in batches)))
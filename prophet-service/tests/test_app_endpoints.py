@@ -0,0 +1,183 @@
+"""
+Tests for the FastAPI endpoints in app.py against a mocked Supabase REST API.
+
+Run with: python -m pytest tests/test_app_endpoints.py -v
+Or standalone: python tests/test_app_endpoints.py
+"""
+
+import sys
+import os
+import asyncio
+import json
+import tempfile
+from datetime import datetime, timedelta
+
+import httpx
+import numpy as np
+from fastapi import HTTPException
+
+# Ensure prophet-service root is on path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+import batch_prophet
+import supabase_rest
+from hourly_forecaster import HourlyForecaster
+from model_store import HourlyModelStore
+
+
+# ─── Helpers ──────────────────────────────────────────────────────────────────
+
+def sales_15m(n_days: int, end_date) -> list[dict]:
+    """facts_sales_15m rows for the ``n_days`` days up to ``end_date``, hours 10-22."""
+    rng = np.random.default_rng(0)
+    rows = []
+    for d in range(n_days):
+        day = end_date - timedelta(days=n_days - 1 - d)
+        for hour in range(10, 23):
+            for minute in (0, 15, 30, 45):
+                base = 50 + 20 * np.sin(hour * 0.5) + rng.uniform(-5, 5)
+                rows.append({
+                    "ts_bucket": f"{day}T{hour:02d}:{minute:02d}:00+00:00",
+                    "sales_net": round(float(base), 2),
+                    "tickets": max(1, int(base / 25)),
+                })
+    return rows
+
+
+def daily_sales(n_days: int, end_date) -> list[dict]:
+    """sales_daily_unified rows for the ``n_days`` days up to ``end_date``."""
+    weekly = [0.85, 0.9, 0.95, 1.0, 1.2, 1.3, 0.8]
+    rows = []
+    for d in range(n_days):
+        day = end_date - timedelta(days=n_days - 1 - d)
+        rows.append({
+            "date": day.isoformat(), "net_sales": round(2000 * weekly[day.weekday()] + 3 * d, 2),
+            "orders_count": 80, "avg_check": 25.0, "labor_cost": 0, "labor_hours": 0,
+        })
+    return rows
+
+
+def fake_supabase(log: list, data_source: str = "pos", tables: dict | None = None) -> httpx.MockTransport:
+    """``tables`` (name -> rows, empty by default) served with their ``select``
+    columns, a resolve_data_source RPC answering ``data_source``, and every
+    request recorded in ``log`` as (method, path, body)."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        body = json.loads(request.content) if request.content else None
+        log.append((request.method, path, body))
+        if path.endswith("/rpc/resolve_data_source"):
+            return httpx.Response(200, json={"data_source": data_source})
+        if request.method == "GET":
+            rows = (tables or {}).get(path.rsplit("/", 1)[-1], [])
+            select = request.url.params.get("select")
+            if select:
+                rows = [{k: r[k] for k in select.split(",") if k in r} for r in rows]
+            return httpx.Response(200, json=rows)
+        return httpx.Response(201 if request.method == "POST" else 204)
+
+    return httpx.MockTransport(handler)
+
+
+def with_mock_client(transport: httpx.MockTransport, coro_fn):
+    """Run ``coro_fn()`` with the pooled Supabase client routed to ``transport``."""
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            supabase_rest.shared_client = lambda: client
+            return await coro_fn()
+
+    real_shared_client = supabase_rest.shared_client
+    try:
+        return asyncio.run(run())
+    finally:
+        supabase_rest.shared_client = real_shared_client
+
+
+# ─── Tests ────────────────────────────────────────────────────────────────────
+
+def test_nowcast_resolves_data_source():
+    """Without data_source the nowcast asks resolve_data_source, like /forecast_hourly."""
+    yesterday = datetime.utcnow().date() - timedelta(days=1)
+    log = []
+    real_store = app.HOURLY_MODEL_STORE
+    with tempfile.TemporaryDirectory() as root:
+        app.HOURLY_MODEL_STORE = HourlyModelStore(root)
+        try:
+            HourlyForecaster(location_id="loc-1", model_store=app.HOURLY_MODEL_STORE).run(
+                sales_15m(60, yesterday), horizon_days=3, enable_gating=True,
+            )
+            body = with_mock_client(fake_supabase(log), lambda: app.forecast_hourly_nowcast({
+                "supabase_url": "http://supabase.test", "supabase_key": "key",
+                "location_id": "loc-1", "org_id": "org-1",
+            }, authorization=f"Bearer {app.API_KEY}"))
+        finally:
+            app.HOURLY_MODEL_STORE = real_store
+
+    assert body["success"], body
+    rpc = [b for m, p, b in log if p.endswith("/rpc/resolve_data_source")]
+    assert rpc == [{"p_org_id": "org-1"}], rpc
+    written = [b for m, p, b in log if m == "POST" and p.endswith("/forecast_hourly_metrics")]
+    assert written and all(row["data_source"] == "pos" for batch in written for row in batch)
+    print("  PASS: nowcast rows carry the resolved data_source")
+
+
+def test_location_org_reads_org_id():
+    """A location's org comes from locations.org_id, not the legacy group_id."""
+    tables = {"locations": [{"id": "loc-1", "org_id": "org-1", "group_id": None}]}
+    org = with_mock_client(
+        fake_supabase([], tables=tables), lambda: app._location_org("http://supabase.test", {}, "loc-1"),
+    )
+    assert org == "org-1", org
+    print("  PASS: location org from org_id")
+
+
+def test_forecast_supabase_batch_backend():
+    """backend="batch" is logged as the batch algorithm; unknown backends are a 400."""
+    today = datetime.utcnow().date()
+    log = []
+    request = {
+        "supabase_url": "http://supabase.test", "supabase_key": "key",
+        "location_id": "loc-1", "horizon_days": 7, "backend": "batch",
+    }
+    transport = fake_supabase(log, tables={"sales_daily_unified": daily_sales(60, today - timedelta(days=1))})
+    body = with_mock_client(transport, lambda: app.forecast_supabase(request, authorization=f"Bearer {app.API_KEY}"))
+    assert body["success"] and body["forecasts_stored"] == 7, body
+    runs = [b for m, p, b in log if m == "POST" and p.endswith("/forecast_model_runs")]
+    assert runs[0]["algorithm"] == batch_prophet.BATCH_ALGORITHM
+    assert runs[0]["model_version"] == batch_prophet.BATCH_MODEL_VERSION
+
+    try:
+        with_mock_client(transport, lambda: app.forecast_supabase(
+            {**request, "backend": "stan"}, authorization=f"Bearer {app.API_KEY}",
+        ))
+        raise AssertionError("unknown backend accepted")
+    except HTTPException as e:
+        assert e.status_code == 400, e.detail
+    print("  PASS: batch backend logged as batch; unknown backend rejected")
+
+
+# ─── Runner ──────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    tests = [
+        ("Nowcast: resolved data_source", test_nowcast_resolves_data_source),
+        ("Panel: location org from org_id", test_location_org_reads_org_id),
+        ("Prophet: batch backend", test_forecast_supabase_batch_backend),
+    ]
+
+    passed = 0
+    failed = 0
+    for name, fn in tests:
+        try:
+            print(f"\n[TEST] {name}")
+            fn()
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {e}")
+            failed += 1
+
+    print(f"\n{'='*60}")
+    print(f"Results: {passed} passed, {failed} failed, {passed + failed} total")
+    if failed > 0:
+        sys.exit(1)
+    print("All tests passed!")
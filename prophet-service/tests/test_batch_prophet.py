@@ -0,0 +1,175 @@
+"""
+Tests for the in-process Prophet MAP fitter (batch_prophet.py): prediction
+frame shape and parity with Prophet itself.
+
+Run with: python -m pytest tests/test_batch_prophet.py -v
+Or standalone: python tests/test_batch_prophet.py
+"""
+
+import sys
+import os
+import logging
+import unittest
+
+import numpy as np
+import pandas as pd
+
+# Ensure prophet-service root is on path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_prophet import BatchProphet
+
+
+WEEKLY = np.array([0.85, 0.9, 0.95, 1.0, 1.2, 1.3, 0.8])  # Mon..Sun
+REGRESSOR_MODES = {
+    "festivo": "additive", "temperatura": "additive",
+    "evento_impact": "multiplicative", "weekend": "additive",
+}
+
+
+# ─── Helpers ──────────────────────────────────────────────────────────────────
+
+def synthetic_sales(n_days: int, seed: int) -> pd.DataFrame:
+    """Growing daily sales with a weekly shape, holidays, temperature and events."""
+    rng = np.random.default_rng(seed)
+    ds = pd.date_range("2024-06-01", periods=n_days)
+    dow = ds.dayofweek.to_numpy()
+    festivo = (rng.random(n_days) < 0.04).astype(float)
+    temperatura = 15 + 8 * np.sin(2 * np.pi * np.arange(n_days) / 365) + rng.normal(0, 2, n_days)
+    evento = 1 + (rng.random(n_days) < 0.05) * 0.3
+    level = 2000 + np.linspace(0, 400, n_days)
+    y = level * WEEKLY[dow] * (1 + 0.2 * (evento - 1)) + 60 * festivo - 5 * (temperatura - 15)
+    return pd.DataFrame({
+        "ds": ds, "y": y + rng.normal(0, 60, n_days),
+        "festivo": festivo, "temperatura": temperatura, "evento_impact": evento,
+        "weekend": (dow >= 5).astype(float),
+    })
+
+
+def future_frame(df: pd.DataFrame, periods: int) -> pd.DataFrame:
+    """History plus ``periods`` days, reusing the last days' regressor values."""
+    future = pd.DataFrame({"ds": pd.date_range(df["ds"].max() + pd.Timedelta(days=1), periods=periods)})
+    for name in REGRESSOR_MODES:
+        future[name] = df[name].iloc[-periods:].to_numpy()
+    future["weekend"] = (future["ds"].dt.dayofweek >= 5).astype(float)
+    return pd.concat([df.drop(columns="y"), future], ignore_index=True)
+
+
+def configure(model):
+    """The seasonalities and regressors fit_prophet_model sets up."""
+    model.add_seasonality(name="monthly", period=30.5, fourier_order=5)
+    for name, mode in REGRESSOR_MODES.items():
+        model.add_regressor(name, mode=mode)
+    return model
+
+
+def new_batch_model(n_days: int, mode: str = "multiplicative") -> BatchProphet:
+    return configure(BatchProphet(
+        yearly_seasonality=n_days >= 365, seasonality_mode=mode, interval_width=0.95,
+    ))
+
+
+def neg_log_posterior(model: BatchProphet, df: pd.DataFrame, yhat: np.ndarray, params: dict) -> float:
+    """prophet.stan's objective (up to constants) at ``params`` on the scaled history."""
+    resid = (df["y"].to_numpy() - yhat) / model.y_scale
+    sigma = params["sigma_obs"]
+    return float(
+        len(resid) * np.log(sigma) + (resid ** 2).sum() / (2 * sigma ** 2)
+        + (params["k"] ** 2 + params["m"] ** 2) / 50 + np.abs(params["delta"]).sum() / 0.05
+        + 2 * sigma ** 2 + (np.asarray(params["beta"]) ** 2).sum() / 200
+    )
+
+
+# ─── Tests ────────────────────────────────────────────────────────────────────
+
+def test_prediction_frame():
+    """predict returns Prophet's columns, a tight in-sample fit and ordered bands."""
+    df = synthetic_sales(200, seed=4)
+    model = new_batch_model(len(df)).fit(df)
+    pred = model.predict(future_frame(df, 30), seed=0)
+
+    assert len(pred) == 230
+    for col in ("trend", "yhat", "yhat_lower", "yhat_upper", "trend_lower", "trend_upper",
+                "weekly", "monthly", "festivo", "evento_impact", "additive_terms", "multiplicative_terms"):
+        assert col in pred.columns, col
+    assert "yearly" not in pred.columns
+
+    in_sample = pred["yhat"].to_numpy()[:200]
+    mape = np.mean(np.abs(in_sample - df["y"].to_numpy()) / df["y"].to_numpy())
+    assert mape < 0.05, mape
+    assert (pred["yhat_lower"] <= pred["yhat"]).all() and (pred["yhat"] <= pred["yhat_upper"]).all()
+    # Trend uncertainty only starts after the history
+    trend_width = (pred["trend_upper"] - pred["trend_lower"]).to_numpy()
+    assert np.allclose(trend_width[:200], 0) and trend_width[-1] > trend_width[200]
+    # Multiplicative components are relative, additive ones in sales units
+    np.testing.assert_allclose(
+        pred["yhat"], pred["trend"] * (1 + pred["multiplicative_terms"]) + pred["additive_terms"],
+    )
+    print("  PASS: prediction frame")
+
+
+def test_parity_with_prophet():
+    """Same forecasts (and an at-least-as-good MAP) as Prophet on synthetic series."""
+    try:
+        from prophet import Prophet
+    except ImportError:
+        raise unittest.SkipTest("prophet not installed")
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+
+    for n_days, seed, mode in ((200, 2, "multiplicative"), (420, 3, "multiplicative"), (90, 1, "additive")):
+        df = synthetic_sales(n_days, seed)
+        prophet = configure(Prophet(
+            yearly_seasonality=n_days >= 365, weekly_seasonality=True, daily_seasonality=False,
+            seasonality_mode=mode, interval_width=0.95,
+        )).fit(df)
+        batch = new_batch_model(n_days, mode).fit(df)
+
+        future = future_frame(df, 30)
+        expected = prophet.predict(future)
+        got = batch.predict(future, seed=0)
+        scale = expected["yhat"].abs().mean()
+        assert np.abs(got["yhat"] - expected["yhat"]).max() / scale < 0.01
+        if mode == "multiplicative":
+            # (additive: weekend + weekly terms can trade level with the trend)
+            assert np.abs(got["trend"] - expected["trend"]).max() / scale < 0.01
+        width, expected_width = (got["yhat_upper"] - got["yhat_lower"]), (expected["yhat_upper"] - expected["yhat_lower"])
+        assert abs(width.mean() / expected_width.mean() - 1) < 0.1
+
+        prophet_params = {k: np.ravel(v) for k, v in prophet.params.items()}
+        prophet_params = {
+            "k": prophet_params["k"][0], "m": prophet_params["m"][0], "sigma_obs": prophet_params["sigma_obs"][0],
+            "delta": prophet_params["delta"], "beta": prophet_params["beta"],
+        }
+        history = df.drop(columns="y")
+        ours = neg_log_posterior(batch, df, batch.predict(history)["yhat"].to_numpy(), batch.params)
+        theirs = neg_log_posterior(batch, df, prophet.predict(history)["yhat"].to_numpy(), prophet_params)
+        assert ours <= theirs + 0.1, (ours, theirs)
+    print("  PASS: parity with Prophet")
+
+
+# ─── Runner ──────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    tests = [
+        ("BatchProphet: prediction frame", test_prediction_frame),
+        ("BatchProphet: parity with Prophet", test_parity_with_prophet),
+    ]
+
+    passed = 0
+    failed = 0
+    for name, fn in tests:
+        try:
+            print(f"\n[TEST] {name}")
+            fn()
+            passed += 1
+        except unittest.SkipTest as e:
+            print(f"  SKIP: {e}")
+        except Exception as e:
+            print(f"  FAIL: {e}")
+            failed += 1
+
+    print(f"\n{'='*60}")
+    print(f"Results: {passed} passed, {failed} failed, {passed + failed} total")
+    if failed > 0:
+        sys.exit(1)
+    print("All tests passed!")
@@ -0,0 +1,127 @@
+"""
+Tests for the shared day-indexed calendar.
+
+Run with: python -m pytest tests/test_calendar_index.py -v
+Or standalone: python tests/test_calendar_index.py
+"""
+
+import sys
+import os
+from datetime import date, timedelta
+
+import numpy as np
+
+# Ensure prophet-service root is on path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calendar_index import CALENDAR, MADRID_CLIMATE, easter_sunday, spanish_holidays, to_ordinals
+
+
+# The hardcoded national holidays the engines used to carry
+LEGACY_HOLIDAYS_2024_2027 = {
+    "2024-01-01", "2024-01-06", "2024-03-29", "2024-04-01",
+    "2024-05-01", "2024-08-15", "2024-10-12", "2024-11-01",
+    "2024-12-06", "2024-12-08", "2024-12-25",
+    "2025-01-01", "2025-01-06", "2025-04-18", "2025-04-21",
+    "2025-05-01", "2025-08-15", "2025-10-12", "2025-11-01",
+    "2025-12-06", "2025-12-08", "2025-12-25",
+    "2026-01-01", "2026-01-06", "2026-04-03", "2026-04-06",
+    "2026-05-01", "2026-08-15", "2026-10-12", "2026-11-01",
+    "2026-12-06", "2026-12-08", "2026-12-25",
+    "2027-01-01", "2027-01-06", "2027-03-26", "2027-03-29",
+    "2027-05-01", "2027-08-15", "2027-10-12", "2027-11-01",
+    "2027-12-06", "2027-12-08", "2027-12-25",
+}
+
+
+# ─── Tests ────────────────────────────────────────────────────────────────────
+
+def test_generated_holidays():
+    """Easter dates are right and the generated years reproduce the old lists."""
+    known_easter = {2019: date(2019, 4, 21), 2024: date(2024, 3, 31), 2025: date(2025, 4, 20),
+                    2038: date(2038, 4, 25), 2040: date(2040, 4, 1)}
+    for year, easter in known_easter.items():
+        assert easter_sunday(year) == easter, year
+
+    generated = {d.isoformat() for d in spanish_holidays(2024, 2027)}
+    assert generated == LEGACY_HOLIDAYS_2024_2027
+    assert "2030-04-19" in CALENDAR.holiday_strings()  # Good Friday 2030, past the old lists
+    print("  PASS: generated holidays")
+
+
+def test_slices_match_per_row():
+    """Every column equals the per-day computation it replaces."""
+    holidays = CALENDAR.holiday_strings()
+    days = [date(2016, 2, 27) + timedelta(days=k) for k in range(0, 9000, 7)]
+    frame = CALENDAR.frame(to_ordinals([d.isoformat() for d in days]))
+    for i, d in enumerate(days):
+        row = frame.iloc[i]
+        assert row["dow"] == d.weekday()
+        assert (row["month"], row["day"]) == (d.month, d.day)
+        assert row["week_of_year"] == d.isocalendar()[1]
+        assert row["quarter"] == (d.month - 1) // 3 + 1
+        assert row["day_of_year"] == d.timetuple().tm_yday
+        assert row["is_holiday"] == int(d.isoformat() in holidays)
+        assert row["is_pre_holiday"] == int((d + timedelta(days=1)).isoformat() in holidays)
+        assert row["is_post_holiday"] == int((d - timedelta(days=1)).isoformat() in holidays)
+        assert row["is_payday"] == int(d.day in (1, 15) or d.day >= 25)
+        assert row["temp_normal"] == MADRID_CLIMATE[d.month]["avg"]
+        assert row["rain_prob"] == MADRID_CLIMATE[d.month]["rain"]
+
+    # Strings, dates and datetime64 give the same ordinals
+    iso = ["2026-04-03", "2031-12-31"]
+    assert (to_ordinals(iso) == to_ordinals([date(2026, 4, 3), date(2031, 12, 31)])).all()
+    assert (to_ordinals(iso) == to_ordinals(np.array(iso, dtype="datetime64[ns]"))).all()
+    assert CALENDAR.row(date(2026, 4, 3))["is_holiday"] == 1
+    print("  PASS: calendar slices match per-row values")
+
+
+def test_with_events_and_range():
+    """event_calendar holidays replace the generated ones; events set multipliers."""
+    merged = CALENDAR.with_events(
+        holidays=["2026-05-15", "2026-11-09"],
+        events={"2026-07-10": 1.4, "2099-01-01": 2.0},  # out-of-range dates are ignored
+    )
+    ords = to_ordinals(["2026-05-14", "2026-05-15", "2026-05-16", "2026-01-01", "2026-07-10"])
+    assert merged.take("is_holiday", ords).tolist() == [0, 1, 0, 0, 0]
+    assert merged.take("is_pre_holiday", ords).tolist() == [1, 0, 0, 0, 0]
+    assert merged.take("is_post_holiday", ords).tolist() == [0, 0, 1, 0, 0]
+    assert merged.take("event_multiplier", ords).tolist() == [1.0, 1.0, 1.0, 1.0, 1.4]
+    # The shared default calendar is untouched
+    assert CALENDAR.take("is_holiday", ords).tolist() == [0, 0, 0, 1, 0]
+    assert CALENDAR.event_multiplier.max() == 1.0
+
+    try:
+        CALENDAR.take("month", to_ordinals(["1999-01-01"]))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError outside the calendar range")
+    print("  PASS: event merge and range check")
+
+
+# ─── Runner ──────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    tests = [
+        ("Calendar: generated holidays", test_generated_holidays),
+        ("Calendar: slices match per-row values", test_slices_match_per_row),
+        ("Calendar: event merge and range", test_with_events_and_range),
+    ]
+
+    passed = 0
+    failed = 0
+    for name, fn in tests:
+        try:
+            print(f"\n[TEST] {name}")
+            fn()
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {e}")
+            failed += 1
+
+    print(f"\n{'='*60}")
+    print(f"Results: {passed} passed, {failed} failed, {passed + failed} total")
+    if failed > 0:
+        sys.exit(1)
+    print("All tests passed!")
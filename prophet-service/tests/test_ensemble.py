@@ -0,0 +1,158 @@
+"""
+Tests for the ensemble blend (weights, cache freshness, per-day combination)
+and the shared daily frame it feeds the daily engines.
+
+Run with: python -m pytest tests/test_ensemble.py -v
+Or standalone: python tests/test_ensemble.py
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Ensure prophet-service root is on path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ensemble import combine_daily, inverse_error_weights, weighted_error, weights_fresh
+from hourly_forecaster import HourlyAccumulator
+from model_store import HourlyModelStore
+from xgboost_forecaster import DailySalesAccumulator
+
+
+# ─── Helpers ──────────────────────────────────────────────────────────────────
+
+def daily_rows(start: str, values: list[float], spread: float = 0.1) -> list[dict]:
+    d0 = datetime.fromisoformat(start)
+    return [
+        {
+            "date": (d0 + timedelta(days=i)).date().isoformat(),
+            "forecast_sales": v,
+            "forecast_sales_lower": v * (1 - spread),
+            "forecast_sales_upper": v * (1 + spread),
+        }
+        for i, v in enumerate(values)
+    ]
+
+
+# ─── Tests ────────────────────────────────────────────────────────────────────
+
+def test_inverse_error_weights():
+    """Lower CV error → higher weight; unknown errors count as the worst known."""
+    w = inverse_error_weights({"prophet": 0.20, "xgboost": 0.10, "hourly": 0.10})
+    assert abs(sum(w.values()) - 1) < 1e-9
+    assert abs(w["xgboost"] - 2 * w["prophet"]) < 1e-9
+    assert w["xgboost"] == w["hourly"]
+
+    w = inverse_error_weights({"prophet": None, "xgboost": 0.10, "hourly": 0.05})
+    assert abs(w["prophet"] - w["xgboost"]) < 1e-9 and w["hourly"] > w["xgboost"]
+
+    # No usable error (CV skipped or failed): equal weights
+    w = inverse_error_weights({"prophet": 0, "xgboost": float("nan")})
+    assert w == {"prophet": 0.5, "xgboost": 0.5}
+
+    # A near-perfect fold is floored instead of taking all the weight
+    w = inverse_error_weights({"prophet": 0.0001, "xgboost": 0.02})
+    assert w["prophet"] < 0.7
+    print("  PASS: inverse error weights")
+
+
+def test_weights_cache_freshness():
+    """Cached errors are reused within the TTL and round-trip the model store."""
+    import tempfile
+
+    now = datetime(2026, 4, 10, 6, 0)
+    record = {"evaluated_at": (now - timedelta(days=2)).isoformat(), "errors": {"prophet": 0.12}}
+    assert weights_fresh(record, now)
+    assert not weights_fresh(record, now, ttl_days=1)
+    assert not weights_fresh(None, now)
+    assert not weights_fresh({"evaluated_at": "garbage", "errors": {"prophet": 0.1}}, now)
+    assert not weights_fresh({"evaluated_at": now.isoformat(), "errors": {}}, now)
+
+    with tempfile.TemporaryDirectory() as root:
+        store = HourlyModelStore(root)
+        assert store.load_ensemble("loc-1", "ens1") is None
+        store.save_ensemble("loc-1", "ens1", record)
+        assert store.load_ensemble("loc-1", "ens1") == record
+        assert store.load_ensemble("loc-1", "ens2") is None
+    print("  PASS: weights cache freshness")
+
+
+def test_combine_renormalizes_per_day():
+    """Days past the short hourly horizon blend only the engines that cover them."""
+    forecasts = {
+        "prophet": daily_rows("2026-04-11", [1000.0] * 5),
+        "xgboost": daily_rows("2026-04-11", [1200.0] * 5),
+        "hourly": daily_rows("2026-04-11", [1100.0] * 2),
+    }
+    weights = {"prophet": 0.25, "xgboost": 0.25, "hourly": 0.5}
+    combined = combine_daily(forecasts, weights)
+
+    assert [r["date"] for r in combined] == [f"2026-04-{d}" for d in range(11, 16)]
+    assert combined[0]["forecast_sales"] == 0.25 * 1000 + 0.25 * 1200 + 0.5 * 1100
+    assert combined[0]["engines"] == {"hourly": 1100.0, "prophet": 1000.0, "xgboost": 1200.0}
+    # Beyond the hourly horizon: prophet and xgboost at 50/50
+    assert combined[2]["forecast_sales"] == 1100.0
+    assert set(combined[2]["engines"]) == {"prophet", "xgboost"}
+    for r in combined:
+        assert r["forecast_sales_lower"] <= r["forecast_sales"] <= r["forecast_sales_upper"]
+
+    # Zero-weight engines are ignored entirely
+    combined = combine_daily(forecasts, {"prophet": 1.0, "xgboost": 0.0, "hourly": 0.0})
+    assert all(r["forecast_sales"] == 1000.0 for r in combined)
+    assert abs(weighted_error({"prophet": 0.1, "xgboost": None}, {"prophet": 0.6, "xgboost": 0.4}) - 0.06) < 1e-12
+    print("  PASS: combine renormalizes per day")
+
+
+def test_shared_daily_frame():
+    """The hourly grid's daily totals match a direct daily fold of the same rows."""
+    rng = np.random.default_rng(3)
+    rows = []
+    for day in range(40):
+        d = datetime(2026, 1, 1) + timedelta(days=day)
+        if day % 9 == 4:
+            continue  # closed day
+        for q in range(12 * 4, 23 * 4):
+            ts = d + timedelta(minutes=15 * q)
+            rows.append({"ts_bucket": ts.isoformat(), "sales_net": float(rng.gamma(2, 20)), "tickets": 1})
+
+    hourly = HourlyAccumulator()
+    direct = DailySalesAccumulator("ts_bucket", "sales_net")
+    for i in range(0, len(rows), 1000):
+        hourly.add(rows[i:i + 1000])
+        direct.add(rows[i:i + 1000])
+
+    shared, expected = hourly.daily_sales(), direct.to_frame()
+    assert shared["date"].tolist() == list(expected["date"])
+    assert np.allclose(shared["sales"], expected["sales"])
+    assert len(HourlyAccumulator().daily_sales()) == 0
+    print("  PASS: shared daily frame")
+
+
+# ─── Runner ──────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    tests = [
+        ("Ensemble: inverse error weights", test_inverse_error_weights),
+        ("Ensemble: weights cache freshness", test_weights_cache_freshness),
+        ("Ensemble: per-day renormalization", test_combine_renormalizes_per_day),
+        ("Ensemble: shared daily frame", test_shared_daily_frame),
+    ]
+
+    passed = 0
+    failed = 0
+    for name, fn in tests:
+        try:
+            print(f"\n[TEST] {name}")
+            fn()
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {e}")
+            failed += 1
+
+    print(f"\n{'='*60}")
+    print(f"Results: {passed} passed, {failed} failed, {passed + failed} total")
+    if failed > 0:
+        sys.exit(1)
+    print("All tests passed!")
@@ -7,7 +7,9 @@ Or standalone: python tests/test_hourly_hardening.py
 
 import sys
 import os
-from datetime import date, timedelta
+import tempfile
+import time
+from datetime import date, datetime, timedelta
 
 import numpy as np
 import pandas as pd
@@ -15,13 +17,34 @@ import pandas as pd
 # Ensure prophet-service root is on path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from model_store import HourlyModelStore
+from stage_metrics import StageMetrics
 from hourly_forecaster import (
     aggregate_to_hourly,
     fill_hourly_grid,
+    build_hourly_grid,
+    HourlyAccumulator,
     build_features,
     compute_gating,
     apply_gating_to_registry,
+    champion_matrix,
+    date_to_ordinal,
+    service_hour_mask,
+    infer_service_hours,
+    CLOSED_MODEL,
     HourlyForecaster,
+    StageTimer,
+    TenantHourlyForecaster,
+    INCREMENTAL_TREES,
+    FEATURE_SCHEMA_VERSION,
+    LGBM_PARAMS,
+    select_tree_budget,
+    fit_or_refresh_lgbm,
+    GridDataset,
+    nowcast_today,
+    registry_drift_buckets,
+    registry_to_records,
+    average_ticket,
     GATING_LOW_MAX_DAYS,
     GATING_MID_MAX_DAYS,
     GATING_MID_BLEND_RATIO,
@@ -52,8 +75,36 @@ def generate_fake_15m_data(n_days: int, start_date: date = date(2026, 1, 1)) ->
     return rows
 
 
+def reference_hourly_grid(sales_15m: list[dict]) -> pd.DataFrame:
+    """The original pandas path: groupby to hourly, then MultiIndex product + merge.
+
+    Each timestamp keeps its own wall-clock date/hour (its written offset),
+    as pd.to_datetime did for single-offset inputs.
+    """
+    df = pd.DataFrame(sales_15m)
+    ts = df["ts_bucket"].map(pd.Timestamp)
+    df["sale_date"] = ts.map(lambda t: t.date())
+    df["hour_of_day"] = ts.map(lambda t: t.hour)
+    df["sales_net"] = pd.to_numeric(df["sales_net"], errors="coerce").fillna(0)
+    df["tickets"] = pd.to_numeric(df["tickets"], errors="coerce").fillna(0).astype(int)
+    hourly = (
+        df.groupby(["sale_date", "hour_of_day"])
+        .agg(sales_net=("sales_net", "sum"), tickets=("tickets", "sum"))
+        .reset_index()
+    )
+
+    all_dates = pd.date_range(hourly["sale_date"].min(), hourly["sale_date"].max(), freq="D")
+    grid = pd.MultiIndex.from_product([all_dates.date, range(24)], names=["sale_date", "hour_of_day"])
+    grid_df = pd.DataFrame(index=grid).reset_index()
+    grid_df["day_of_week"] = pd.to_datetime(grid_df["sale_date"]).dt.dayofweek
+    result = grid_df.merge(hourly, on=["sale_date", "hour_of_day"], how="left")
+    result["sales_net"] = result["sales_net"].fillna(0)
+    result["tickets"] = result["tickets"].fillna(0).astype(int)
+    return result.sort_values(["sale_date", "hour_of_day"]).reset_index(drop=True)
+
+
 def make_open_hours_mask_func(open_h=12, close_h=23):
-    """Create an is_service_hour function matching app.py logic."""
+    """Per-hour is_service_hour rule for the [open, close) window, wrapping midnight."""
     def is_service_hour(hour: int) -> bool:
         if open_h <= close_h:
             return open_h <= hour < close_h
@@ -115,6 +166,87 @@ def test_gating_boundary():
     print(f"  PASS: Boundary (14d=MID, 56d=HIGH)")
 
 
+# ─── Test: Columnar ingest ────────────────────────────────────────────────────
+
+def test_columnar_ingest_grid():
+    """Single-pass ingest matches aggregate + fill and keeps wall-clock hours."""
+    data = generate_fake_15m_data(n_days=5)
+    data.append({"ts_bucket": "2026-01-02T03:15:00+02:00", "sales_net": None, "tickets": "2"})
+
+    hourly, grid = build_hourly_grid(data)
+    assert len(grid) == 5 * 24, f"Expected 120 grid rows, got {len(grid)}"
+    pd.testing.assert_frame_equal(grid, fill_hourly_grid(aggregate_to_hourly(data)))
+
+    # Against the original pandas path: a Europe/Madrid DST switch (02:00 +01:00
+    # jumps to 03:00 +02:00, so hour 2 has no bucket), a fully missing day and a
+    # day with only a few buckets
+    dst = [
+        {"ts_bucket": f"2026-03-{day}T{hour:02d}:{minute:02d}:00{offset}",
+         "sales_net": 10.0 + hour + minute / 15, "tickets": 1 + hour % 3}
+        for day, hours, offset in (
+            ("28", range(0, 24), "+01:00"),
+            ("29", range(0, 2), "+01:00"), ("29", range(3, 24), "+02:00"),
+            ("31", (12, 13), "+02:00"),
+        )
+        for hour in hours for minute in (0, 15, 30, 45)
+        if not (day == "31" and minute == 45)
+    ]
+    for sample in (data, dst):
+        expected = reference_hourly_grid(sample)
+        _, got = build_hourly_grid(sample)
+        assert list(got["sale_date"]) == [date_to_ordinal(d) for d in expected["sale_date"]]
+        np.testing.assert_array_equal(got["hour_of_day"], expected["hour_of_day"])
+        np.testing.assert_array_equal(got["day_of_week"], expected["day_of_week"])
+        np.testing.assert_allclose(got["sales_net"], expected["sales_net"], rtol=1e-6)
+        np.testing.assert_array_equal(got["tickets"], expected["tickets"])
+    _, dst_grid = build_hourly_grid(dst)
+    assert len(dst_grid) == 4 * 24
+    assert dst_grid["sales_net"].to_numpy().reshape(4, 24)[1, 2] == 0  # skipped DST hour
+    assert dst_grid["sales_net"].to_numpy().reshape(4, 24)[2].sum() == 0  # missing day
+    late = grid[(grid["sale_date"] == date_to_ordinal(date(2026, 1, 2))) & (grid["hour_of_day"] == 3)]
+    assert late["tickets"].iloc[0] == 2 and late["sales_net"].iloc[0] == 0
+    assert grid["day_of_week"].iloc[0] == date(2026, 1, 1).weekday()
+    assert np.isclose(hourly["sales_net"].sum(), grid["sales_net"].sum())
+    print(f"  PASS: Columnar ingest ({len(hourly)} hourly rows, {len(grid)} grid rows)")
+
+
+def test_accumulator_pages():
+    """Page-wise accumulation equals a single pass, regardless of page order."""
+    data = generate_fake_15m_data(n_days=20)
+    pages = [data[i:i + 1000] for i in range(0, len(data), 1000)]
+
+    acc = HourlyAccumulator()
+    for page in reversed(pages):
+        acc.add(page)
+    hourly, grid = acc.build()
+    expected_hourly, expected_grid = build_hourly_grid(data)
+
+    assert acc.n_rows == len(data)
+    assert acc.first_ts == data[0]["ts_bucket"] and acc.last_ts == data[-1]["ts_bucket"]
+    pd.testing.assert_frame_equal(grid, expected_grid)
+    pd.testing.assert_frame_equal(hourly, expected_hourly)
+    print(f"  PASS: Accumulator over {len(pages)} pages -> {len(grid)} grid rows")
+
+
+def test_compact_feature_dtypes():
+    """Grid and features use compact dtypes; rolling stats match a per-hour loop."""
+    _, grid = build_hourly_grid(generate_fake_15m_data(n_days=21))
+    df = build_features(grid)
+
+    assert df["sale_date"].dtype == np.int32
+    assert df["hour_of_day"].dtype == np.int8 and df["day_of_week"].dtype == np.int8
+    assert df["sales_net"].dtype == np.float32
+    for col in ("lag_1", "lag_168", "rolling_mean_7d", "rolling_std_7d"):
+        assert df[col].dtype == np.float32, f"{col} should be float32, got {df[col].dtype}"
+
+    hour_12 = df[df["hour_of_day"] == 12]
+    expected = hour_12["sales_net"].astype(float).rolling(7, min_periods=1).mean()
+    np.testing.assert_allclose(hour_12["rolling_mean_7d"], expected, rtol=1e-5)
+    assert df["week_of_year"].iloc[0] == date(2026, 1, 1).isocalendar()[1]
+    assert df["is_holiday"].iloc[0] == 1, "2026-01-01 is a holiday"
+    print(f"  PASS: Compact dtypes ({df.memory_usage(deep=True).sum() / 1024:.0f} KB)")
+
+
 # ─── Test: Registry gating override ──────────────────────────────────────────
 
 def test_registry_override_low():
@@ -153,6 +285,26 @@ def test_registry_override_undersampled():
     print(f"  PASS: Under-sampled buckets forced to naive")
 
 
+def test_champion_matrix():
+    """Registry materializes as a 7x24 bool matrix indexed [dow, hour]."""
+    registry = {
+        (dow, hour): {"champion_model": "seasonal_naive"}
+        for dow in range(7) for hour in range(24)
+    }
+    registry[(0, 12)]["champion_model"] = "lgbm"
+    registry[(6, 23)]["champion_model"] = "lgbm"
+
+    matrix = champion_matrix(registry)
+
+    assert matrix.shape == (7, 24) and matrix.dtype == bool
+    assert matrix.sum() == 2, f"Expected 2 lgbm buckets, got {matrix.sum()}"
+    assert matrix[0, 12] and matrix[6, 23]
+    dows = np.array([0, 0, 6, 3])
+    hours = np.array([12, 13, 23, 12])
+    assert matrix[dows, hours].tolist() == [True, False, True, False]
+    print(f"  PASS: Champion matrix (2 lgbm buckets)")
+
+
 # ─── Test: Open-hours mask ───────────────────────────────────────────────────
 
 def test_open_hours_mask():
@@ -195,6 +347,45 @@ def test_all_hours_present():
     print(f"  PASS: All 24 hours present after mask")
 
 
+def test_service_hour_mask_matches_app():
+    """Vectorized mask equals the per-hour service-window rule, incl. midnight wrap."""
+    for open_h, close_h in ((12, 23), (20, 2), (0, 24)):
+        is_service_hour = make_open_hours_mask_func(open_h, close_h)
+        mask = service_hour_mask(open_h, close_h)
+        assert mask.tolist() == [is_service_hour(h) for h in range(24)], (open_h, close_h)
+    print("  PASS: service_hour_mask matches the per-hour rule")
+
+
+def test_infer_service_hours():
+    """Hours with sustained zero sales are learned as closed."""
+    _, grid = build_hourly_grid(generate_fake_15m_data(n_days=30))
+    mask = infer_service_hours(grid)
+    assert np.flatnonzero(mask).tolist() == list(range(10, 23)), np.flatnonzero(mask)
+    print("  PASS: Learned service hours 10-22")
+
+
+def test_pipeline_skips_closed_hours():
+    """Closed hours are excluded from the registry but emitted as zero rows."""
+    data = generate_fake_15m_data(n_days=60)
+    service = list(range(12, 23))
+    forecaster = HourlyForecaster(location_id="test-loc", location_name="Test", service_hours=service)
+    result = forecaster.run(data, horizon_days=3, enable_gating=True)
+
+    assert result["success"], result.get("error")
+    assert result["service_hours"] == service
+    assert len(result["hourly_forecasts"]) == 72, "Closed hours must still produce rows"
+    assert result["registry_summary"]["total_buckets"] == 7 * len(service)
+    for hf in result["hourly_forecasts"]:
+        if hf["hour_of_day"] in service:
+            assert hf["model_type"] != CLOSED_MODEL
+        else:
+            assert hf["model_type"] == CLOSED_MODEL and hf["forecast_sales"] == 0
+
+    auto = HourlyForecaster(location_id="test-loc", service_hours="auto").run(data, horizon_days=1)
+    assert auto["service_hours"] == list(range(10, 23))
+    print(f"  PASS: Closed hours skipped ({result['registry_summary']['total_buckets']} buckets)")
+
+
 # ─── Test: Full pipeline with gating ─────────────────────────────────────────
 
 def test_pipeline_baseline_only():
@@ -229,6 +420,9 @@ def test_pipeline_high():
     assert len(result["hourly_forecasts"]) == 72, \
         f"Expected 72 hourly forecasts, got {len(result['hourly_forecasts'])}"
 
+    assert "peak_rss_mb" in result
+    # Daily-total error (used for ensemble weights) is below the per-hour error
+    assert 0 <= result["metrics"]["daily_wmape"] <= result["metrics"]["wmape"]
     print(f"  PASS: Pipeline HIGH (60 days) -> lgbm_used={result['lgbm_used']}")
 
 
@@ -249,6 +443,291 @@ def test_pipeline_backwards_compat():
     print(f"  PASS: Backwards compat — {len(result['daily_forecasts'])} daily forecasts")
 
 
+# ─── Test: Tenant-level shared model ─────────────────────────────────────────
+
+def test_tenant_shared_model():
+    """One LightGBM fit serves several locations with different sales scales."""
+    small = generate_fake_15m_data(n_days=60)
+    big = [{**r, "sales_net": r["sales_net"] * 8, "tickets": r["tickets"] * 8} for r in small]
+
+    tenant = TenantHourlyForecaster([
+        {"location_id": "small", "location_name": "Small"},
+        {"location_id": "big", "location_name": "Big", "service_hours": list(range(12, 23))},
+    ])
+    batch = tenant.run({"small": small, "big": big}, horizon_days=3, enable_gating=True)
+
+    assert batch["success"]
+    assert batch["tenant_model_used"] is True
+    assert batch["locations_trained"] == 2
+    for loc_id in ("small", "big"):
+        result = batch["results"][loc_id]
+        assert result["success"], f"{loc_id} failed: {result.get('error')}"
+        assert result["model_scope"] == "tenant"
+        assert len(result["hourly_forecasts"]) == 72
+
+    # Scale normalization: the big location forecasts roughly 8x the small one
+    small_total = sum(d["forecast_sales"] for d in batch["results"]["small"]["daily_forecasts"])
+    big_total = sum(d["forecast_sales"] for d in batch["results"]["big"]["daily_forecasts"])
+    assert 5 < big_total / small_total < 11, f"Unexpected scale ratio {big_total / small_total:.2f}"
+    print(f"  PASS: Tenant model, scale ratio {big_total / small_total:.2f}")
+
+
+# ─── Test: Persisted models ──────────────────────────────────────────────────
+
+def test_model_store_incremental_refresh():
+    """Full fit first, then trees added on appended days, then plain reuse."""
+    rows_per_day = 13 * 4
+    data = generate_fake_15m_data(n_days=62)
+
+    with tempfile.TemporaryDirectory() as root:
+        store = HourlyModelStore(root)
+        forecaster = HourlyForecaster(location_id="test-loc", location_name="Test", model_store=store)
+
+        first = forecaster.run(data[:60 * rows_per_day], horizon_days=3, enable_gating=True)
+        assert first["fit_mode"] == "full", first["fit_reason"]
+        n_trees = store.load("test-loc", FEATURE_SCHEMA_VERSION)[1]["num_trees"]
+        bins = store.load_bins("test-loc", FEATURE_SCHEMA_VERSION)
+        assert bins is not None and bins.num_data() > 0, "Binned grid should be cached"
+
+        # The refresh bins only the new rows against the cached bins
+        state = forecaster._prepare(data, 3, True)
+        grid = GridDataset(state["df"], state["open_hours"], reference=bins)
+        _, info = fit_or_refresh_lgbm(
+            state["df_train"], store.load("test-loc", FEATURE_SCHEMA_VERSION), grid=grid,
+        )
+        assert info["mode"] == "incremental", info["reason"]
+        assert grid._dataset is None, "Refresh should not build the full grid"
+
+        second = forecaster.run(data, horizon_days=3, enable_gating=True)
+        assert second["fit_mode"] == "incremental", second["fit_reason"]
+        meta = store.load("test-loc", FEATURE_SCHEMA_VERSION)[1]
+        assert meta["num_trees"] == n_trees + INCREMENTAL_TREES
+        assert meta["incremental_trees"] == INCREMENTAL_TREES
+        assert len(second["hourly_forecasts"]) == 72
+
+        third = forecaster.run(data, horizon_days=3, enable_gating=True)
+        assert third["fit_mode"] == "reuse"
+
+        forced = forecaster.run(data, horizon_days=3, enable_gating=True, full_refit=True)
+        assert forced["fit_mode"] == "full" and forced["fit_reason"] == "requested"
+    print(f"  PASS: full -> incremental (+{INCREMENTAL_TREES} trees) -> reuse -> forced full")
+
+
+def test_model_store_drift_rebuild():
+    """A level shift on the new days triggers a full rebuild instead of a refresh."""
+    rows_per_day = 13 * 4
+    data = generate_fake_15m_data(n_days=64)
+    # Days 40+ jump 4x; the second run trains through day 49
+    shifted = data[:40 * rows_per_day] + [
+        {**r, "sales_net": r["sales_net"] * 4} for r in data[40 * rows_per_day:]
+    ]
+
+    with tempfile.TemporaryDirectory() as root:
+        forecaster = HourlyForecaster(
+            location_id="test-loc", location_name="Test", model_store=HourlyModelStore(root),
+        )
+        forecaster.run(data[:50 * rows_per_day], horizon_days=3, enable_gating=True)
+        result = forecaster.run(shifted, horizon_days=3, enable_gating=True)
+        assert result["fit_mode"] == "full"
+        assert result["fit_reason"] == "drift", result["fit_reason"]
+    print("  PASS: Drift triggers full rebuild")
+
+
+def test_early_stopping_tree_budget():
+    """Early stopping picks a tree budget and records it on every registry row."""
+    data = generate_fake_15m_data(n_days=60)
+    forecaster = HourlyForecaster(location_id="test-loc", location_name="Test", early_stopping=True)
+    result = forecaster.run(data, horizon_days=3, enable_gating=True)
+
+    best = result["lgbm_best_iteration"]
+    assert result["fit_mode"] == "full"
+    assert 1 <= best <= LGBM_PARAMS["n_estimators"], f"Unexpected budget {best}"
+    assert all(r["lgbm_best_iteration"] == best for r in result["model_registry"])
+
+    # Too little history for a validation slice => default budget
+    short = build_features(build_hourly_grid(generate_fake_15m_data(n_days=15))[1])
+    assert select_tree_budget(short) == LGBM_PARAMS["n_estimators"]
+
+    default = HourlyForecaster(location_id="test-loc").run(data, horizon_days=3, enable_gating=True)
+    assert default["lgbm_best_iteration"] is None
+    print(f"  PASS: Early-stopped tree budget = {best}")
+
+
+def test_grid_dataset_subsets():
+    """Train/validation sets are cut from one binned grid, matching df_train rows."""
+    _, df = build_hourly_grid(generate_fake_15m_data(n_days=40))
+    df = build_features(df)
+    open_hours = service_hour_mask(12, 23)
+    grid = GridDataset(df, open_hours)
+
+    last_train = int(df["sale_date"].iloc[-1]) - 10
+    df_train = df[(df["sale_date"] <= last_train) & open_hours[df["hour_of_day"]]]
+    expected = df_train.dropna(subset=["lag_1", "lag_24"])
+
+    X, y = grid.matrix(last_date=last_train)
+    train_set = grid.subset(last_date=last_train).construct()
+    assert train_set.num_data() == len(expected) == len(X)
+    np.testing.assert_array_equal(y, expected["sales_net"].to_numpy(dtype=np.float32))
+    assert grid.fresh_bins, "Grid without a reference bins from scratch"
+    print(f"  PASS: Grid subset = {train_set.num_data()} train rows")
+
+
+def test_nowcast_remaining_hours():
+    """Nowcast re-predicts only today's remaining hours from cached state + today's actuals."""
+    data = generate_fake_15m_data(n_days=60, start_date=date(2026, 1, 1))
+    today = date(2026, 1, 1) + timedelta(days=60)
+    now = datetime(today.year, today.month, today.day, 15, 5)
+
+    with tempfile.TemporaryDirectory() as root:
+        store = HourlyModelStore(root)
+        HourlyForecaster(location_id="test-loc", model_store=store).run(data, horizon_days=3, enable_gating=True)
+        state = store.load_state("test-loc", FEATURE_SCHEMA_VERSION)
+        booster = store.load("test-loc", FEATURE_SCHEMA_VERSION)[0]
+        assert state["use_lgbm"] and len(state["sales"]) == 15 * 24
+
+        today_rows = generate_fake_15m_data(n_days=1, start_date=today)
+        today_rows = [r for r in today_rows if int(r["ts_bucket"][11:13]) < 15]
+
+        t0 = time.perf_counter()
+        rows = nowcast_today(state, booster, today_rows, now)
+        elapsed = time.perf_counter() - t0
+
+        assert [r["hour_of_day"] for r in rows] == list(range(15, 24))
+        assert all(r["forecast_date"] == today.isoformat() for r in rows)
+        assert elapsed < 1.0, f"Nowcast took {elapsed:.3f}s"
+
+        # Today's actuals feed the lag buffer: with LightGBM on every bucket,
+        # a surge at 14:00 reaches the 15:00 prediction through lag_1
+        all_lgbm = {**state, "registry": [{**r, "champion_model": "lgbm"} for r in state["registry"]]}
+        surged = [{**r, "sales_net": r["sales_net"] * 10} if r["ts_bucket"][11:13] == "14" else r
+                  for r in today_rows]
+        base = nowcast_today(all_lgbm, booster, today_rows, now)
+        moved = nowcast_today(all_lgbm, booster, surged, now)
+        assert base[0]["forecast_sales"] != moved[0]["forecast_sales"], \
+            "15:00 should react to the 14:00 actual"
+    print(f"  PASS: Nowcast {len(rows)} hours in {elapsed * 1000:.1f} ms")
+
+
+def test_registry_cached_between_reevaluations():
+    """Second run reuses the stored registry and skips the holdout; full_refit re-evaluates."""
+    data = generate_fake_15m_data(n_days=60)
+
+    with tempfile.TemporaryDirectory() as root:
+        forecaster = HourlyForecaster(location_id="test-loc", model_store=HourlyModelStore(root))
+        first = forecaster.run(data, horizon_days=3, enable_gating=True)
+        assert first["registry_mode"] == "evaluated"
+
+        forecaster._evaluate_holdout = None  # would raise if the holdout ran
+        second = forecaster.run(data, horizon_days=3, enable_gating=True)
+        assert second["registry_mode"] == "cached", second["registry_reason"]
+        assert second["metrics"] == first["metrics"]
+        assert second["registry_summary"] == first["registry_summary"]
+        assert second["hourly_forecasts"] == first["hourly_forecasts"]
+        del forecaster._evaluate_holdout
+
+        forced = forecaster.run(data, horizon_days=3, enable_gating=True, full_refit=True)
+        assert forced["registry_mode"] == "evaluated" and forced["registry_reason"] == "requested"
+
+        stale = HourlyForecaster(location_id="test-loc", model_store=HourlyModelStore(root), reeval_days=0)
+        assert stale.run(data, horizon_days=3, enable_gating=True)["registry_reason"] == "scheduled"
+    print("  PASS: Registry cached, forced and scheduled re-evaluation")
+
+
+def test_registry_realized_drift():
+    """Realized error of the stored forecast flags drifted buckets."""
+    _, df = build_hourly_grid(generate_fake_15m_data(n_days=60))
+    registry = {(dow, hour): {"champion_model": "seasonal_naive", "champion_wmape": 0.1}
+                for dow in range(7) for hour in range(10, 23)}
+    f_day0 = int(df["sale_date"].iloc[0]) + 50
+    actual = df["sales_net"].to_numpy(dtype=float)[50 * 24:57 * 24]
+    today = date(2026, 1, 1) + timedelta(days=60)
+
+    good = {"registry": registry_to_records(registry), "forecast_day0": f_day0,
+            "forecast_sales": (actual * 1.02).tolist()}
+    bad = {**good, "forecast_sales": (actual * 2.0).tolist()}
+
+    assert registry_drift_buckets(good, df, today) == []
+    drifted = registry_drift_buckets(bad, df, today)
+    assert len(drifted) == 7 * 13, f"Expected every open bucket to drift, got {len(drifted)}"
+    print(f"  PASS: Realized drift in {len(drifted)} buckets")
+
+
+def test_tickets_model_orders():
+    """Orders come from a tickets model trained on the same grid, not sales / 25."""
+    data = generate_fake_15m_data(n_days=60)
+    hourly, _ = build_hourly_grid(data)
+    daily_tickets = hourly.groupby("sale_date")["tickets"].sum().mean()
+
+    with tempfile.TemporaryDirectory() as root:
+        store = HourlyModelStore(root)
+        forecaster = HourlyForecaster(location_id="test-loc", model_store=store)
+        result = forecaster.run(data, horizon_days=3, enable_gating=True)
+
+        assert result["tickets_model_used"] is True
+        assert "tickets_wmape" in result["metrics"]
+        assert store.load("test-loc", FEATURE_SCHEMA_VERSION, kind="tickets") is not None
+        for day in result["daily_forecasts"]:
+            ratio = day["forecast_orders"] / daily_tickets
+            assert 0.7 < ratio < 1.3, f"Daily orders {day['forecast_orders']} vs history {daily_tickets:.1f}"
+
+        reused = forecaster.run(data, horizon_days=3, enable_gating=True)
+        assert reused["fit_mode"] == "reuse" and reused["tickets_model_used"] is True
+
+        # A tickets booster retrained next to a reused sales booster is saved
+        for path in store._paths("test-loc", FEATURE_SCHEMA_VERSION, kind="tickets"):
+            os.remove(path)
+        retrained = forecaster.run(data, horizon_days=3, enable_gating=True)
+        assert retrained["fit_mode"] == "reuse" and retrained["tickets_model_used"] is True
+        assert store.load("test-loc", FEATURE_SCHEMA_VERSION, kind="tickets") is not None
+
+    # Naive-only tier falls back to the historical average ticket
+    short = HourlyForecaster(location_id="test-loc").run(data[:10 * 52], horizon_days=1, enable_gating=True)
+    assert short["tickets_model_used"] is False
+    avg = average_ticket(build_hourly_grid(data[:10 * 52])[0])
+    row = next(r for r in short["hourly_forecasts"] if r["forecast_sales"] > 0)
+    assert row["forecast_orders"] == round(row["forecast_sales"] / avg, 1)
+    print(f"  PASS: Tickets model (history {daily_tickets:.1f} tickets/day, avg ticket {avg:.2f})")
+
+
+def test_stage_timings():
+    """Every run reports per-stage wall time; /metrics aggregates them."""
+    data = generate_fake_15m_data(n_days=60)
+    result = HourlyForecaster(location_id="test-loc").run(data, horizon_days=3, enable_gating=True)
+    timings = result["timings"]
+    for name in ("ingest", "aggregate_grid", "features", "gating", "split",
+                 "train", "holdout_predict", "evaluate", "predict", "daily_aggregate"):
+        assert name in timings["stages"], f"missing stage {name}"
+        assert timings["stages"][name]["ms"] >= 0
+    assert sum(s["ms"] for s in timings["stages"].values()) <= timings["total_ms"] + 1
+
+    traced = HourlyForecaster(location_id="test-loc", trace_memory=True).run(data, horizon_days=3)
+    assert traced["timings"]["stages"]["features"]["alloc_peak_mb"] > 0
+
+    metrics = StageMetrics()
+    metrics.record(timings)
+    metrics.record(traced["timings"])
+    text = metrics.render()
+    assert 'forecast_runs_total{kind="hourly"' in text and "} 2\n" in text
+    assert 'forecast_stage_seconds_count{stage="train"' in text
+
+    # peak_rss_mb is this run's peak, not the worker's lifetime high-water
+    # mark, and it sees memory allocated and freed inside a stage
+    big = StageTimer()
+    with big.stage("allocate"):
+        block = np.ones(256 * 1024 * 1024 // 8)
+        time.sleep(0.2)
+        del block
+    small = StageTimer()
+    with small.stage("noop"):
+        pass
+    big_summary, small_summary = big.summary(), small.summary()
+    if big_summary["peak_rss_mb"] is not None:
+        assert small_summary["peak_rss_mb"] < big_summary["peak_rss_mb"] - 100
+        assert "process_peak_rss_mb" in small_summary
+    slowest = max(timings["stages"], key=lambda k: timings["stages"][k]["ms"])
+    print(f"  PASS: Stage timings ({timings['total_ms']:.0f} ms, slowest stage {slowest})")
+
+
 # ─── Runner ──────────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
@@ -258,13 +737,30 @@ if __name__ == "__main__":
         ("Gating: MID (30 days)", test_gating_mid),
         ("Gating: HIGH (60 days)", test_gating_high),
         ("Gating: Boundaries", test_gating_boundary),
+        ("Ingest: Columnar grid", test_columnar_ingest_grid),
+        ("Ingest: Page-wise accumulator", test_accumulator_pages),
+        ("Features: Compact dtypes", test_compact_feature_dtypes),
         ("Registry: LOW override", test_registry_override_low),
         ("Registry: Under-sampled override", test_registry_override_undersampled),
+        ("Registry: Champion matrix", test_champion_matrix),
         ("Mask: Service hours", test_open_hours_mask),
         ("Mask: All 24 hours present", test_all_hours_present),
+        ("Mask: Vectorized service hours", test_service_hour_mask_matches_app),
+        ("Mask: Learned service hours", test_infer_service_hours),
+        ("Pipeline: Closed hours skipped", test_pipeline_skips_closed_hours),
         ("Pipeline: BASELINE_ONLY (10d)", test_pipeline_baseline_only),
         ("Pipeline: HIGH (60d)", test_pipeline_high),
         ("Pipeline: Backwards compat", test_pipeline_backwards_compat),
+        ("Tenant: Shared model", test_tenant_shared_model),
+        ("Models: Incremental refresh", test_model_store_incremental_refresh),
+        ("Models: Drift rebuild", test_model_store_drift_rebuild),
+        ("Models: Early-stopping tree budget", test_early_stopping_tree_budget),
+        ("Models: Binned grid subsets", test_grid_dataset_subsets),
+        ("Nowcast: Remaining hours", test_nowcast_remaining_hours),
+        ("Registry: Cached between re-evaluations", test_registry_cached_between_reevaluations),
+        ("Registry: Realized drift", test_registry_realized_drift),
+        ("Tickets: Joint model", test_tickets_model_orders),
+        ("Pipeline: Stage timings", test_stage_timings),
     ]
 
     passed = 0
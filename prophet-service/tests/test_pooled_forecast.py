@@ -0,0 +1,127 @@
+"""
+Tests for the pooled multi-location fit (per-location level/trend on a
+shared prediction) and the panel's pooled index.
+
+Run with: python -m pytest tests/test_pooled_forecast.py -v
+Or standalone: python tests/test_pooled_forecast.py
+"""
+
+import sys
+import os
+from datetime import date, timedelta
+
+import numpy as np
+
+# Ensure prophet-service root is on path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calendar_index import to_ordinals
+from pooled_forecast import fit_location, location_forecast
+from sales_panel import DailyPanelAccumulator
+
+
+WEEKLY = np.array([0.8, 0.85, 0.9, 1.0, 1.25, 1.35, 0.85])  # Mon..Sun
+
+
+# ─── Helpers ──────────────────────────────────────────────────────────────────
+
+def shared_shape(ordinals: np.ndarray) -> np.ndarray:
+    """Weekly pattern the locations share (1970-01-01 was a Thursday)."""
+    return WEEKLY[(ordinals + 3) % 7]
+
+
+def location_history(n_days: int, mean: float, growth_per_year: float, noise: float, seed: int):
+    rng = np.random.default_rng(seed)
+    end = int(to_ordinals(["2026-03-31"])[0])
+    ords = np.arange(end - n_days + 1, end + 1)
+    u = (ords - end) / 365.0
+    sales = mean * (1 + growth_per_year * u) * shared_shape(ords) * rng.normal(1, noise, n_days)
+    return ords, np.maximum(sales, 1.0)
+
+
+# ─── Tests ────────────────────────────────────────────────────────────────────
+
+def test_recovers_level_and_trend():
+    """A long, clean history gives back its own level and growth."""
+    ords, sales = location_history(365, mean=4000.0, growth_per_year=0.3, noise=0.02, seed=1)
+    loc_mean = float(sales.mean())
+    fit = fit_location(ords, sales, loc_mean, shared_shape(ords))
+
+    # Level at the last day (shape factor 1): the location's current 4000
+    last_level = location_forecast(fit, loc_mean, ords[-1:], np.ones(1), np.ones(1), np.ones(1))[0][0]
+    assert abs(last_level - 4000.0) / 4000.0 < 0.03
+    assert abs(fit["slope"] * loc_mean - 0.3 * 4000.0) / (0.3 * 4000.0) < 0.15
+    assert fit["mape"] < 0.03 and fit["r_squared"] > 0.9
+    assert fit["n_days"] == 365
+
+    future = np.arange(ords[-1] + 1, ords[-1] + 15)
+    g = shared_shape(future)
+    yhat, lower, upper = location_forecast(fit, loc_mean, future, g, g * 0.9, g * 1.1)
+    assert (lower <= yhat).all() and (yhat <= upper).all()
+    # Weekly shape carried through: Saturday above Monday
+    sat, mon = future[(future + 3) % 7 == 5][0], future[(future + 3) % 7 == 0][0]
+    assert yhat[future == sat][0] > yhat[future == mon][0]
+    print("  PASS: level and trend recovered")
+
+
+def test_thin_history_shrinks_to_pooled():
+    """A location with a few noisy days keeps its mean and the pooled shape."""
+    ords, sales = location_history(10, mean=1500.0, growth_per_year=4.0, noise=0.15, seed=2)
+    loc_mean = float(sales.mean())
+    fit = fit_location(ords, sales, loc_mean, shared_shape(ords))
+    assert abs(fit["level"] - 1) < 0.3
+    # 10 days of steep noise must not turn into a steep yearly trend
+    assert abs(fit["slope"]) < 1.0
+
+    long_ords, long_sales = location_history(365, mean=1500.0, growth_per_year=0.0, noise=0.15, seed=2)
+    long_fit = fit_location(long_ords, long_sales, float(long_sales.mean()), shared_shape(long_ords))
+    assert long_fit["resid_sd"] > 0.1  # noise shows up in the band, not the trend
+    print("  PASS: thin history shrinks to pooled shape")
+
+
+def test_pooled_index_from_panel():
+    """The pooled index averages mean-scaled locations and honours a subset."""
+    rows = []
+    for loc_id, mean, n_days in (("a", 5000.0, 120), ("b", 900.0, 120), ("c", 2000.0, 30)):
+        ords, sales = location_history(n_days, mean, 0.0, 0.0, seed=3)
+        for o, s in zip(ords, sales):
+            rows.append({"date": str(np.datetime64("1970-01-01") + int(o)), "location_id": loc_id, "net_sales": s})
+    panel = DailyPanelAccumulator().add(rows)
+
+    index = panel.combined_daily(1.0)
+    values = np.array([r["net_sales"] for r in index])
+    ords = to_ordinals([r["date"] for r in index])
+    # Noise-free locations share the weekly shape, so the pooled index is that shape
+    np.testing.assert_allclose(values / values.mean(), shared_shape(ords) / shared_shape(ords).mean(), rtol=0.02)
+
+    subset = panel.combined_daily(1.0, locations=["c", "missing"])
+    assert len(subset) == 30
+    assert subset[0]["date"] == (date(2026, 3, 31) - timedelta(days=29)).isoformat()
+    print("  PASS: pooled index from panel")
+
+
+# ─── Runner ──────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    tests = [
+        ("Pooled: level and trend recovered", test_recovers_level_and_trend),
+        ("Pooled: thin history shrinks", test_thin_history_shrinks_to_pooled),
+        ("Pooled: index from panel", test_pooled_index_from_panel),
+    ]
+
+    passed = 0
+    failed = 0
+    for name, fn in tests:
+        try:
+            print(f"\n[TEST] {name}")
+            fn()
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {e}")
+            failed += 1
+
+    print(f"\n{'='*60}")
+    print(f"Results: {passed} passed, {failed} failed, {passed + failed} total")
+    if failed > 0:
+        sys.exit(1)
+    print("All tests passed!")
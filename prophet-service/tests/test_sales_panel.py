@@ -0,0 +1,194 @@
+"""
+Tests for the cross-location daily sales panel.
+
+Run with: python -m pytest tests/test_sales_panel.py -v
+Or standalone: python tests/test_sales_panel.py
+"""
+
+import sys
+import os
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+# Ensure prophet-service root is on path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sales_panel import DailyPanelAccumulator, PanelStore
+
+
+# ─── Helpers ──────────────────────────────────────────────────────────────────
+
+def generate_fake_daily_rows(n_days: int, locations: dict[str, float]) -> list[dict]:
+    """sales_daily_unified rows for several locations with different scales."""
+    rng = np.random.default_rng(7)
+    rows = []
+    for d in range(n_days):
+        ds = (date(2025, 1, 1) + timedelta(days=d)).isoformat()
+        for loc_id, scale in locations.items():
+            if loc_id == "small" and d < n_days // 2:
+                continue  # opened later
+            rows.append({
+                "date": ds,
+                "location_id": loc_id,
+                "net_sales": round(scale * rng.uniform(0.7, 1.3), 2),
+                "orders_count": 10,
+            })
+    return rows
+
+
+def reference_combined(all_data: list[dict], target_mean: float) -> list[dict]:
+    """The original list-based normalization from forecast_supabase."""
+    loc_totals = defaultdict(list)
+    for r in all_data:
+        loc_totals[str(r.get("location_id", ""))].append(float(r.get("net_sales") or 0))
+    combined = defaultdict(list)
+    for r in all_data:
+        loc_id = str(r.get("location_id", ""))
+        loc_mean = sum(loc_totals[loc_id]) / max(len(loc_totals[loc_id]), 1)
+        scale_factor = target_mean / loc_mean if loc_mean > 0 else 1.0
+        combined[str(r["date"])[:10]].append(float(r.get("net_sales") or 0) * scale_factor)
+    return [
+        {"date": ds, "net_sales": sum(v) / len(v), "orders_count": 0}
+        for ds, v in sorted(combined.items())
+    ]
+
+
+# ─── Tests ────────────────────────────────────────────────────────────────────
+
+def test_panel_matches_reference():
+    """Page-wise panel gives the same normalized averages as the list version."""
+    rows = generate_fake_daily_rows(60, {"big": 5000.0, "mid": 2000.0, "small": 800.0})
+    panel = DailyPanelAccumulator()
+    for i in range(0, len(rows), 25):
+        panel.add(rows[i:i + 25])
+
+    expected = reference_combined(rows, target_mean=2000.0)
+    combined = panel.combined_daily(target_mean=2000.0)
+
+    assert panel.n_locations == 3
+    assert panel.n_rows == len(rows)
+    assert [r["date"] for r in combined] == [r["date"] for r in expected]
+    np.testing.assert_allclose(
+        [r["net_sales"] for r in combined], [r["net_sales"] for r in expected], rtol=1e-12,
+    )
+    print(f"  PASS: Panel matches reference ({len(combined)} days, 3 locations)")
+
+
+def test_panel_empty():
+    """An empty panel produces no rows."""
+    panel = DailyPanelAccumulator().add([])
+    assert panel.combined_daily(target_mean=100.0) == []
+    assert panel.n_locations == 0
+    print("  PASS: Empty panel")
+
+
+def test_incremental_refresh():
+    """Dropping the last days and merging a refetch equals a full rebuild."""
+    rows = generate_fake_daily_rows(60, {"big": 5000.0, "mid": 2000.0, "small": 800.0})
+    since = "2025-02-25"
+    # The refetch carries corrected values and a location seen for the first time
+    corrected = [dict(r, net_sales=r["net_sales"] * 1.1) for r in rows if r["date"] >= since]
+    corrected += [{"date": "2025-03-01", "location_id": "new", "net_sales": 300.0, "orders_count": 4}]
+    final = [r for r in rows if r["date"] < since] + corrected
+
+    panel = DailyPanelAccumulator().add(rows)
+    panel.drop_since(since).merge(DailyPanelAccumulator().add(corrected))
+    full = DailyPanelAccumulator().add(final)
+
+    assert panel.n_rows == full.n_rows == len(final)
+    assert panel.n_locations == 4 and panel.last_date == "2025-03-01"
+    for loc_id in ("big", "mid", "small", "new"):
+        assert abs(panel.location_mean(loc_id) - full.location_mean(loc_id)) < 1e-9
+        assert panel.location_daily(loc_id) == full.location_daily(loc_id)
+    np.testing.assert_allclose(
+        [r["net_sales"] for r in panel.combined_daily(2000.0)],
+        [r["net_sales"] for r in reference_combined(final, target_mean=2000.0)], rtol=1e-12,
+    )
+
+    # Pages arriving out of date order (older dates after newer ones)
+    shuffled = DailyPanelAccumulator().add(final[len(final) // 2:]).add(final[:len(final) // 2])
+    np.testing.assert_allclose(
+        [r["net_sales"] for r in shuffled.combined_daily(2000.0)],
+        [r["net_sales"] for r in full.combined_daily(2000.0)], rtol=1e-12,
+    )
+    print("  PASS: Incremental refresh matches full rebuild")
+
+
+def test_panel_store_refresh():
+    """The store loads a tenant once, then refetches only the recent days."""
+    rows = generate_fake_daily_rows(30, {"big": 5000.0, "small": 800.0})
+    calls = []
+
+    async def fetch(since, on_page):
+        calls.append(since)
+        selected = [r for r in rows if since is None or r["date"] >= since]
+        for i in range(0, len(selected), 7):
+            on_page(selected[i:i + 7])
+
+    store = PanelStore(overlap_days=3, max_age_hours=24)
+    now = datetime(2025, 2, 1, 6, 0)
+    tenant_a = ("https://db.example", "org-a")
+    panel = asyncio.run(store.get(tenant_a, fetch, now))
+    assert calls == [None] and panel.n_rows == len(rows)
+
+    rows.append({"date": "2025-01-31", "location_id": "big", "net_sales": 4800.0, "orders_count": 9})
+    panel = asyncio.run(store.get(tenant_a, fetch, now + timedelta(hours=1)))
+    assert calls == [None, "2025-01-27"]
+    assert panel.n_rows == len(rows) and panel.last_date == "2025-01-31"
+
+    # A failed refresh leaves the cached panel intact
+    async def failing(since, on_page):
+        on_page(rows[-3:])
+        raise RuntimeError("REST down")
+
+    try:
+        asyncio.run(store.get(tenant_a, failing, now + timedelta(hours=2)))
+    except RuntimeError:
+        pass
+    assert asyncio.run(store.get(tenant_a, fetch, now + timedelta(hours=3))).n_rows == len(rows)
+
+    # Past the max age the history is reloaded in full
+    asyncio.run(store.get(tenant_a, fetch, now + timedelta(hours=30)))
+    assert calls[-1] is None
+
+    # Another org on the same database gets its own panel and fetch
+    other_rows = generate_fake_daily_rows(10, {"elsewhere": 1200.0})
+
+    async def fetch_other(since, on_page):
+        on_page(other_rows)
+
+    other = asyncio.run(store.get(("https://db.example", "org-b"), fetch_other, now))
+    assert other.locations == ["elsewhere"]
+    assert set(asyncio.run(store.get(tenant_a, fetch, now + timedelta(hours=31))).locations) == {"big", "small"}
+    print("  PASS: Panel store refresh")
+
+
+# ─── Runner ──────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    tests = [
+        ("Panel: matches reference", test_panel_matches_reference),
+        ("Panel: empty", test_panel_empty),
+        ("Panel: incremental refresh", test_incremental_refresh),
+        ("Panel: store refresh", test_panel_store_refresh),
+    ]
+
+    passed = 0
+    failed = 0
+    for name, fn in tests:
+        try:
+            print(f"\n[TEST] {name}")
+            fn()
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {e}")
+            failed += 1
+
+    print(f"\n{'='*60}")
+    print(f"Results: {passed} passed, {failed} failed, {passed + failed} total")
+    if failed > 0:
+        sys.exit(1)
+    print("All tests passed!")
@@ -0,0 +1,116 @@
+"""
+Tests for the pooled Supabase REST helpers (pagination, upserts).
+
+Run with: python -m pytest tests/test_supabase_rest.py -v
+Or standalone: python tests/test_supabase_rest.py
+"""
+
+import sys
+import os
+import asyncio
+import json
+
+import httpx
+
+# Ensure prophet-service root is on path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supabase_rest import fetch_pages, upsert
+
+
+# ─── Helpers ──────────────────────────────────────────────────────────────────
+
+def fake_postgrest(n_rows: int, max_rows: int = 1000, log: list | None = None) -> httpx.MockTransport:
+    """A table of ``n_rows`` served with PostgREST's Range / max-rows semantics."""
+    table = [{"id": i} for i in range(n_rows)]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            if log is not None:
+                log.append(json.loads(request.content))
+            return httpx.Response(201)
+        start, end = (int(v) for v in request.headers["Range"].split("-"))
+        if log is not None:
+            log.append(start)
+        rows = table[start:min(end + 1, start + max_rows)]
+        return httpx.Response(206 if rows else 200, json=rows)
+
+    return httpx.MockTransport(handler)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+# ─── Tests ────────────────────────────────────────────────────────────────────
+
+def test_fetch_pages_past_row_limit():
+    """Every row comes back, in order, beyond the 1000-row PostgREST cap."""
+    for n_rows in (0, 999, 1000, 3500, 12001):
+        requested = []
+
+        async def go():
+            async with httpx.AsyncClient(transport=fake_postgrest(n_rows, log=requested)) as client:
+                return await fetch_pages(client, "http://sb/rest/v1/t?order=id.asc", {}, concurrency=4)
+
+        rows = run(go())
+        assert [r["id"] for r in rows] == list(range(n_rows)), n_rows
+        # One lone first page, then waves of 4; at most a wave of overshoot
+        assert len(requested) <= n_rows // 1000 + 1 + 4
+    print("  PASS: fetch_pages returns every row in order")
+
+
+def test_fetch_pages_streams_to_callback():
+    """With on_page, pages are handed over in order and only the count returned."""
+    seen = []
+
+    async def go():
+        async with httpx.AsyncClient(transport=fake_postgrest(2500)) as client:
+            return await fetch_pages(client, "http://sb/rest/v1/t", {}, on_page=seen.append)
+
+    n = run(go())
+    assert n == 2500
+    assert [len(p) for p in seen] == [1000, 1000, 500]
+    assert seen[1][0]["id"] == 1000
+    print("  PASS: fetch_pages streams pages to a callback")
+
+
+def test_upsert_batches():
+    """Rows are posted in batches of batch_size with merge-duplicates."""
+    posted = []
+
+    async def go():
+        async with httpx.AsyncClient(transport=fake_postgrest(0, log=posted)) as client:
+            return await upsert(client, "http://sb/rest/v1/t", {}, [{"id": i} for i in range(1203)],
+                                on_conflict="id", batch_size=500)
+
+    assert run(go()) == 1203
+    assert sorted(len(b) for b in posted) == [203, 500, 500]
+    print("  PASS: upsert batches")
+
+
+# ─── Runner ──────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    tests = [
+        ("REST: pages past the row limit", test_fetch_pages_past_row_limit),
+        ("REST: page callback", test_fetch_pages_streams_to_callback),
+        ("REST: upsert batches", test_upsert_batches),
+    ]
+
+    passed = 0
+    failed = 0
+    for name, fn in tests:
+        try:
+            print(f"\n[TEST] {name}")
+            fn()
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {e}")
+            failed += 1
+
+    print(f"\n{'='*60}")
+    print(f"Results: {passed} passed, {failed} failed, {passed + failed} total")
+    if failed > 0:
+        sys.exit(1)
+    print("All tests passed!")
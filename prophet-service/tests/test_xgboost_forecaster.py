@@ -0,0 +1,339 @@
+"""
+Tests for the XGBoost daily forecaster.
+
+Run with: python -m pytest tests/test_xgboost_forecaster.py -v
+Or standalone: python tests/test_xgboost_forecaster.py
+"""
+
+import sys
+import os
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Ensure prophet-service root is on path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xgboost_forecaster import (
+    DailySalesAccumulator,
+    DIRECT_CALENDAR_COLUMNS,
+    DIRECT_FEATURE_COLUMNS,
+    FEATURE_COLUMNS,
+    MADRID_CLIMATE,
+    SPANISH_HOLIDAYS,
+    direct_forecast,
+    engineer_features,
+    explain_forecast,
+    fit_direct_models,
+    recursive_forecast,
+    train_and_forecast,
+)
+
+import xgboost as xgb
+
+
+# ─── Helpers ──────────────────────────────────────────────────────────────────
+
+def generate_fake_daily_sales(n_days: int, start: date = date(2024, 1, 1)) -> pd.DataFrame:
+    """Daily sales with weekly seasonality, a mild trend and noise."""
+    rng = np.random.default_rng(11)
+    dates = [start + timedelta(days=d) for d in range(n_days)]
+    weekly = np.array([0.8, 0.85, 0.9, 1.0, 1.25, 1.4, 1.1])
+    sales = [
+        round(3000 * weekly[d.weekday()] * (1 + 0.0005 * i) * rng.uniform(0.85, 1.15), 2)
+        for i, d in enumerate(dates)
+    ]
+    return pd.DataFrame({"date": [d.isoformat() for d in dates], "sales": sales})
+
+
+def fit_small_model(df_feat: pd.DataFrame) -> "xgb.XGBRegressor":
+    df_clean = df_feat.dropna(subset=FEATURE_COLUMNS)
+    model = xgb.XGBRegressor(n_estimators=60, max_depth=4, learning_rate=0.1, random_state=42, verbosity=0)
+    model.fit(df_clean[FEATURE_COLUMNS].values, df_clean["sales"].values)
+    return model
+
+
+def reference_recursive_forecast(final_model, df_feat, horizon_days, cv_rmses):
+    """The original frame-growing loop from train_and_forecast."""
+    last_date = df_feat['date'].max()
+    forecasts = []
+    future_df = df_feat.copy()
+    for k in range(1, horizon_days + 1):
+        forecast_date = last_date + timedelta(days=k)
+        new_row = {
+            'date': forecast_date,
+            'sales': 0,
+            'day_of_week': forecast_date.weekday(),
+            'month': forecast_date.month,
+            'day_of_month': forecast_date.day,
+            'week_of_year': forecast_date.isocalendar()[1],
+            'quarter': (forecast_date.month - 1) // 3 + 1,
+            'is_weekend': int(forecast_date.weekday() >= 5),
+            'is_mid_week': int(forecast_date.weekday() in [1, 2]),
+            'dow_sin': np.sin(2 * np.pi * forecast_date.weekday() / 7),
+            'dow_cos': np.cos(2 * np.pi * forecast_date.weekday() / 7),
+            'month_sin': np.sin(2 * np.pi * forecast_date.month / 12),
+            'month_cos': np.cos(2 * np.pi * forecast_date.month / 12),
+            'dom_sin': np.sin(2 * np.pi * forecast_date.day / 31),
+            'dom_cos': np.cos(2 * np.pi * forecast_date.day / 31),
+            'is_festivo': int(forecast_date.strftime('%Y-%m-%d') in SPANISH_HOLIDAYS),
+            'is_day_before_festivo': int(
+                (forecast_date + timedelta(days=1)).strftime('%Y-%m-%d') in SPANISH_HOLIDAYS
+            ),
+            'is_day_after_festivo': int(
+                (forecast_date - timedelta(days=1)).strftime('%Y-%m-%d') in SPANISH_HOLIDAYS
+            ),
+            'is_payday': int(forecast_date.day in [1, 15] or forecast_date.day >= 25),
+            'temperature': MADRID_CLIMATE.get(forecast_date.month, {}).get('avg', 15),
+            'rain_prob': MADRID_CLIMATE.get(forecast_date.month, {}).get('rain', 0.2),
+            'is_cold': int(MADRID_CLIMATE.get(forecast_date.month, {}).get('avg', 15) < 10),
+            'is_hot': int(MADRID_CLIMATE.get(forecast_date.month, {}).get('avg', 15) > 30),
+            'is_ideal_temp': int(18 <= MADRID_CLIMATE.get(forecast_date.month, {}).get('avg', 15) <= 25),
+            'trend': len(future_df),
+        }
+        new_row['weekend_x_rain'] = new_row['is_weekend'] * new_row['rain_prob']
+        new_row['festivo_x_temp'] = new_row['is_festivo'] * new_row['temperature']
+        new_row['weekend_x_festivo'] = new_row['is_weekend'] * new_row['is_festivo']
+
+        sales_series = future_df['sales'].values
+        for lag in [1, 2, 3, 7, 14, 28]:
+            idx = len(sales_series) - lag
+            new_row[f'sales_lag_{lag}d'] = float(sales_series[idx]) if idx >= 0 else float(np.mean(sales_series[-28:]))
+        recent = sales_series[-28:]
+        for window in [7, 14, 28]:
+            w = min(window, len(recent))
+            new_row[f'sales_ma_{window}d'] = float(np.mean(recent[-w:])) if w > 0 else 0
+            new_row[f'sales_std_{window}d'] = float(np.std(recent[-w:])) if w > 1 else 0
+        new_row['sales_expanding_mean'] = float(np.mean(sales_series[sales_series > 0])) if np.any(sales_series > 0) else 0
+        dow_mask = future_df['day_of_week'] == new_row['day_of_week']
+        dow_sales = future_df.loc[dow_mask, 'sales']
+        new_row['dow_avg_sales'] = float(dow_sales.mean()) if len(dow_sales) > 0 else 0
+
+        X_future = np.array([[new_row.get(col, 0) for col in FEATURE_COLUMNS]])
+        pred = max(0, float(final_model.predict(X_future)[0]))
+        new_row['sales'] = pred
+        future_df = pd.concat([future_df, pd.DataFrame([new_row])], ignore_index=True)
+
+        avg_rmse = np.mean(cv_rmses) if cv_rmses else pred * 0.15
+        forecasts.append({
+            'date': forecast_date.strftime('%Y-%m-%d'),
+            'predicted': round(pred, 2),
+            'lower': round(max(0, pred - 1.96 * avg_rmse), 2),
+            'upper': round(pred + 1.96 * avg_rmse, 2),
+        })
+    return forecasts
+
+
+def reference_lambda_features(df: pd.DataFrame) -> pd.DataFrame:
+    """The original per-row / per-group lambda versions of the calendar columns."""
+    df = df.copy()
+    df['date'] = pd.to_datetime(df['date'])
+    df = df.sort_values('date').reset_index(drop=True)
+    df['day_of_week'] = df['date'].dt.dayofweek
+    df['month'] = df['date'].dt.month
+    out = pd.DataFrame(index=df.index)
+    out['dow_avg_sales'] = df.groupby('day_of_week')['sales'].transform(
+        lambda x: x.shift(1).expanding(min_periods=1).mean()
+    )
+    out['is_festivo'] = df['date'].dt.strftime('%Y-%m-%d').isin(SPANISH_HOLIDAYS).astype(int)
+    out['is_day_before_festivo'] = df['date'].apply(
+        lambda d: (d + timedelta(days=1)).strftime('%Y-%m-%d') in SPANISH_HOLIDAYS
+    ).astype(int)
+    out['is_day_after_festivo'] = df['date'].apply(
+        lambda d: (d - timedelta(days=1)).strftime('%Y-%m-%d') in SPANISH_HOLIDAYS
+    ).astype(int)
+    out['temperature'] = df['month'].map(lambda m: MADRID_CLIMATE.get(m, {}).get('avg', 15))
+    out['rain_prob'] = df['month'].map(lambda m: MADRID_CLIMATE.get(m, {}).get('rain', 0.2))
+    return out
+
+
+# ─── Tests ────────────────────────────────────────────────────────────────────
+
+def test_vectorized_features_match_lambdas():
+    """Holiday flags, DOW expanding mean and climate lookups equal the lambda versions."""
+    df = generate_fake_daily_sales(3 * 365)
+    df.loc[[5, 40, 41], "sales"] = np.nan  # gaps are skipped by the DOW mean
+
+    t0 = time.perf_counter()
+    expected = reference_lambda_features(df)
+    t_ref = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    got = engineer_features(df)
+    t_new = time.perf_counter() - t0
+
+    pd.testing.assert_frame_equal(got[expected.columns], expected, check_exact=True)
+    assert got['is_festivo'].sum() > 0 and got['is_day_before_festivo'].sum() > 0
+    print(f"  PASS: Vectorized features match (3y: lambdas {t_ref*1000:.0f} ms, "
+          f"full engineer_features {t_new*1000:.0f} ms)")
+
+
+def test_recursive_forecast_matches_reference():
+    """Buffer-based recursion gives the same forecasts as the frame-growing loop."""
+    df_feat = engineer_features(generate_fake_daily_sales(400))
+    model = fit_small_model(df_feat)
+
+    for cv_rmses in ([210.5, 190.25], []):
+        avg_rmse = np.mean(cv_rmses) if cv_rmses else None
+        t0 = time.perf_counter()
+        expected = reference_recursive_forecast(model, df_feat, 90, cv_rmses)
+        t_ref = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        got = recursive_forecast(model, df_feat, 90, avg_rmse)
+        t_new = time.perf_counter() - t0
+        assert got == expected
+
+    print(f"  PASS: Recursive forecast matches reference (90d: {t_ref*1000:.0f} ms → {t_new*1000:.0f} ms)")
+
+
+def test_recursive_forecast_zero_days():
+    """Predicted zeros (closed days) stay out of the expanding mean, as before."""
+    df = generate_fake_daily_sales(120)
+    df.loc[df.index[-20:], "sales"] = 0.0
+    df_feat = engineer_features(df)
+    model = fit_small_model(df_feat)
+    assert recursive_forecast(model, df_feat, 30, 100.0) == reference_recursive_forecast(model, df_feat, 30, [100.0])
+    print("  PASS: Recursive forecast with zero-sales days")
+
+
+def test_parallel_cv_folds():
+    """Expanding-window folds on a shared QuantileDMatrix; optional continued final fit."""
+    df = generate_fake_daily_sales(240)
+    result = train_and_forecast(df, horizon_days=14)
+    folds = result["cross_validation"]
+    assert [f["fold"] for f in folds] == [1, 2, 3, 4]
+    assert all(a["train_size"] + a["test_size"] == b["train_size"] for a, b in zip(folds, folds[1:]))
+    assert all(0 < f["mape"] < 0.5 for f in folds)
+    assert len(result["forecasts"]) == 14
+    assert abs(sum(f["importance"] for f in result["feature_importance"]) - 1) < 0.2
+
+    continued = train_and_forecast(df, horizon_days=14, continue_final=True)
+    assert continued["cross_validation"] == folds
+    ratio = continued["forecasts"][0]["predicted"] / result["forecasts"][0]["predicted"]
+    assert 0.8 < ratio < 1.2
+
+    # Without folds the bands keep the width of a cached CV RMSE
+    width = lambda fc: fc["upper"] - fc["lower"]
+    cached = train_and_forecast(df, horizon_days=14, n_cv_folds=0, band_rmse=result["metrics"]["rmse"])
+    assert cached["cross_validation"] == []
+    assert abs(width(cached["forecasts"][0]) - width(result["forecasts"][0])) < 1.0
+    print(f"  PASS: Parallel CV folds (MAPE {result['metrics']['mape']:.3f}, continued ratio {ratio:.3f})")
+
+
+def test_forecast_explanations():
+    """TreeSHAP contributions explain the forecast rows and add up to the predictions."""
+    df_feat = engineer_features(generate_fake_daily_sales(200))
+    booster = fit_small_model(df_feat).get_booster()
+    forecasts, x_future = recursive_forecast(booster, df_feat, 7, 100.0, with_features=True)
+    assert x_future.shape == (7, len(FEATURE_COLUMNS))
+
+    explanation = explain_forecast(booster, x_future, [f["date"] for f in forecasts], top_k=len(FEATURE_COLUMNS))
+    raw = booster.inplace_predict(x_future)
+    for day, pred, fc in zip(explanation["days"], raw, forecasts):
+        assert day["date"] == fc["date"]
+        total = day["base"] + sum(d["contribution"] for d in day["drivers"])
+        assert abs(total - pred) < 0.01 * len(FEATURE_COLUMNS), f"{total} vs {pred}"
+        assert round(max(0, float(pred)), 2) == fc["predicted"]
+    assert len(explanation["summary"]) == 10
+    print(f"  PASS: Forecast explanations (top driver: {explanation['summary'][0]['feature']})")
+
+
+def test_direct_strategy():
+    """Bucket models score the horizon from origin features only; both strategies compared."""
+    df_feat = engineer_features(generate_fake_daily_sales(240))
+    models = fit_direct_models(df_feat, 35)
+    assert [(h0, h1) for h0, h1, _ in models] == [(1, 7), (8, 28), (29, 35)]
+
+    forecasts, x_future = direct_forecast(models, df_feat, 35, 100.0, with_features=True)
+    assert len(forecasts) == 35 and x_future.shape == (35, len(DIRECT_FEATURE_COLUMNS))
+    col = DIRECT_FEATURE_COLUMNS.index
+    assert list(x_future[:, col('horizon')]) == list(range(1, 36))
+    # Same-DOW lag is the last observed day with the target's weekday
+    last_week = df_feat.tail(7)
+    for row in x_future[:7]:
+        dow = int(row[col('day_of_week')])
+        expected = last_week.loc[last_week['day_of_week'] == dow, 'sales'].iloc[0]
+        assert row[col('origin_same_dow_last')] == expected
+    # Sales after the origin never enter the features
+    truncated = direct_forecast(models, df_feat.iloc[:-7], 7, 100.0, with_features=True)[1]
+    assert not np.array_equal(truncated[:, col('origin_sales')], x_future[:7, col('origin_sales')])
+
+    result = train_and_forecast(generate_fake_daily_sales(240), horizon_days=35,
+                                strategy="direct", compare_strategies=True)
+    assert result["strategy"] == "direct" and len(result["forecasts"]) == 35
+    comparison = result["strategy_comparison"]
+    assert comparison["backtest_days"] == 28
+    for name in ("recursive", "direct"):
+        assert 0 < comparison[name]["mape"] < 0.3
+        assert comparison[name]["fit_ms"] > 0 and comparison[name]["predict_ms"] > 0
+    assert result["shap_explanation"][0]["feature"] in DIRECT_FEATURE_COLUMNS
+    # CV folds score the direct models (origin forecasts), not the recursive one
+    folds = result["cross_validation"]
+    assert [f["fold"] for f in folds] == [1, 2, 3, 4]
+    assert all(0 < f["mape"] < 0.5 for f in folds)
+    recursive_folds = train_and_forecast(generate_fake_daily_sales(240), horizon_days=35)["cross_validation"]
+    assert [f["rmse"] for f in folds] != [f["rmse"] for f in recursive_folds]
+    assert "error" in train_and_forecast(generate_fake_daily_sales(240), strategy="both")
+    print(f"  PASS: Direct strategy (backtest MAPE recursive {comparison['recursive']['mape']:.3f}, "
+          f"direct {comparison['direct']['mape']:.3f})")
+
+
+def test_daily_sales_accumulator():
+    """Page-wise daily totals equal the old per-row dict aggregation."""
+    rng = np.random.default_rng(3)
+    rows = []
+    for d in range(40):
+        day = date(2025, 3, 1) + timedelta(days=d)
+        for q in range(0 if d == 7 else 44):  # day 7 closed
+            value = None if q == 5 else round(float(rng.uniform(0, 80)), 2)
+            rows.append({"ts_bucket": f"{day.isoformat()}T{10 + q // 4:02d}:{15 * (q % 4):02d}:00+00:00",
+                         "sales_net": value})
+
+    expected: dict[str, float] = {}
+    for row in rows:
+        date_str = row["ts_bucket"][:10]
+        expected[date_str] = expected.get(date_str, 0) + float(row["sales_net"] or 0)
+
+    acc = DailySalesAccumulator("ts_bucket", "sales_net")
+    for i in range(0, len(rows), 1000):
+        acc.add(rows[i:i + 1000])
+    df = acc.to_frame()
+
+    kept = sorted((d, s) for d, s in expected.items() if s > 0)
+    assert acc.n_rows == len(rows)
+    assert list(df["date"]) == [d for d, _ in kept]
+    np.testing.assert_allclose(df["sales"], [s for _, s in kept], rtol=1e-12)
+    assert DailySalesAccumulator("ts_bucket", "sales_net").to_frame().empty
+    print(f"  PASS: Daily sales accumulator ({len(df)} days from {len(rows)} rows)")
+
+
+# ─── Runner ──────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    tests = [
+        ("Features: vectorized == lambdas", test_vectorized_features_match_lambdas),
+        ("Recursive: matches reference", test_recursive_forecast_matches_reference),
+        ("Recursive: zero-sales days", test_recursive_forecast_zero_days),
+        ("Model: parallel CV folds", test_parallel_cv_folds),
+        ("Model: forecast explanations", test_forecast_explanations),
+        ("Model: direct multi-horizon strategy", test_direct_strategy),
+        ("Data: daily sales accumulator", test_daily_sales_accumulator),
+    ]
+
+    passed = 0
+    failed = 0
+    for name, fn in tests:
+        try:
+            print(f"\n[TEST] {name}")
+            fn()
+            passed += 1
+        except Exception as e:
+            print(f"  FAIL: {e}")
+            failed += 1
+
+    print(f"\n{'='*60}")
+    print(f"Results: {passed} passed, {failed} failed, {passed + failed} total")
+    if failed > 0:
+        sys.exit(1)
+    print("All tests passed!")
@@ -6,17 +6,16 @@ Deploy alongside the existing Prophet service on Render.
 
 Features:
 - 25+ engineered features (lags, rolling stats, cyclical, interactions, weather, events)
-- SHAP feature importance for interpretability
+- SHAP feature contributions for the forecast days (XGBoost's native TreeSHAP)
 - Expanding window cross-validation
-- Supabase direct integration (fetch data + store forecasts)
+- Supabase direct integration over async REST (fetch data + store forecasts)
 
 Usage:
-    Register the route in your Flask/FastAPI app:
-        app.add_url_rule('/forecast_xgboost', view_func=forecast_xgboost, methods=['POST'])
-        # or for FastAPI:
+    Register the route in your FastAPI app:
+        handler = create_forecast_xgboost_handler()
         @app.post('/forecast_xgboost')
-        async def forecast_xgboost_endpoint(request: Request):
-            return await forecast_xgboost(request)
+        async def forecast_xgboost_endpoint(body: dict):
+            return await handler(body)
 """
 
 import numpy as np
@@ -25,6 +24,11 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import json
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from calendar_index import CALENDAR, MADRID_CLIMATE, to_ordinals
 
 logger = logging.getLogger(__name__)
 
@@ -37,46 +41,12 @@ except ImportError:
     HAS_XGBOOST = False
     logger.warning("xgboost not installed — XGBoost forecasting disabled")
 
-try:
-    import shap
-    HAS_SHAP = True
-except ImportError:
-    HAS_SHAP = False
-    logger.info("shap not installed — SHAP explanations disabled")
-
 
 # ─── Feature Engineering ──────────────────────────────────────────────────────
 
-SPANISH_HOLIDAYS = {
-    # 2025
-    '2025-01-01', '2025-01-06', '2025-04-18', '2025-04-21',
-    '2025-05-01', '2025-08-15', '2025-10-12', '2025-11-01',
-    '2025-12-06', '2025-12-08', '2025-12-25',
-    # 2026
-    '2026-01-01', '2026-01-06', '2026-04-03', '2026-04-06',
-    '2026-05-01', '2026-08-15', '2026-10-12', '2026-11-01',
-    '2026-12-06', '2026-12-08', '2026-12-25',
-    # 2027
-    '2027-01-01', '2027-01-06', '2027-03-26', '2027-03-29',
-    '2027-05-01', '2027-08-15', '2027-10-12', '2027-11-01',
-    '2027-12-06', '2027-12-08', '2027-12-25',
-}
-
-# Madrid monthly climate normals (from regressors.ts)
-MADRID_CLIMATE = {
-    1: {'avg': 6.3, 'std': 3.0, 'rain': 0.27},
-    2: {'avg': 7.9, 'std': 3.2, 'rain': 0.25},
-    3: {'avg': 11.2, 'std': 3.5, 'rain': 0.23},
-    4: {'avg': 13.1, 'std': 3.0, 'rain': 0.30},
-    5: {'avg': 17.2, 'std': 3.5, 'rain': 0.28},
-    6: {'avg': 22.5, 'std': 3.0, 'rain': 0.12},
-    7: {'avg': 26.1, 'std': 2.5, 'rain': 0.07},
-    8: {'avg': 25.6, 'std': 2.5, 'rain': 0.08},
-    9: {'avg': 21.3, 'std': 3.0, 'rain': 0.18},
-    10: {'avg': 15.1, 'std': 3.5, 'rain': 0.28},
-    11: {'avg': 9.9, 'std': 3.0, 'rain': 0.30},
-    12: {'avg': 6.9, 'std': 3.0, 'rain': 0.30},
-}
+# Holidays and climate normals come from the shared day-indexed calendar
+# (MADRID_CLIMATE and SPANISH_HOLIDAYS stay importable from here)
+SPANISH_HOLIDAYS = CALENDAR.holiday_strings()
 
 
 def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
@@ -90,12 +60,14 @@ def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
     df['date'] = pd.to_datetime(df['date'])
     df = df.sort_values('date').reset_index(drop=True)
     
-    # ── Temporal features ─────────────────────────────────────────
-    df['day_of_week'] = df['date'].dt.dayofweek          # 0=Mon, 6=Sun
-    df['month'] = df['date'].dt.month
-    df['day_of_month'] = df['date'].dt.day
-    df['week_of_year'] = df['date'].dt.isocalendar().week.astype(int)
-    df['quarter'] = df['date'].dt.quarter
+    # ── Temporal features (sliced from the shared calendar) ──────
+    ords = to_ordinals(df['date'].to_numpy())
+    cal = CALENDAR.frame(ords).astype(int)
+    df['day_of_week'] = cal['dow'].to_numpy()            # 0=Mon, 6=Sun
+    df['month'] = cal['month'].to_numpy()
+    df['day_of_month'] = cal['day'].to_numpy()
+    df['week_of_year'] = cal['week_of_year'].to_numpy()
+    df['quarter'] = cal['quarter'].to_numpy()
     df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
     df['is_mid_week'] = df['day_of_week'].isin([1, 2]).astype(int)  # Tue, Wed
     
@@ -120,30 +92,22 @@ def engineer_features(df: pd.DataFrame) -> pd.DataFrame:
     df['sales_expanding_mean'] = df['sales'].shift(1).expanding(min_periods=1).mean()
     
     # ── Day-of-week average (same DOW historical average) ─────────
-    dow_means = df.groupby('day_of_week')['sales'].transform(
-        lambda x: x.shift(1).expanding(min_periods=1).mean()
-    )
-    df['dow_avg_sales'] = dow_means
-    
-    # ── External features: holidays ───────────────────────────────
-    df['is_festivo'] = df['date'].dt.strftime('%Y-%m-%d').isin(SPANISH_HOLIDAYS).astype(int)
-    
-    # Day before/after holiday
-    df['is_day_before_festivo'] = df['date'].apply(
-        lambda d: (d + timedelta(days=1)).strftime('%Y-%m-%d') in SPANISH_HOLIDAYS
-    ).astype(int)
-    df['is_day_after_festivo'] = df['date'].apply(
-        lambda d: (d - timedelta(days=1)).strftime('%Y-%m-%d') in SPANISH_HOLIDAYS
-    ).astype(int)
-    
-    # ── External features: payday ─────────────────────────────────
-    df['is_payday'] = ((df['day_of_month'] == 1) | 
-                       (df['day_of_month'] == 15) | 
-                       (df['day_of_month'] >= 25)).astype(int)
+    # Mean of earlier same-DOW days: running sum / count per DOW, shifted by one
+    dow = df['day_of_week']
+    sales_known = df['sales'].notna()
+    dow_sum = df['sales'].fillna(0).groupby(dow).cumsum().groupby(dow).shift(1)
+    dow_count = sales_known.astype(int).groupby(dow).cumsum().groupby(dow).shift(1)
+    df['dow_avg_sales'] = dow_sum / dow_count.where(dow_count > 0)
+    
+    # ── External features: holidays, day before/after, payday ─────
+    df['is_festivo'] = cal['is_holiday'].to_numpy()
+    df['is_day_before_festivo'] = cal['is_pre_holiday'].to_numpy()
+    df['is_day_after_festivo'] = cal['is_post_holiday'].to_numpy()
+    df['is_payday'] = cal['is_payday'].to_numpy()
     
     # ── External features: weather (deterministic from climate normals) ──
-    df['temperature'] = df['month'].map(lambda m: MADRID_CLIMATE.get(m, {}).get('avg', 15))
-    df['rain_prob'] = df['month'].map(lambda m: MADRID_CLIMATE.get(m, {}).get('rain', 0.2))
+    df['temperature'] = CALENDAR.take('temp_normal', ords)
+    df['rain_prob'] = CALENDAR.take('rain_prob', ords)
     df['is_cold'] = (df['temperature'] < 10).astype(int)
     df['is_hot'] = (df['temperature'] > 30).astype(int)
     df['is_ideal_temp'] = ((df['temperature'] >= 18) & (df['temperature'] <= 25)).astype(int)
@@ -184,24 +148,291 @@ FEATURE_COLUMNS = [
 ]
 
 
+# ─── Recursive forecast ───────────────────────────────────────────────────────
+
+def _calendar_row(forecast_date: datetime) -> Dict[str, float]:
+    """Known-in-advance features of a future day (same values as engineer_features)."""
+    cal = CALENDAR.row(forecast_date)
+    dow, month, day = cal['dow'], cal['month'], cal['day']
+    temp = cal['temp_normal']
+    row = {
+        'day_of_week': dow,
+        'month': month,
+        'day_of_month': day,
+        'week_of_year': cal['week_of_year'],
+        'quarter': cal['quarter'],
+        'is_weekend': int(dow >= 5),
+        'is_mid_week': int(dow in [1, 2]),
+        'dow_sin': np.sin(2 * np.pi * dow / 7),
+        'dow_cos': np.cos(2 * np.pi * dow / 7),
+        'month_sin': np.sin(2 * np.pi * month / 12),
+        'month_cos': np.cos(2 * np.pi * month / 12),
+        'dom_sin': np.sin(2 * np.pi * day / 31),
+        'dom_cos': np.cos(2 * np.pi * day / 31),
+        'is_festivo': cal['is_holiday'],
+        'is_day_before_festivo': cal['is_pre_holiday'],
+        'is_day_after_festivo': cal['is_post_holiday'],
+        'is_payday': cal['is_payday'],
+        'temperature': temp,
+        'rain_prob': cal['rain_prob'],
+        'is_cold': int(temp < 10),
+        'is_hot': int(temp > 30),
+        'is_ideal_temp': int(18 <= temp <= 25),
+    }
+    row['weekend_x_rain'] = row['is_weekend'] * row['rain_prob']
+    row['festivo_x_temp'] = row['is_festivo'] * row['temperature']
+    row['weekend_x_festivo'] = row['is_weekend'] * row['is_festivo']
+    return row
+
+
+def recursive_forecast(
+    model,
+    df_feat: pd.DataFrame,
+    horizon_days: int,
+    avg_rmse: Optional[float] = None,
+    with_features: bool = False,
+):
+    """
+    Day-by-day auto-regressive forecast after the last row of ``df_feat``.
+    
+    Sales live in one preallocated buffer (history + horizon) that predictions
+    are written into; lags and rolling windows are slices of its tail, and the
+    expanding / day-of-week means are running sums. Each step is O(1) in the
+    history length instead of re-scanning (and re-concatenating) the frame.
+    
+    ``model`` is a Booster (or an XGBRegressor). Intervals are
+    ±1.96 × ``avg_rmse`` (CV RMSE), or ±15% without CV folds.
+    ``with_features`` also returns the (horizon × FEATURE_COLUMNS) rows fed
+    to the model.
+    """
+    col_idx = {col: i for i, col in enumerate(FEATURE_COLUMNS)}
+    booster = model.get_booster() if hasattr(model, 'get_booster') else model
+    last_date = df_feat['date'].max()
+    
+    history = df_feat['sales'].to_numpy(dtype=float)
+    n = len(history)
+    sales = np.empty(n + horizon_days)
+    sales[:n] = history
+    
+    # Running sums for the expanding mean (positive days) and DOW means
+    positive = history > 0
+    pos_sum, pos_count = float(history[positive].sum()), int(positive.sum())
+    dow = df_feat['day_of_week'].to_numpy()
+    known = ~np.isnan(history)
+    dow_sum = np.bincount(dow[known], weights=history[known], minlength=7)
+    dow_count = np.bincount(dow[known], minlength=7)
+    
+    x_future = np.zeros((horizon_days, len(FEATURE_COLUMNS)))
+    forecasts = []
+    for k in range(1, horizon_days + 1):
+        forecast_date = last_date + timedelta(days=k)
+        t = n + k - 1  # rows so far (history + earlier predictions)
+        new_row = _calendar_row(forecast_date)
+        new_row['trend'] = t
+        
+        # Lags and rolling stats from the tail of the buffer
+        recent = sales[max(0, t - 28):t]
+        for lag in [1, 2, 3, 7, 14, 28]:
+            idx = t - lag
+            new_row[f'sales_lag_{lag}d'] = float(sales[idx]) if idx >= 0 else float(np.mean(recent))
+        for window in [7, 14, 28]:
+            w = min(window, len(recent))
+            new_row[f'sales_ma_{window}d'] = float(np.mean(recent[-w:])) if w > 0 else 0
+            new_row[f'sales_std_{window}d'] = float(np.std(recent[-w:])) if w > 1 else 0
+        
+        new_row['sales_expanding_mean'] = pos_sum / pos_count if pos_count else 0
+        d = new_row['day_of_week']
+        new_row['dow_avg_sales'] = float(dow_sum[d] / dow_count[d]) if dow_count[d] else 0
+        
+        x_row = x_future[k - 1:k]
+        for col, value in new_row.items():
+            x_row[0, col_idx[col]] = value
+        pred = max(0, float(booster.inplace_predict(x_row)[0]))
+        
+        # Feed the prediction back for the next day's lags and means
+        sales[t] = pred
+        if pred > 0:
+            pos_sum += pred
+            pos_count += 1
+        dow_sum[d] += pred
+        dow_count[d] += 1
+        
+        spread = 1.96 * (avg_rmse if avg_rmse is not None else pred * 0.15)
+        forecasts.append({
+            'date': forecast_date.strftime('%Y-%m-%d'),
+            'predicted': round(pred, 2),
+            'lower': round(max(0, pred - spread), 2),
+            'upper': round(pred + spread, 2),
+        })
+    
+    if with_features:
+        return forecasts, x_future
+    return forecasts
+
+
+def explain_forecast(
+    booster, x_future: np.ndarray, dates: List[str], top_k: int = 3, columns: List[str] = FEATURE_COLUMNS,
+) -> Dict:
+    """
+    SHAP values of the forecast rows via XGBoost's TreeSHAP (pred_contribs),
+    in one batched call.
+    
+    Returns the top-10 features by mean |contribution| over the rows, and the
+    ``top_k`` signed drivers of each day (contributions + base sum to the
+    raw prediction).
+    """
+    contribs = booster.predict(xgb.DMatrix(x_future), pred_contribs=True)
+    feature_contribs, base = contribs[:, :-1], contribs[:, -1]
+    
+    mean_abs = np.abs(feature_contribs).mean(axis=0)
+    top = np.argsort(-mean_abs, kind='stable')[:10]
+    days = []
+    for i, ds in enumerate(dates):
+        order = np.argsort(-np.abs(feature_contribs[i]), kind='stable')[:top_k]
+        days.append({
+            'date': ds,
+            'base': round(float(base[i]), 2),
+            'drivers': [
+                {'feature': columns[j], 'contribution': round(float(feature_contribs[i, j]), 2)}
+                for j in order
+            ],
+        })
+    return {
+        'summary': [
+            {'feature': columns[j], 'importance': round(float(mean_abs[j]), 4)}
+            for j in top
+        ],
+        'days': days,
+    }
+
+
 # ─── XGBoost Model ────────────────────────────────────────────────────────────
 
+# Native-API equivalent of the former XGBRegressor settings (hist is the default)
+XGB_PARAMS = {
+    'objective': 'reg:squarederror',
+    'tree_method': 'hist',
+    'max_depth': 6,
+    'learning_rate': 0.05,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'min_child_weight': 5,
+    'reg_alpha': 0.1,
+    'reg_lambda': 1.0,
+    'seed': 42,
+    'verbosity': 0,
+}
+CV_ROUNDS = 200
+FINAL_ROUNDS = 300
+EXPLAIN_DAYS = 7
+
+
+def _fold_ranges(n: int, n_cv_folds: int, min_train_pct: float = 0.5) -> List[Tuple[int, int, int]]:
+    """Expanding-window (fold, train_end, test_end) row offsets (none for 0 folds)."""
+    if n_cv_folds <= 0:
+        return []
+    test_pct = (1 - min_train_pct) / n_cv_folds
+    ranges = []
+    for fold in range(n_cv_folds):
+        train_end = int(n * (min_train_pct + fold * test_pct))
+        test_end = int(n * (min_train_pct + (fold + 1) * test_pct))
+        if train_end < 30 or test_end > n or test_end - train_end < 7:
+            continue
+        ranges.append((fold, train_end, test_end))
+    return ranges
+
+
+def _fit_fold(X: np.ndarray, y: np.ndarray, full, fold: int, train_end: int, test_end: int, nthread: int):
+    """Train one CV fold on rows [0, train_end) binned with the full matrix's cuts."""
+    dtrain = xgb.QuantileDMatrix(X[:train_end], label=y[:train_end], ref=full, nthread=nthread)
+    booster = xgb.train({**XGB_PARAMS, 'nthread': nthread}, dtrain, num_boost_round=CV_ROUNDS)
+    y_test = y[train_end:test_end]
+    preds = np.maximum(booster.inplace_predict(X[train_end:test_end]), 0)  # No negative sales
+    return booster, _fold_metrics(y_test, preds, fold, train_end, test_end)
+
+
+def _fit_direct_fold(df_feat: pd.DataFrame, fold: int, train_end: int, test_end: int) -> Optional[Dict]:
+    """Fit the direct bucket models on rows [0, train_end) and score days train_end..test_end.
+    
+    The test days are forecast from the fold's origin, as in production
+    (None when the prefix is too short for a direct fit).
+    """
+    train_feat = df_feat.iloc[:train_end]
+    try:
+        models = fit_direct_models(train_feat, test_end - train_end)
+    except ValueError:
+        return None
+    preds = np.array([f['predicted'] for f in direct_forecast(models, train_feat, test_end - train_end)])
+    y_test = df_feat['sales'].to_numpy(dtype=float)[train_end:test_end]
+    return _fold_metrics(y_test, preds, fold, train_end, test_end)
+
+
+def _fold_metrics(y_test: np.ndarray, preds: np.ndarray, fold: int, train_end: int, test_end: int) -> Dict:
+    """Error metrics of one CV fold."""
+    mask = y_test > 0
+    mape = np.mean(np.abs((y_test[mask] - preds[mask]) / y_test[mask])) if mask.sum() > 0 else 0
+    rmse = np.sqrt(np.mean((y_test - preds) ** 2))
+    mae = np.mean(np.abs(y_test - preds))
+    
+    ss_res = np.sum((y_test - preds) ** 2)
+    ss_tot = np.sum((y_test - np.mean(y_test)) ** 2)
+    r2 = max(0, 1 - ss_res / ss_tot) if ss_tot > 0 else 0
+    
+    return {
+        'fold': fold + 1,
+        'train_size': train_end,
+        'test_size': test_end - train_end,
+        'mape': round(float(mape), 4),
+        'rmse': round(float(rmse), 2),
+        'mae': round(float(mae), 2),
+        'r_squared': round(float(r2), 4),
+    }
+
+
+def _feature_importance(booster, columns: List[str] = FEATURE_COLUMNS) -> Dict[str, float]:
+    """Normalized gain importance per column (as feature_importances_)."""
+    gain = booster.get_score(importance_type='gain')
+    values = np.array([gain.get(f'f{i}', 0.0) for i in range(len(columns))])
+    total = values.sum()
+    return dict(zip(columns, values / total if total > 0 else values))
+
+
 def train_and_forecast(
     df: pd.DataFrame,
     horizon_days: int = 90,
     n_cv_folds: int = 4,
+    continue_final: bool = False,
+    strategy: str = 'recursive',
+    compare_strategies: bool = False,
+    band_rmse: Optional[float] = None,
 ) -> Dict:
     """
     Train XGBoost on historical data and generate forecasts.
     
+    ``strategy`` is 'recursive' (one next-day model fed its own predictions)
+    or 'direct' (one model per DIRECT_HORIZON_BUCKETS bucket, scored in one
+    batched call each). ``compare_strategies`` adds a holdout backtest of
+    both with accuracy and latency side by side.
+    
+    The CV folds fit and score the chosen strategy, so ``metrics``,
+    ``cross_validation`` and the bands' RMSE describe the model that made the
+    forecast. ``n_cv_folds=0`` skips cross-validation (metrics are then zero and the
+    bands use ``band_rmse``, e.g. a cached CV RMSE, or fall back to ±15%).
+    
+    ``continue_final`` builds the final model by continued boosting from the
+    last CV fold instead of a fresh fit (faster on long histories).
+    
     Returns dict with:
     - forecasts: list of {date, predicted, lower, upper}
     - metrics: {mape, rmse, mae, r_squared}
     - feature_importance: top 15 features
-    - shap_values: SHAP explanation for first 7 forecasts (if available)
+    - shap_explanation: top features by mean |SHAP| over the first 7 forecast days
+    - forecast_drivers: signed top drivers of each of those days
     """
     if not HAS_XGBOOST:
         return {"error": "xgboost not installed", "install": "pip install xgboost"}
+    if strategy not in STRATEGIES:
+        return {"error": f"Unknown strategy {strategy!r} (expected one of {', '.join(STRATEGIES)})"}
     
     # Engineer features
     df_feat = engineer_features(df)
@@ -215,172 +446,62 @@ def train_and_forecast(
             "raw_rows": len(df),
         }
     
-    X = df_clean[FEATURE_COLUMNS].values
-    y = df_clean['sales'].values
-    
     # ── Expanding Window Cross-Validation ─────────────────────────
-    cv_results = []
-    n = len(X)
-    min_train_pct = 0.5
-    test_pct = (1 - min_train_pct) / n_cv_folds
-    
-    for fold in range(n_cv_folds):
-        train_end = int(n * (min_train_pct + fold * test_pct))
-        test_end = int(n * (min_train_pct + (fold + 1) * test_pct))
-        
-        if train_end < 30 or test_end > n:
-            continue
-        
-        X_train, y_train = X[:train_end], y[:train_end]
-        X_test, y_test = X[train_end:test_end], y[train_end:test_end]
-        
-        if len(X_test) < 7:
-            continue
-        
-        model = xgb.XGBRegressor(
-            n_estimators=200,
-            max_depth=6,
-            learning_rate=0.05,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            min_child_weight=5,
-            reg_alpha=0.1,
-            reg_lambda=1.0,
-            random_state=42,
-            verbosity=0,
+    if strategy == 'direct':
+        # Direct folds refit the bucket models on each prefix and forecast its test days
+        folds = _fold_ranges(len(df_feat), n_cv_folds)
+        with ThreadPoolExecutor(max_workers=max(1, min(len(folds), os.cpu_count() or 1))) as pool:
+            cv_results = [m for m in pool.map(lambda f: _fit_direct_fold(df_feat, *f), folds) if m is not None]
+    else:
+        # Quantize once: every fold bins its prefix with the full matrix's cuts,
+        # and folds train concurrently on a split thread budget.
+        X = df_clean[FEATURE_COLUMNS].values
+        y = df_clean['sales'].values
+        full = xgb.QuantileDMatrix(X, label=y)
+        folds = _fold_ranges(len(X), n_cv_folds)
+        n_workers = max(1, min(len(folds), os.cpu_count() or 1))
+        nthread = max(1, (os.cpu_count() or 1) // n_workers)
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            fitted = list(pool.map(lambda f: _fit_fold(X, y, full, *f, nthread=nthread), folds))
+        cv_results = [metrics for _, metrics in fitted]
+    
+    avg_rmse = np.mean([f['rmse'] for f in cv_results]) if cv_results else band_rmse
+    
+    t0 = time.perf_counter()
+    if strategy == 'direct':
+        # ── Direct: one model per horizon bucket ──────────────────
+        direct_models = fit_direct_models(df_feat, horizon_days)
+        fit_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        forecasts, x_future = direct_forecast(
+            direct_models, df_feat, horizon_days, avg_rmse, with_features=True,
         )
-        model.fit(X_train, y_train)
-        preds = model.predict(X_test)
-        preds = np.maximum(preds, 0)  # No negative sales
-        
-        # Compute metrics for this fold
-        mask = y_test > 0
-        mape = np.mean(np.abs((y_test[mask] - preds[mask]) / y_test[mask])) if mask.sum() > 0 else 0
-        rmse = np.sqrt(np.mean((y_test - preds) ** 2))
-        mae = np.mean(np.abs(y_test - preds))
-        
-        ss_res = np.sum((y_test - preds) ** 2)
-        ss_tot = np.sum((y_test - np.mean(y_test)) ** 2)
-        r2 = max(0, 1 - ss_res / ss_tot) if ss_tot > 0 else 0
+        predict_ms = (time.perf_counter() - t0) * 1000
+        explain_model, columns = direct_models[0][2], DIRECT_FEATURE_COLUMNS
+    else:
+        # ── Train final model on ALL data ─────────────────────────
+        # continue_final boosts the last fold's model (already CV_ROUNDS trees on
+        # most of the history) for the remaining rounds on all rows.
+        if continue_final and fitted:
+            final_model = xgb.train(
+                XGB_PARAMS, full, num_boost_round=FINAL_ROUNDS - CV_ROUNDS, xgb_model=fitted[-1][0],
+            )
+        else:
+            final_model = xgb.train(XGB_PARAMS, full, num_boost_round=FINAL_ROUNDS)
+        fit_ms = (time.perf_counter() - t0) * 1000
         
-        cv_results.append({
-            'fold': fold + 1,
-            'train_size': len(X_train),
-            'test_size': len(X_test),
-            'mape': round(float(mape), 4),
-            'rmse': round(float(rmse), 2),
-            'mae': round(float(mae), 2),
-            'r_squared': round(float(r2), 4),
-        })
-    
-    # ── Train final model on ALL data ─────────────────────────────
-    final_model = xgb.XGBRegressor(
-        n_estimators=300,
-        max_depth=6,
-        learning_rate=0.05,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        min_child_weight=5,
-        reg_alpha=0.1,
-        reg_lambda=1.0,
-        random_state=42,
-        verbosity=0,
-    )
-    final_model.fit(X, y)
+        # ── Generate future forecasts (auto-regressive) ───────────
+        t0 = time.perf_counter()
+        forecasts, x_future = recursive_forecast(
+            final_model, df_feat, horizon_days, avg_rmse, with_features=True,
+        )
+        predict_ms = (time.perf_counter() - t0) * 1000
+        explain_model, columns = final_model, FEATURE_COLUMNS
     
-    # ── Feature importance ────────────────────────────────────────
-    importance = dict(zip(FEATURE_COLUMNS, final_model.feature_importances_))
+    # ── Feature importance (of the model behind the first days) ──
+    importance = _feature_importance(explain_model, columns)
     top_features = sorted(importance.items(), key=lambda x: x[1], reverse=True)[:15]
     
-    # ── Generate future forecasts ─────────────────────────────────
-    last_date = df_feat['date'].max()
-    forecasts = []
-    
-    # Build future DataFrame row by row (auto-regressive)
-    future_df = df_feat.copy()
-    
-    for k in range(1, horizon_days + 1):
-        forecast_date = last_date + timedelta(days=k)
-        
-        # Create a new row with known features
-        new_row = {
-            'date': forecast_date,
-            'sales': 0,  # placeholder, will be predicted
-            'day_of_week': forecast_date.weekday(),
-            'month': forecast_date.month,
-            'day_of_month': forecast_date.day,
-            'week_of_year': forecast_date.isocalendar()[1],
-            'quarter': (forecast_date.month - 1) // 3 + 1,
-            'is_weekend': int(forecast_date.weekday() >= 5),
-            'is_mid_week': int(forecast_date.weekday() in [1, 2]),
-            'dow_sin': np.sin(2 * np.pi * forecast_date.weekday() / 7),
-            'dow_cos': np.cos(2 * np.pi * forecast_date.weekday() / 7),
-            'month_sin': np.sin(2 * np.pi * forecast_date.month / 12),
-            'month_cos': np.cos(2 * np.pi * forecast_date.month / 12),
-            'dom_sin': np.sin(2 * np.pi * forecast_date.day / 31),
-            'dom_cos': np.cos(2 * np.pi * forecast_date.day / 31),
-            'is_festivo': int(forecast_date.strftime('%Y-%m-%d') in SPANISH_HOLIDAYS),
-            'is_day_before_festivo': int(
-                (forecast_date + timedelta(days=1)).strftime('%Y-%m-%d') in SPANISH_HOLIDAYS
-            ),
-            'is_day_after_festivo': int(
-                (forecast_date - timedelta(days=1)).strftime('%Y-%m-%d') in SPANISH_HOLIDAYS
-            ),
-            'is_payday': int(forecast_date.day in [1, 15] or forecast_date.day >= 25),
-            'temperature': MADRID_CLIMATE.get(forecast_date.month, {}).get('avg', 15),
-            'rain_prob': MADRID_CLIMATE.get(forecast_date.month, {}).get('rain', 0.2),
-            'is_cold': int(MADRID_CLIMATE.get(forecast_date.month, {}).get('avg', 15) < 10),
-            'is_hot': int(MADRID_CLIMATE.get(forecast_date.month, {}).get('avg', 15) > 30),
-            'is_ideal_temp': int(18 <= MADRID_CLIMATE.get(forecast_date.month, {}).get('avg', 15) <= 25),
-            'trend': len(future_df),
-        }
-        
-        # Compute interaction features
-        new_row['weekend_x_rain'] = new_row['is_weekend'] * new_row['rain_prob']
-        new_row['festivo_x_temp'] = new_row['is_festivo'] * new_row['temperature']
-        new_row['weekend_x_festivo'] = new_row['is_weekend'] * new_row['is_festivo']
-        
-        # Compute lag features from future_df (auto-regressive)
-        sales_series = future_df['sales'].values
-        for lag in [1, 2, 3, 7, 14, 28]:
-            idx = len(sales_series) - lag
-            new_row[f'sales_lag_{lag}d'] = float(sales_series[idx]) if idx >= 0 else float(np.mean(sales_series[-28:]))
-        
-        # Rolling stats from recent history
-        recent = sales_series[-28:]
-        for window in [7, 14, 28]:
-            w = min(window, len(recent))
-            new_row[f'sales_ma_{window}d'] = float(np.mean(recent[-w:])) if w > 0 else 0
-            new_row[f'sales_std_{window}d'] = float(np.std(recent[-w:])) if w > 1 else 0
-        
-        new_row['sales_expanding_mean'] = float(np.mean(sales_series[sales_series > 0])) if np.any(sales_series > 0) else 0
-        
-        # DOW average from history
-        dow_mask = future_df['day_of_week'] == new_row['day_of_week']
-        dow_sales = future_df.loc[dow_mask, 'sales']
-        new_row['dow_avg_sales'] = float(dow_sales.mean()) if len(dow_sales) > 0 else 0
-        
-        # Predict
-        X_future = np.array([[new_row.get(col, 0) for col in FEATURE_COLUMNS]])
-        pred = float(final_model.predict(X_future)[0])
-        pred = max(0, pred)
-        
-        # Update the row with the prediction for auto-regressive lags
-        new_row['sales'] = pred
-        future_df = pd.concat([future_df, pd.DataFrame([new_row])], ignore_index=True)
-        
-        # Confidence interval (based on CV RMSE)
-        avg_rmse = np.mean([f['rmse'] for f in cv_results]) if cv_results else pred * 0.15
-        lower = max(0, pred - 1.96 * avg_rmse)
-        upper = pred + 1.96 * avg_rmse
-        
-        forecasts.append({
-            'date': forecast_date.strftime('%Y-%m-%d'),
-            'predicted': round(pred, 2),
-            'lower': round(lower, 2),
-            'upper': round(upper, 2),
-        })
-    
     # ── Aggregate CV metrics ──────────────────────────────────────
     if cv_results:
         avg_metrics = {
@@ -392,36 +513,35 @@ def train_and_forecast(
     else:
         avg_metrics = {'mape': 0, 'rmse': 0, 'mae': 0, 'r_squared': 0}
     
-    # ── SHAP explanation (if available) ───────────────────────────
+    # ── SHAP explanation of the first forecast days ───────────────
     shap_explanation = None
-    if HAS_SHAP and len(forecasts) > 0:
+    forecast_drivers = None
+    if len(forecasts) > 0:
+        n_explain = min(EXPLAIN_DAYS, len(forecasts))
+        try:
+            explanation = explain_forecast(
+                explain_model, x_future[:n_explain], [f['date'] for f in forecasts[:n_explain]],
+                columns=columns,
+            )
+            shap_explanation = explanation['summary']
+            forecast_drivers = explanation['days']
+        except Exception as e:
+            logger.warning(f"SHAP contributions failed: {e}")
+    
+    comparison = None
+    if compare_strategies:
         try:
-            explainer = shap.TreeExplainer(final_model)
-            X_explain = np.array([
-                [forecasts[i].get(col, 0) for col in FEATURE_COLUMNS]
-                for i in range(min(7, len(forecasts)))
-            ])
-            # Use the last 7 rows of training data for explanation context
-            X_explain = X[-7:]
-            shap_values = explainer.shap_values(X_explain)
-            
-            # Top drivers for the first forecast day
-            mean_abs_shap = np.abs(shap_values).mean(axis=0)
-            top_shap = sorted(
-                zip(FEATURE_COLUMNS, mean_abs_shap),
-                key=lambda x: x[1], reverse=True
-            )[:10]
-            shap_explanation = [
-                {'feature': f, 'importance': round(float(v), 4)}
-                for f, v in top_shap
-            ]
+            comparison = backtest_strategies(df_feat, horizon_days)
         except Exception as e:
-            logger.warning(f"SHAP failed: {e}")
+            logger.warning(f"Strategy backtest failed: {e}")
     
     return {
         'model': 'XGBoost_v6',
+        'strategy': strategy,
         'data_points': len(df_clean),
-        'features_used': len(FEATURE_COLUMNS),
+        'features_used': len(columns),
+        'latency_ms': {'fit': round(fit_ms, 1), 'predict': round(predict_ms, 1)},
+        'strategy_comparison': comparison,
         'metrics': avg_metrics,
         'cross_validation': cv_results,
         'feature_importance': [
@@ -429,88 +549,303 @@ def train_and_forecast(
             for f, v in top_features
         ],
         'shap_explanation': shap_explanation,
+        'forecast_drivers': forecast_drivers,
         'forecasts': forecasts,
     }
 
 
+# ─── Direct multi-horizon forecast ──────────────────────────────────────────
+
+# Horizon buckets (days ahead, inclusive); the last one used ends at the horizon
+DIRECT_HORIZON_BUCKETS = [(1, 7), (8, 28), (29, 90)]
+DIRECT_ROUNDS = 200
+STRATEGIES = ('recursive', 'direct')
+BACKTEST_MAX_DAYS = 28
+
+# Known-in-advance features of the target day (names as in FEATURE_COLUMNS)
+DIRECT_CALENDAR_COLUMNS = [
+    'day_of_week', 'month', 'day_of_month', 'week_of_year', 'quarter',
+    'is_weekend', 'is_mid_week',
+    'dow_sin', 'dow_cos', 'month_sin', 'month_cos', 'dom_sin', 'dom_cos',
+    'is_festivo', 'is_day_before_festivo', 'is_day_after_festivo', 'is_payday',
+    'temperature', 'rain_prob', 'is_cold', 'is_hot', 'is_ideal_temp',
+    'weekend_x_rain', 'festivo_x_temp', 'weekend_x_festivo',
+]
+# History summarized at the forecast origin: every lag is ≥ the horizon
+DIRECT_ORIGIN_COLUMNS = [
+    'origin_sales', 'origin_ma_7d', 'origin_ma_28d', 'origin_std_28d',
+    'origin_expanding_mean', 'origin_dow_avg', 'origin_same_dow_last',
+]
+DIRECT_FEATURE_COLUMNS = DIRECT_CALENDAR_COLUMNS + ['horizon', 'trend'] + DIRECT_ORIGIN_COLUMNS
+
+
+def _direct_buckets(horizon_days: int) -> List[Tuple[int, int]]:
+    buckets = []
+    for h0, h1 in DIRECT_HORIZON_BUCKETS:
+        if h0 > horizon_days:
+            break
+        buckets.append((h0, h1))
+    buckets[-1] = (buckets[-1][0], horizon_days)
+    return buckets
+
+
+class _OriginState:
+    """Per-row history summaries of ``df_feat`` used as direct-model origins."""
+    
+    def __init__(self, df_feat: pd.DataFrame):
+        sales = pd.Series(df_feat['sales'].to_numpy(dtype=float)).fillna(0.0)
+        self.sales = sales.to_numpy()
+        self.dow = df_feat['day_of_week'].to_numpy()
+        self.ma7 = sales.rolling(7, min_periods=1).mean().to_numpy()
+        self.ma28 = sales.rolling(28, min_periods=1).mean().to_numpy()
+        self.std28 = sales.rolling(28, min_periods=2).std().fillna(0.0).to_numpy()
+        self.expanding = sales.expanding().mean().to_numpy()
+        onehot = self.dow[:, None] == np.arange(7)[None, :]
+        # Running per-DOW sums / counts and the latest value of each DOW
+        self.dow_sum = np.cumsum(onehot * self.sales[:, None], axis=0)
+        self.dow_count = np.cumsum(onehot, axis=0)
+        self.dow_last = pd.DataFrame(np.where(onehot, self.sales[:, None], np.nan)).ffill().to_numpy()
+    
+    def design(self, origins: np.ndarray, horizons: np.ndarray, calendar: np.ndarray) -> np.ndarray:
+        """DIRECT_FEATURE_COLUMNS rows for targets ``origins + horizons``."""
+        target_dow = calendar[:, DIRECT_CALENDAR_COLUMNS.index('day_of_week')].astype(int)
+        count = self.dow_count[origins, target_dow]
+        dow_avg = np.where(
+            count > 0, self.dow_sum[origins, target_dow] / np.maximum(count, 1), self.expanding[origins],
+        )
+        same_dow_last = self.dow_last[origins, target_dow]
+        same_dow_last = np.where(np.isnan(same_dow_last), dow_avg, same_dow_last)
+        return np.column_stack([
+            calendar,
+            horizons,
+            origins + horizons,  # trend index of the target day
+            self.sales[origins],
+            self.ma7[origins],
+            self.ma28[origins],
+            self.std28[origins],
+            self.expanding[origins],
+            dow_avg,
+            same_dow_last,
+        ])
+
+
+def fit_direct_models(df_feat: pd.DataFrame, horizon_days: int, min_origin: int = 27) -> List[Tuple[int, int, object]]:
+    """
+    Train one booster per horizon bucket → [(h0, h1, booster)].
+    
+    Rows pair every origin day t with ~7 horizons h of the bucket (target
+    t + h inside the history). A bucket without enough rows reuses the
+    previous bucket's model (its features are valid at any horizon).
+    """
+    state = _OriginState(df_feat)
+    calendar = df_feat[DIRECT_CALENDAR_COLUMNS].to_numpy(dtype=float)
+    n = len(state.sales)
+    models = []
+    for h0, h1 in _direct_buckets(horizon_days):
+        step = max(1, (h1 - h0 + 1) // 7)
+        horizons = np.arange(h0, h1 + 1, step)
+        origins = np.arange(min_origin, n)
+        T = np.repeat(origins, len(horizons))
+        H = np.tile(horizons, len(origins))
+        keep = T + H < n
+        T, H = T[keep], H[keep]
+        if len(T) < 60:
+            if not models:
+                raise ValueError("Not enough history for a direct forecast")
+            models.append((h0, h1, models[-1][2]))
+            continue
+        X = state.design(T, H, calendar[T + H])
+        dtrain = xgb.QuantileDMatrix(X, label=state.sales[T + H])
+        models.append((h0, h1, xgb.train(XGB_PARAMS, dtrain, num_boost_round=DIRECT_ROUNDS)))
+    return models
+
+
+def direct_forecast(
+    models: List[Tuple[int, int, object]],
+    df_feat: pd.DataFrame,
+    horizon_days: int,
+    avg_rmse: Optional[float] = None,
+    with_features: bool = False,
+):
+    """
+    Forecast days 1..horizon_days from the last row with the bucket models:
+    one batched predict per bucket, no dependence between days.
+    
+    Same output (and intervals) as recursive_forecast.
+    """
+    state = _OriginState(df_feat)
+    last_date = df_feat['date'].max()
+    dates = [last_date + timedelta(days=h) for h in range(1, horizon_days + 1)]
+    future = engineer_features(pd.DataFrame({'date': dates, 'sales': 0.0}))
+    calendar = future[DIRECT_CALENDAR_COLUMNS].to_numpy(dtype=float)
+    horizons = np.arange(1, horizon_days + 1)
+    origins = np.full(horizon_days, len(state.sales) - 1)
+    x_future = state.design(origins, horizons, calendar)
+    
+    preds = np.empty(horizon_days)
+    for h0, h1, booster in models:
+        sl = slice(h0 - 1, min(h1, horizon_days))
+        if sl.start < sl.stop:
+            preds[sl] = booster.inplace_predict(x_future[sl])
+    preds = np.maximum(preds, 0)
+    
+    forecasts = []
+    for d, pred in zip(dates, preds):
+        pred = float(pred)
+        spread = 1.96 * (avg_rmse if avg_rmse is not None else pred * 0.15)
+        forecasts.append({
+            'date': d.strftime('%Y-%m-%d'),
+            'predicted': round(pred, 2),
+            'lower': round(max(0, pred - spread), 2),
+            'upper': round(pred + spread, 2),
+        })
+    if with_features:
+        return forecasts, x_future
+    return forecasts
+
+
+def backtest_strategies(df_feat: pd.DataFrame, horizon_days: int) -> Dict:
+    """
+    Hold out the last min(horizon, BACKTEST_MAX_DAYS) days, fit both strategies
+    on the rest and score them on the holdout: accuracy and latency side by side.
+    """
+    k = min(horizon_days, BACKTEST_MAX_DAYS)
+    train_feat = df_feat.iloc[:-k]
+    actual = df_feat['sales'].to_numpy(dtype=float)[-k:]
+    
+    def score(preds: np.ndarray) -> Dict:
+        mask = actual > 0
+        return {
+            'mape': round(float(np.mean(np.abs(actual[mask] - preds[mask]) / actual[mask])), 4) if mask.any() else 0,
+            'rmse': round(float(np.sqrt(np.mean((actual - preds) ** 2))), 2),
+        }
+    
+    results = {}
+    t0 = time.perf_counter()
+    clean = train_feat.dropna(subset=FEATURE_COLUMNS)
+    booster = xgb.train(
+        XGB_PARAMS, xgb.QuantileDMatrix(clean[FEATURE_COLUMNS].values, label=clean['sales'].values),
+        num_boost_round=FINAL_ROUNDS,
+    )
+    t1 = time.perf_counter()
+    preds = np.array([f['predicted'] for f in recursive_forecast(booster, train_feat, k)])
+    t2 = time.perf_counter()
+    results['recursive'] = {**score(preds), 'fit_ms': round((t1 - t0) * 1000, 1), 'predict_ms': round((t2 - t1) * 1000, 1)}
+    
+    t0 = time.perf_counter()
+    models = fit_direct_models(train_feat, k)
+    t1 = time.perf_counter()
+    preds = np.array([f['predicted'] for f in direct_forecast(models, train_feat, k)])
+    t2 = time.perf_counter()
+    results['direct'] = {**score(preds), 'fit_ms': round((t1 - t0) * 1000, 1), 'predict_ms': round((t2 - t1) * 1000, 1)}
+    
+    return {'backtest_days': k, **results}
+
+
 # ─── Supabase Integration ────────────────────────────────────────────────────
 
-def forecast_xgboost_supabase(
+class DailySalesAccumulator:
+    """Fold REST pages of timestamped rows into daily sales totals.
+    
+    Each page is summed per day (first 10 chars of ``ts_col``) in one groupby
+    and dropped; ``to_frame`` combines the per-page totals.
+    """
+    
+    def __init__(self, ts_col: str, value_col: str):
+        self.ts_col = ts_col
+        self.value_col = value_col
+        self.n_rows = 0
+        self._parts: List[pd.Series] = []
+    
+    def add(self, rows: List[Dict]) -> "DailySalesAccumulator":
+        if not rows:
+            return self
+        page = pd.DataFrame.from_records(rows, columns=[self.ts_col, self.value_col])
+        day = page[self.ts_col].str.slice(0, 10).to_numpy()
+        value = pd.to_numeric(page[self.value_col], errors='coerce').fillna(0.0)
+        self._parts.append(value.groupby(day).sum())
+        self.n_rows += len(rows)
+        return self
+    
+    def to_frame(self) -> pd.DataFrame:
+        """['date', 'sales'] for days with positive sales, sorted by date."""
+        if not self._parts:
+            return pd.DataFrame({'date': [], 'sales': []})
+        daily = pd.concat(self._parts).groupby(level=0).sum().sort_index()
+        daily = daily[daily > 0]
+        return pd.DataFrame({'date': daily.index.to_numpy(), 'sales': daily.to_numpy()})
+
+
+async def fetch_daily_sales(client, supabase_url: str, headers: Dict, location_id: str) -> Tuple[pd.DataFrame, str]:
+    """Daily sales from facts_sales_15m, falling back to tickets; (df, source)."""
+    from supabase_rest import fetch_pages
+    
+    sources = [
+        ('facts_sales_15m', 'ts_bucket', 'sales_net'),
+        ('tickets', 'opened_at', 'net_total'),
+    ]
+    for table, ts_col, value_col in sources:
+        acc = DailySalesAccumulator(ts_col, value_col)
+        url = (
+            f"{supabase_url}/rest/v1/{table}"
+            f"?location_id=eq.{location_id}"
+            f"&select={ts_col},{value_col}"
+            f"&order={ts_col}.asc"
+        )
+        await fetch_pages(client, url, headers, on_page=acc.add)
+        if acc.n_rows > 0:
+            return acc.to_frame(), table
+    return pd.DataFrame({'date': [], 'sales': []}), 'tickets'
+
+
+async def forecast_xgboost_supabase(
     supabase_url: str,
     supabase_key: str,
     location_id: str,
     location_name: str,
     horizon_days: int = 90,
+    continue_final: bool = False,
+    strategy: str = 'recursive',
+    compare_strategies: bool = False,
+    executor=None,
 ) -> Dict:
     """
     Full pipeline: fetch data from Supabase → train XGBoost → store forecasts.
     Mirrors the Prophet service's /forecast_supabase endpoint.
+    
+    REST calls go through the pooled async client; feature building and
+    training run on ``executor`` (the event loop's default one if None).
     """
-    from supabase import create_client
+    import asyncio
+    from functools import partial
+    from supabase_rest import shared_client, upsert
     
-    supabase = create_client(supabase_url, supabase_key)
+    client = shared_client()
+    headers = {'apikey': supabase_key, 'Authorization': f'Bearer {supabase_key}'}
     
     # ── Fetch sales data (same logic as v4 Edge Function) ─────────
-    sales_by_date = {}
-    data_source = 'facts_sales_15m'
-    
-    # Try facts_sales_15m first
-    result = supabase.table('facts_sales_15m') \
-        .select('ts_bucket, sales_net') \
-        .eq('location_id', location_id) \
-        .order('ts_bucket') \
-        .execute()
-    
-    if result.data and len(result.data) > 0:
-        for row in result.data:
-            date_str = row['ts_bucket'][:10]  # Extract YYYY-MM-DD
-            sales_by_date[date_str] = sales_by_date.get(date_str, 0) + float(row['sales_net'] or 0)
-    else:
-        # Fallback to tickets
-        data_source = 'tickets'
-        offset = 0
-        page_size = 1000
-        while True:
-            result = supabase.table('tickets') \
-                .select('opened_at, net_total') \
-                .eq('location_id', location_id) \
-                .order('opened_at') \
-                .range(offset, offset + page_size - 1) \
-                .execute()
-            
-            if not result.data or len(result.data) == 0:
-                break
-            
-            for row in result.data:
-                date_str = row['opened_at'][:10]
-                sales_by_date[date_str] = sales_by_date.get(date_str, 0) + float(row['net_total'] or 0)
-            
-            if len(result.data) < page_size:
-                break
-            offset += page_size
-    
-    if not sales_by_date:
+    df, data_source = await fetch_daily_sales(client, supabase_url, headers, location_id)
+    if df.empty:
         return {'error': 'No sales data found', 'location_id': location_id}
     
-    # Build DataFrame
-    df = pd.DataFrame([
-        {'date': d, 'sales': s}
-        for d, s in sorted(sales_by_date.items())
-        if s > 0
-    ])
-    
     logger.info(f"[XGBoost] {location_name}: {len(df)} days from {data_source}")
     
     # ── Train and forecast ────────────────────────────────────────
-    result = train_and_forecast(df, horizon_days=horizon_days)
+    result = await asyncio.get_running_loop().run_in_executor(
+        executor,
+        partial(
+            train_and_forecast, df, horizon_days=horizon_days, continue_final=continue_final,
+            strategy=strategy, compare_strategies=compare_strategies,
+        ),
+    )
     
     if 'error' in result:
         return result
     
     # ── Store forecasts in forecast_daily_metrics ─────────────────
-    forecasts_to_store = []
-    for fc in result['forecasts']:
-        forecasts_to_store.append({
+    generated_at = datetime.utcnow().isoformat()
+    forecasts_to_store = [
+        {
             'location_id': location_id,
             'date': fc['date'],
             'forecast_sales': fc['predicted'],
@@ -519,41 +854,28 @@ def forecast_xgboost_supabase(
             'model_version': 'XGBoost_v6',
             'mape': result['metrics']['mape'],
             'confidence': min(100, max(0, round(result['metrics']['r_squared'] * 100))),
-            'generated_at': datetime.utcnow().isoformat(),
-        })
-    
-    # Store in batches of 500
-    stored = 0
-    for i in range(0, len(forecasts_to_store), 500):
-        batch = forecasts_to_store[i:i+500]
-        try:
-            supabase.table('forecast_daily_metrics').upsert(
-                batch,
-                on_conflict='location_id,date,model_version'
-            ).execute()
-            stored += len(batch)
-        except Exception as e:
-            logger.error(f"[XGBoost] Batch insert error: {e}")
+            'generated_at': generated_at,
+        }
+        for fc in result['forecasts']
+    ]
     
     # ── Also log to forecast_accuracy_log for tracking ────────────
-    accuracy_rows = []
-    for fc in result['forecasts']:
-        accuracy_rows.append({
+    accuracy_rows = [
+        {
             'location_id': location_id,
             'date': fc['date'],
             'model_name': 'XGBoost_v6',
             'predicted': fc['predicted'],
-        })
-    
-    for i in range(0, len(accuracy_rows), 500):
-        batch = accuracy_rows[i:i+500]
-        try:
-            supabase.table('forecast_accuracy_log').upsert(
-                batch,
-                on_conflict='location_id,date,model_name'
-            ).execute()
-        except Exception as e:
-            logger.warning(f"[XGBoost] Accuracy log insert error: {e}")
+        }
+        for fc in result['forecasts']
+    ]
+    
+    stored, _ = await asyncio.gather(
+        upsert(client, f"{supabase_url}/rest/v1/forecast_daily_metrics", headers,
+               forecasts_to_store, on_conflict='location_id,date,model_version'),
+        upsert(client, f"{supabase_url}/rest/v1/forecast_accuracy_log", headers,
+               accuracy_rows, on_conflict='location_id,date,model_name'),
+    )
     
     result['forecasts_stored'] = stored
     result['data_source'] = data_source
@@ -563,35 +885,41 @@ def forecast_xgboost_supabase(
     return result
 
 
-# ─── Flask/FastAPI Route Handler ──────────────────────────────────────────────
+# ─── FastAPI Route Handler ────────────────────────────────────────────────────
 
 def create_forecast_xgboost_handler():
     """
-    Returns a handler function for the /forecast_xgboost endpoint.
-    Works with both Flask and FastAPI.
+    Returns an async handler for the /forecast_xgboost endpoint.
     
-    Usage (Flask):
+    Usage (FastAPI):
         handler = create_forecast_xgboost_handler()
-        @app.route('/forecast_xgboost', methods=['POST'])
-        def forecast_xgboost():
-            return handler(request.json)
+        @app.post('/forecast_xgboost')
+        async def forecast_xgboost(body: dict):
+            return await handler(body, executor=FIT_EXECUTOR)
     """
-    def handler(body: dict) -> dict:
+    async def handler(body: dict, executor=None) -> dict:
         supabase_url = body.get('supabase_url')
         supabase_key = body.get('supabase_key')
         location_id = body.get('location_id')
         location_name = body.get('location_name', 'Unknown')
         horizon_days = body.get('horizon_days', 90)
+        continue_final = bool(body.get('continue_final', False))
+        strategy = body.get('strategy', 'recursive')
+        compare_strategies = bool(body.get('compare_strategies', False))
         
         if not all([supabase_url, supabase_key, location_id]):
             return {'error': 'Missing required fields: supabase_url, supabase_key, location_id'}
         
-        return forecast_xgboost_supabase(
+        return await forecast_xgboost_supabase(
             supabase_url=supabase_url,
             supabase_key=supabase_key,
             location_id=location_id,
             location_name=location_name,
             horizon_days=horizon_days,
+            continue_final=continue_final,
+            strategy=strategy,
+            compare_strategies=compare_strategies,
+            executor=executor,
         )
     
     return handler
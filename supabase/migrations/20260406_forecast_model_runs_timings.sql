@@ -0,0 +1,13 @@
+-- =============================================================================
+-- forecast_model_runs.timings: per-stage wall time / RSS of hourly runs
+-- Written by prophet-service (/forecast_hourly, /forecast_hourly_batch).
+-- Shape: {"total_ms", "peak_rss_mb", "stages": {name: {ms, calls, rss_mb, ...}}}
+-- Created: 2026-04-06
+-- =============================================================================
+
+DO $$
+BEGIN
+  IF to_regclass('public.forecast_model_runs') IS NOT NULL THEN
+    ALTER TABLE forecast_model_runs ADD COLUMN IF NOT EXISTS timings jsonb;
+  END IF;
+END $$;
@@ -0,0 +1,12 @@
+-- =============================================================================
+-- forecast_model_registry.lgbm_best_iteration: early-stopped LightGBM rounds
+-- Written by prophet-service on every registry rewrite (NULL for naive-only runs).
+-- Created: 2026-04-07
+-- =============================================================================
+
+DO $$
+BEGIN
+  IF to_regclass('public.forecast_model_registry') IS NOT NULL THEN
+    ALTER TABLE forecast_model_registry ADD COLUMN IF NOT EXISTS lgbm_best_iteration integer;
+  END IF;
+END $$;